@@ -1,17 +1,73 @@
 import json
+import threading
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List, Tuple
 
 
 ROOT = Path(__file__).resolve().parents[1]
 
 
-def load_json(path: str) -> Dict[str, Any]:
+class FrozenDict(dict):
+    """Read-only dict handed out by the config cache; thaw() gives an editable copy."""
+
+    __slots__ = ()
+
+    def _readonly(self, *args: Any, **kwargs: Any) -> None:
+        raise TypeError("configuratie is alleen-lezen; gebruik config.thaw() voor een bewerkbare kopie")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly  # type: ignore[assignment]
+    clear = pop = popitem = setdefault = update = _readonly  # type: ignore[assignment]
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+def _freeze(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        return FrozenDict({k: _freeze(v) for k, v in obj.items()})
+    if isinstance(obj, list):
+        return tuple(_freeze(v) for v in obj)
+    return obj
+
+
+def thaw(obj: Any) -> Any:
+    """Deep, mutable (dict/list) copy of a cached config value."""
+    if isinstance(obj, dict):
+        return {k: thaw(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [thaw(v) for v in obj]
+    return obj
+
+
+# resolved path -> ((mtime_ns, size), frozen data)
+_JSON_CACHE: Dict[Path, Tuple[Tuple[int, int], Any]] = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def _resolve(path: str | Path) -> Path:
     p = Path(path)
-    if not p.is_absolute():
-        p = ROOT / p
+    return p if p.is_absolute() else ROOT / p
+
+
+def load_json(path: str) -> Dict[str, Any]:
+    """Parse a JSON config file once per (path, mtime, size); returns a read-only view."""
+    p = _resolve(path)
+    st = p.stat()  # FileNotFoundError propagates, as before
+    stamp = (st.st_mtime_ns, st.st_size)
+    hit = _JSON_CACHE.get(p)
+    if hit is not None and hit[0] == stamp:
+        return hit[1]
     with open(p, "r", encoding="utf-8") as f:
-        return json.load(f)
+        data = _freeze(json.load(f))
+    with _CACHE_LOCK:
+        _JSON_CACHE[p] = (stamp, data)
+    return data
+
+
+def clear_config_cache() -> None:
+    with _CACHE_LOCK:
+        _JSON_CACHE.clear()
+        _MERGED_DS.clear()
 
 
 def get_locations_config(path: str | None = None) -> Dict[str, Any]:
@@ -22,18 +78,76 @@ def get_data_sources_config(path: str | None = None) -> Dict[str, Any]:
     return load_json(path or "config/data_sources.json")
 
 
+_NO_DEPARTMENTS = FrozenDict({"departments": FrozenDict()})
+
+
 def get_departments_config() -> Dict[str, Any]:
     try:
         return load_json("config/departments.json")
     except (FileNotFoundError, json.JSONDecodeError):
-        return {"departments": {}}
+        return _NO_DEPARTMENTS
 
 
 def get_department_defaults(department: str | None) -> Dict[str, Any]:
     conf = get_departments_config()
     if not department:
         department = conf.get("default_department")
-    return conf.get("departments", {}).get(department, {})
+    return conf.get("departments", {}).get(department, FrozenDict())
+
+
+# department -> (base data_sources, departments config, merged view)
+_MERGED_DS: Dict[str | None, Tuple[Any, Any, Dict[str, Any]]] = {}
+
+
+def get_department_data_sources(department: str | None) -> Dict[str, Any]:
+    """data_sources.json merged with the department's data_sources overrides.
+
+    The merge is redone only when one of the two files changed.
+    """
+    base = get_data_sources_config()
+    depts = get_departments_config()
+    hit = _MERGED_DS.get(department)
+    if hit is not None and hit[0] is base and hit[1] is depts:
+        return hit[2]
+    overrides = get_department_defaults(department).get("data_sources") or {}
+    merged = FrozenDict({**base, **overrides})
+    with _CACHE_LOCK:
+        _MERGED_DS[department] = (base, depts, merged)
+    return merged
+
+
+def get_mutual_exclusions(path: str | None = None) -> Tuple[List[Tuple[str, str]], List[str]]:
+    """Load person-name pairs that may not work on the same date.
+
+    Returns (pairs, problems). A missing file means no exclusions; unreadable JSON and
+    malformed entries are skipped and described in *problems* instead of being hidden.
+    """
+    p = _resolve(path or "data/mutual_exclusions.json")
+    if not p.exists():
+        return [], []
+    try:
+        raw = json.loads(p.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError) as e:
+        return [], [f"{p}: kan exclusies niet lezen ({e})"]
+    if not isinstance(raw, list):
+        return [], [f"{p}: verwacht een lijst met paren, kreeg {type(raw).__name__}"]
+
+    pairs: List[Tuple[str, str]] = []
+    problems: List[str] = []
+    for i, entry in enumerate(raw):
+        if (
+            not isinstance(entry, (list, tuple))
+            or len(entry) != 2
+            or not all(isinstance(n, str) and n.strip() for n in entry)
+        ):
+            problems.append(f"{p}: exclusie #{i + 1} is geen paar van twee namen: {entry!r}")
+            continue
+        a, b = entry[0].strip(), entry[1].strip()
+        if a == b:
+            problems.append(f"{p}: exclusie #{i + 1} koppelt {a!r} aan zichzelf")
+            continue
+        pairs.append((a, b))
+    return pairs, problems
 
 
 def get_weights_config(path: str | None = None) -> Dict[str, Any]:
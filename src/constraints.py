@@ -1,42 +1,123 @@
-﻿import json
-import os
-from pathlib import Path
-
-from models import Role, SolverContext
+﻿from models import Role, SolverContext, location_name
 from penalty_terms import apply_objective
+from roster_utils import group_shifts_by_iso_week, group_shifts_by_month
 
 
-def _log(msg: str) -> None:
-    """Print only when ROOSTER_VERBOSE env var is truthy."""
-    if os.environ.get("ROOSTER_VERBOSE") not in (None, "", "0", "false", "False"):
+def _log(ctx: SolverContext, msg: str) -> None:
+    """Print only for verbose runs (ctx.verbose)."""
+    if ctx.verbose:
         print(msg)
 
 
+def ineligible_reason(person, shift) -> str | None:
+    """Why the availability constraint blocks *person* on *shift*; None when it does not.
+
+    The single definition of eligibility: add_availability_constraints, AssignmentBounds
+    and the two-stage engine all go through here, so they cannot drift apart.
+    """
+    if person.role == Role.PEER and not shift.allow_peer:
+        return "peer"
+    if person.role == Role.TESTER and not shift.allow_tester:
+        return "tester"
+    if not person.available_at(shift.ordinal):
+        return "unavailable"
+    if person.loc_flag_id(shift.loc_id) == 0:
+        return "location"
+    only = person.loc2_only_at(shift.ordinal)
+    if only is not None and shift.loc_id != only:
+        return "loc2_only"
+    if person.loc2_banned_at(shift.ordinal) == shift.loc_id:
+        return "loc2_banned"
+    return None
+
+
+def is_eligible(person, shift) -> bool:
+    """True when the availability constraint allows *person* on *shift*."""
+    return ineligible_reason(person, shift) is None
+
+
+class AssignmentBounds:
+    """Upper bounds on assignment counts implied by the active hard constraints.
+
+    Used by penalty_terms to give auxiliary IntVars and AddElement tables tight domains.
+    A person's bound over a set of shifts only counts eligible shifts (availability), at
+    most max_per_day per date and at most max_per_week per week number, mirroring the
+    constraints below.
+    """
+
+    def __init__(
+        self, ctx: SolverContext, active: set[str], max_per_day: int = 1, max_per_week: int = 2
+    ) -> None:
+        self._use_avail = "availability" in active
+        self._per_day = max_per_day if "max_per_day" in active else None
+        self._per_week = max_per_week if "max_per_week" in active else None
+        self._per_shift = 2 if "exact_testers" in active else None
+        self._shift_by_idx = {s.idx: s for s in ctx.shifts}
+        self._eligible: dict[int, set[int]] = {}
+        self.max_total_floor = 0  # lower bound on the busiest person's total (capacity cuts)
+
+    def _eligible_shifts(self, person) -> set[int] | None:
+        if not self._use_avail:
+            return None
+        elig = self._eligible.get(person.idx)
+        if elig is None:
+            elig = self._eligible[person.idx] = {
+                idx for idx, s in self._shift_by_idx.items() if is_eligible(person, s)
+            }
+        return elig
+
+    def person_upper(self, person, shift_idxs) -> int:
+        """Most shifts *person* can hold among *shift_idxs*."""
+        elig = self._eligible_shifts(person)
+        per_date: dict[tuple[int, str], int] = {}
+        for s_idx in shift_idxs:
+            if elig is not None and s_idx not in elig:
+                continue
+            shift = self._shift_by_idx[s_idx]
+            key = (shift.weeknummer, shift.date)
+            per_date[key] = per_date.get(key, 0) + 1
+        per_week: dict[int, int] = {}
+        for (week, _), cnt in per_date.items():
+            if self._per_day is not None:
+                cnt = min(cnt, self._per_day)
+            per_week[week] = per_week.get(week, 0) + cnt
+        if self._per_week is not None:
+            return sum(min(cnt, self._per_week) for cnt in per_week.values())
+        return sum(per_week.values())
+
+    def shift_upper(self, shift, persons) -> int:
+        """Most people that can be assigned to *shift*."""
+        n = sum(
+            1 for p in persons
+            if (elig := self._eligible_shifts(p)) is None or shift.idx in elig
+        )
+        return n if self._per_shift is None else min(n, self._per_shift)
+
+
 # Constraint 1: Niet plannen als iemand niet beschikbaar is
 def add_availability_constraints(ctx: SolverContext) -> None:
     model, av = ctx.model, ctx.assignment_vars
     for person in ctx.persons:
         for shift in ctx.shifts:
-            if person.role == Role.PEER and not shift.allow_peer:
-                model.Add(av[(person.idx, shift.idx)] == 0)
-                _log(f"Blocking peer assignment for {person.name} on {shift.date} (loc={shift.location})")
+            reason = ineligible_reason(person, shift)
+            if reason is None:
                 continue
-            if person.role == Role.TESTER and not shift.allow_tester:
-                model.Add(av[(person.idx, shift.idx)] == 0)
-                _log(f"Blocking tester assignment for {person.name} on {shift.date} (loc={shift.location})")
-                continue
-            if not person.is_available(shift.date):
-                model.Add(av[(person.idx, shift.idx)] == 0)
-                _log(f"Adding constraint for {person.name} on {shift.day} (not available)")
-            if person.loc_flag(shift.location) == 0:
-                model.Add(av[(person.idx, shift.idx)] == 0)
-                _log(f"Adding hard location ban for {person.name} at {shift.location} on {shift.date}")
-            if shift.date in person.date_loc2_only and shift.location != person.date_loc2_only[shift.date]:
-                model.Add(av[(person.idx, shift.idx)] == 0)
-                _log(f"Blocking {person.name} at {shift.location} on {shift.date} (only available at {person.date_loc2_only[shift.date]})")
-            if shift.date in person.date_loc2_banned and shift.location == person.date_loc2_banned[shift.date]:
-                model.Add(av[(person.idx, shift.idx)] == 0)
-                _log(f"Blocking {person.name} at {shift.location} on {shift.date} (banned from location 2)")
+            model.Add(av[(person.idx, shift.idx)] == 0)
+            if ctx.verbose:
+                _log(ctx, _blocked_message(reason, person, shift))
+
+
+def _blocked_message(reason: str, person, shift) -> str:
+    if reason in ("peer", "tester"):
+        return f"Blocking {reason} assignment for {person.name} on {shift.date} (loc={shift.location})"
+    if reason == "unavailable":
+        return f"Adding constraint for {person.name} on {shift.day} (not available)"
+    if reason == "location":
+        return f"Adding hard location ban for {person.name} at {shift.location} on {shift.date}"
+    if reason == "loc2_only":
+        only = location_name(person.loc2_only_at(shift.ordinal))
+        return f"Blocking {person.name} at {shift.location} on {shift.date} (only available at {only})"
+    return f"Blocking {person.name} at {shift.location} on {shift.date} (banned from location 2)"
 
 
 # Constraint 2: Maximaal 1 shift per dag per persoon
@@ -45,9 +126,8 @@ def add_max_shifts_per_day_constraints(ctx: SolverContext, max_shifts: int = 1)
     dates = ctx.shifts.dates()
     for person in ctx.persons:
         for date in dates:
-            day_shifts = [s.idx for s in ctx.shifts.filter_date(date)]
-            model.Add(sum(av[(person.idx, s_idx)] for s_idx in day_shifts) <= max_shifts)
-            _log(f"Adding constraint for {person.name} on {date} (max 1 shift per day)")
+            model.Add(sum(av.person_date(person.idx, date)) <= max_shifts)
+            _log(ctx, f"Adding constraint for {person.name} on {date} (max 1 shift per day)")
 
 
 # Constraint 3: Precies 2 testers per shift (of minimaal min_x in partieel modus)
@@ -56,21 +136,20 @@ def add_exactly_x_testers_per_shift_constraints(
 ) -> None:
     model, av = ctx.model, ctx.assignment_vars
     for shift in ctx.shifts:
-        total = sum(av[(p.idx, shift.idx)] for p in ctx.persons)
+        total = sum(av.column(shift.idx))
         if min_x is not None:
             model.Add(total <= x)
             model.Add(total >= min_x)
-            _log(f"Adding constraint for {min_x}-{x} testers on shift {shift.idx} (loc={shift.location})")
+            _log(ctx, f"Adding constraint for {min_x}-{x} testers on shift {shift.idx} (loc={shift.location})")
         else:
             model.Add(total == x)
-            _log(f"Adding constraint for exactly {x} testers on shift {shift.idx} (loc={shift.location})")
+            _log(ctx, f"Adding constraint for exactly {x} testers on shift {shift.idx} (loc={shift.location})")
 
 
 # Constraint 4: Minimaal 1 eerste tester per shift
 def add_minimum_first_tester_per_shift_constraints(ctx: SolverContext, partial: bool = False) -> None:
     model, av = ctx.model, ctx.assignment_vars
     tester_idxs = [p.idx for p in ctx.persons.filter_role(Role.TESTER)]
-    all_idxs = [p.idx for p in ctx.persons]
     for shift in ctx.shifts:
         if not shift.allow_tester:
             continue
@@ -79,11 +158,11 @@ def add_minimum_first_tester_per_shift_constraints(ctx: SolverContext, partial:
             # If any person is assigned, at least one must be a tester.
             # total <= 2 * n_testers: when total=1 or 2, n_testers must be >= 1.
             # When total=0 the inequality is trivially satisfied (0 <= 0).
-            total = sum(av[(p_idx, shift.idx)] for p_idx in all_idxs)
+            total = sum(av.column(shift.idx))
             model.Add(total <= 2 * n_testers)
         else:
             model.Add(n_testers >= 1)
-        _log(f"Adding min_first constraint (partial={partial}) for shift {shift.idx}")
+        _log(ctx, f"Adding min_first constraint (partial={partial}) for shift {shift.idx}")
 
 
 # Constraint: Maximaal x shifts per week per persoon
@@ -93,9 +172,8 @@ def add_max_x_shifts_per_week_constraints(
     model, av = ctx.model, ctx.assignment_vars
     weeknums = set(s.weeknummer for s in ctx.shifts)
     for num in weeknums:
-        week_shifts = [s.idx for s in ctx.shifts.filter_week(num)]
         for person in ctx.persons:
-            model.Add(sum(av[(person.idx, s_idx)] for s_idx in week_shifts) <= max_shifts_per_week)
+            model.Add(sum(av.person_week(person.idx, num)) <= max_shifts_per_week)
 
 
 # Constraint: Maximaal 1 eerste tester per shift, tenzij er geen peers beschikbaar zijn
@@ -111,37 +189,96 @@ def add_single_first_tester_constraints(ctx: SolverContext) -> None:
         model.Add(sum(av[(t_idx, shift.idx)] for t_idx in tester_idxs) <= 1)
 
 
+# Redundante capaciteitssneden: geldig voor elke oplossing, versterken alleen de LP-relaxatie
+def add_capacity_cuts(ctx: SolverContext, x: int = 2) -> None:
+    """Aggregate demand = supply per ISO week and per month, plus a floor for max_shifts.
+
+    Only valid when every shift needs exactly *x* people (exact_testers, not partial):
+    the week/month sums are then implied by the per-shift equalities, and the busiest
+    eligible person must take at least ceil((demand + carry) / eligible people) shifts.
+    """
+    model, av = ctx.model, ctx.assignment_vars
+    groups = [
+        *group_shifts_by_iso_week(ctx.shifts, ctx.calendar).values(),
+        *group_shifts_by_month(ctx.shifts, ctx.calendar).values(),
+    ]
+    for s_idxs in groups:
+        model.Add(sum(v for s in s_idxs for v in av.column(s)) == x * len(s_idxs))
+
+    all_idxs = [s.idx for s in ctx.shifts]
+    eligible = [p for p in ctx.persons if ctx.bounds.person_upper(p, all_idxs) > 0]
+    if eligible:
+        demand = x * len(ctx.shifts) + sum(ctx.carry_counts.get(p.idx, 0) for p in eligible)
+        ctx.bounds.max_total_floor = -(-demand // len(eligible))
+    _log(ctx, f"Capacity cuts: {len(groups)} week/maand-sommen, max_shifts >= {ctx.bounds.max_total_floor}")
+
+
+def resolve_exclusion_pairs(persons, pairs: list[tuple[str, str]]) -> list[tuple[int, int]]:
+    """Map name pairs to (person.idx, person.idx); unknown names are reported and skipped."""
+    name_to_idx = {p.name: p.idx for p in persons}
+    resolved: set[tuple[int, int]] = set()
+    for a, b in pairs:
+        missing = [n for n in (a, b) if n not in name_to_idx]
+        if missing:
+            print(f"Exclusie {a} ⇄ {b} overgeslagen: onbekende persoon {', '.join(missing)}")
+            continue
+        resolved.add(tuple(sorted((name_to_idx[a], name_to_idx[b]))))
+    return sorted(resolved)
+
+
+def exclusion_cliques(pairs: list[tuple[int, int]]) -> list[list[int]]:
+    """Greedily cover the conflict graph's edges with maximal cliques.
+
+    Every clique may have at most one member working on a date, which is exactly the
+    conjunction of its pairwise exclusions, so one AddAtMostOne replaces all of them.
+    """
+    adj: dict[int, set[int]] = {}
+    for a, b in pairs:
+        adj.setdefault(a, set()).add(b)
+        adj.setdefault(b, set()).add(a)
+    uncovered = {tuple(sorted(e)) for e in pairs}
+    cliques: list[list[int]] = []
+    for a, b in sorted(uncovered):
+        if (a, b) not in uncovered:
+            continue
+        clique = {a, b}
+        candidates = adj[a] & adj[b]
+        while candidates:
+            # Prefer the vertex that covers the most still-uncovered edges.
+            v = max(
+                sorted(candidates),
+                key=lambda c: sum(tuple(sorted((c, m))) in uncovered for m in clique),
+            )
+            clique.add(v)
+            candidates &= adj[v]
+        members = sorted(clique)
+        for i, u in enumerate(members):
+            for w in members[i + 1:]:
+                uncovered.discard((u, w))
+        cliques.append(members)
+    return cliques
+
+
 def _apply_mutual_exclusions(ctx: SolverContext) -> None:
-    try:
-        excl_path = Path("data") / "mutual_exclusions.json"
-        if not excl_path.exists():
-            return
-        exclusions = json.loads(excl_path.read_text(encoding="utf-8"))
-        if not exclusions:
-            return
-        name_to_idx = {p.name: p.idx for p in ctx.persons}
-        date_to_shifts: dict[str, list[int]] = {}
-        for shift in ctx.shifts:
-            date_to_shifts.setdefault(shift.date, []).append(shift.idx)
-        for pair in exclusions:
-            if not pair or len(pair) < 2:
-                continue
-            a, b = pair[0], pair[1]
-            if a not in name_to_idx or b not in name_to_idx:
-                continue
-            a_idx, b_idx = name_to_idx[a], name_to_idx[b]
-            for shift_idxs in date_to_shifts.values():
-                va = [ctx.assignment_vars[(a_idx, s)] for s in shift_idxs if (a_idx, s) in ctx.assignment_vars]
-                vb = [ctx.assignment_vars[(b_idx, s)] for s in shift_idxs if (b_idx, s) in ctx.assignment_vars]
-                if va or vb:
-                    ctx.model.Add(sum(va + vb) <= 1)
-    except Exception:
-        pass
+    if not ctx.exclusion_pairs:
+        return
+    av = ctx.assignment_vars
+    date_to_shifts: dict[str, list[int]] = {}
+    for shift in ctx.shifts:
+        date_to_shifts.setdefault(shift.date, []).append(shift.idx)
+    cliques = exclusion_cliques(ctx.exclusion_pairs)
+    for clique in cliques:
+        for shift_idxs in date_to_shifts.values():
+            lits = [av[(p_idx, s)] for p_idx in clique for s in shift_idxs if (p_idx, s) in av]
+            if len(lits) > 1:
+                ctx.model.AddAtMostOne(lits)
+    _log(ctx, f"Mutual exclusions: {len(ctx.exclusion_pairs)} paren in {len(cliques)} cliques")
 
 
-def add_constraints(ctx: SolverContext, use_constraints: set[str], allow_partial: bool = False) -> None:
+def add_hard_constraints(ctx: SolverContext, use_constraints: set[str], allow_partial: bool = False) -> None:
     active = use_constraints
     partial = allow_partial
+    ctx.bounds = AssignmentBounds(ctx, active, max_per_day=1, max_per_week=2)
 
     for key, fn in {
         "availability": add_availability_constraints,
@@ -158,6 +295,11 @@ def add_constraints(ctx: SolverContext, use_constraints: set[str], allow_partial
         add_max_x_shifts_per_week_constraints(ctx, max_shifts_per_week=2)
     if "single_first" in active:
         add_single_first_tester_constraints(ctx)
+    if "capacity_cuts" in active and "exact_testers" in active and not partial:
+        add_capacity_cuts(ctx, x=2)
     _apply_mutual_exclusions(ctx)
 
-    apply_objective(ctx)
\ No newline at end of file
+
+def add_constraints(ctx: SolverContext, use_constraints: set[str], allow_partial: bool = False) -> None:
+    add_hard_constraints(ctx, use_constraints, allow_partial)
+    apply_objective(ctx)
@@ -3,11 +3,11 @@ from models import Role, SolverContext
 
 def print_available_people_for_shifts(ctx: SolverContext):
     for shift in ctx.shifts:
-        beschikbaar = [p.name for p in ctx.persons if p.is_available(shift.date)]
+        beschikbaar = [p.name for p in ctx.persons if p.available_at(shift.ordinal)]
         print(f"Shift {shift} -> Beschikbare mensen: {beschikbaar}")
 
     for shift in ctx.shifts:
-        eerste = [p.name for p in ctx.persons if p.role == Role.TESTER and p.is_available(shift.date)]
+        eerste = [p.name for p in ctx.persons if p.role == Role.TESTER and p.available_at(shift.ordinal)]
         if len(eerste) < 1:
             print(f" Geen eerste tester beschikbaar op shift {shift}")
         print(f"Shift {shift} -> Beschikbare eerste testers: {eerste}")
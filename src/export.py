@@ -1,7 +1,11 @@
 import csv
+import json
 import re
+from datetime import date, datetime
 from pathlib import Path
 
+ASSIGNMENT_COLUMNS = ["date", "location", "team", "person", "role", "week", "month"]
+
 def export_to_csv(data, filename):
     """
     Exports a list of dictionaries to a CSV file.
@@ -41,6 +45,63 @@ def split_testers(data):
     return data
 
 
+def export_assignments(shifts, persons, filename):
+    """
+    Writes the roster in long format, one row per (shift, person), as Parquet.
+
+    Columns: date (datetime64), location/person/role (category), team, week and month
+    (small ints). Returns the schema as {column: dtype}, or None when pyarrow is not
+    installed (the wide CSV is still written).
+    """
+    try:
+        import pandas as pd
+        import pyarrow  # noqa: F401  (pandas' Parquet engine)
+    except ImportError:
+        print("pyarrow niet geïnstalleerd; assignments.parquet wordt overgeslagen.")
+        return None
+
+    role_of = {p.name: p.role.value for p in persons}
+    rows = {col: [] for col in ASSIGNMENT_COLUMNS}
+    for shift in shifts:
+        month = date.fromisoformat(shift.date).month
+        for name in shift.testers:
+            rows["date"].append(shift.date)
+            rows["location"].append(shift.location)
+            rows["team"].append(shift.team)
+            rows["person"].append(name)
+            rows["role"].append(role_of.get(name, ""))
+            rows["week"].append(shift.weeknummer)
+            rows["month"].append(month)
+    df = pd.DataFrame({
+        "date": pd.to_datetime(pd.Series(rows["date"], dtype=object), format="%Y-%m-%d"),
+        "location": pd.Categorical(rows["location"]),
+        "team": pd.Series(rows["team"], dtype="int16"),
+        "person": pd.Categorical(rows["person"]),
+        "role": pd.Categorical(rows["role"]),
+        "week": pd.Series(rows["week"], dtype="int8"),
+        "month": pd.Series(rows["month"], dtype="int8"),
+    })
+    df.to_parquet(filename, index=False)
+    print(f"Assignments exported to {filename}.")
+    return {col: str(dtype) for col, dtype in df.dtypes.items()}
+
+
+def write_manifest(filename, **fields):
+    """
+    Writes a small JSON manifest describing the files of one roster run.
+
+    File paths are stored relative to the manifest's directory.
+    """
+    base = Path(filename).parent
+    manifest = {"created": datetime.now().isoformat(timespec="seconds")}
+    for key, value in fields.items():
+        if key.endswith("_file") and value:
+            value = Path(value).name if Path(value).parent == base else str(value)
+        manifest[key] = value
+    Path(filename).write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    return manifest
+
+
 def sanitize_rooster_name(name: str) -> str:
     cleaned = re.sub(r"[^A-Za-z0-9_-]+", "_", name.strip())
     cleaned = cleaned.strip("_-")
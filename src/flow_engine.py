@@ -0,0 +1,101 @@
+"""Min-cost-flow engine for instances that are a pure transportation problem.
+
+Network: source -> person/week (cap 2, only with max_per_week) -> person/date (cap 1)
+-> shift slot (cost = location penalty) -> sink. Every shift has two slots; min_first
+makes the first slot tester-only and single_first makes the second one peer-only, which
+is exactly "2 per shift, at least / at most one tester".
+"""
+from __future__ import annotations
+
+import itertools
+
+from ortools.graph.python import min_cost_flow
+from ortools.sat.python import cp_model
+
+from constraints import is_eligible
+from models import AssignmentVars, FixedSolution, Role, SolverContext, SolverResult
+
+FLOW_CONSTRAINTS = {
+    "availability", "max_per_day", "exact_testers", "min_first", "max_per_week", "single_first",
+    "capacity_cuts",  # redundant, the flow is exact anyway
+}
+FLOW_OBJECTIVES = {"location", "coverage"}
+
+
+def flow_applicable(ctx: SolverContext, active: set[str], partial: bool = False) -> bool:
+    """True when the active constraints/weights fit the network-flow formulation."""
+    if not {"max_per_day", "exact_testers"} <= active or not active <= FLOW_CONSTRAINTS:
+        return False
+    if partial and "min_first" in active:
+        # "no peer without a tester" on partially filled shifts is not a flow constraint.
+        return False
+    if any(val for key, val in ctx.weights.as_dict().items() if key not in FLOW_OBJECTIVES):
+        return False
+    return not ctx.exclusion_pairs
+
+
+def solve_min_cost_flow(ctx: SolverContext, active: set[str], partial: bool = False) -> SolverResult:
+    """Solve with SimpleMinCostFlow; the result is optimal for the flow-compatible model.
+
+    ctx.assignment_vars is replaced by constant 0/1 entries, like the other engines.
+    """
+    smcf = min_cost_flow.SimpleMinCostFlow()
+    use_avail = "availability" in active
+    loc_cost = ctx.weights.location
+    peers = ctx.persons.filter_role(Role.PEER)
+    peers_free = {d: bool(peers.filter_available_on(d)) for d in ctx.shifts.dates()}
+
+    next_node = itertools.count()
+    source, sink = next(next_node), next(next_node)
+
+    # Two slots per shift: slot_roles[s.idx] = (role or None, role or None)
+    slot_nodes: dict[int, tuple[int, int]] = {}
+    slot_roles: dict[int, tuple[Role | None, Role | None]] = {}
+    for shift in ctx.shifts:
+        first = Role.TESTER if "min_first" in active and shift.allow_tester else None
+        second = (
+            Role.PEER
+            if "single_first" in active and shift.allow_peer and peers_free[shift.date]
+            else None
+        )
+        slot_nodes[shift.idx] = (next(next_node), next(next_node))
+        slot_roles[shift.idx] = (first, second)
+        for node in slot_nodes[shift.idx]:
+            smcf.add_arc_with_capacity_and_unit_cost(node, sink, 1, 0)
+            if partial:
+                smcf.add_arc_with_capacity_and_unit_cost(source, node, 1, ctx.weights.coverage)
+
+    assign_arcs: dict[int, tuple[int, int]] = {}
+    for person in ctx.persons:
+        week_nodes: dict[int, int] = {}
+        for date in ctx.shifts.dates():
+            date_shifts = ctx.shifts.filter_date(date)
+            usable = [s for s in date_shifts if not use_avail or is_eligible(person, s)]
+            if not usable:
+                continue
+            day_node = next(next_node)
+            if "max_per_week" in active:
+                week = date_shifts[0].weeknummer
+                if week not in week_nodes:
+                    week_nodes[week] = next(next_node)
+                    smcf.add_arc_with_capacity_and_unit_cost(source, week_nodes[week], 2, 0)
+                smcf.add_arc_with_capacity_and_unit_cost(week_nodes[week], day_node, 1, 0)
+            else:
+                smcf.add_arc_with_capacity_and_unit_cost(source, day_node, 1, 0)
+            for shift in usable:
+                cost = loc_cost if person.loc_flag_id(shift.loc_id) == 1 else 0
+                for node, role in zip(slot_nodes[shift.idx], slot_roles[shift.idx]):
+                    if role is None or role == person.role:
+                        arc = smcf.add_arc_with_capacity_and_unit_cost(day_node, node, 1, cost)
+                        assign_arcs[arc] = (person.idx, shift.idx)
+
+    n_slots = 2 * len(ctx.shifts)
+    smcf.set_node_supply(source, n_slots)
+    smcf.set_node_supply(sink, -n_slots)
+    status = smcf.solve()
+    if status != smcf.OPTIMAL:
+        return SolverResult(solver=FixedSolution(), status=cp_model.INFEASIBLE)
+
+    assigned = {key for arc, key in assign_arcs.items() if smcf.flow(arc) > 0}
+    ctx.assignment_vars = AssignmentVars.from_assigned(ctx.persons, ctx.shifts, assigned)
+    return SolverResult(solver=FixedSolution(), status=cp_model.OPTIMAL)
@@ -0,0 +1,75 @@
+"""Lexicographic (tiered) objective solving on top of the regular CP-SAT model.
+
+Each tier minimizes the weighted sum of its own components, its optimum is then fixed
+as an upper bound and the solution is passed as a hint to the next tier.
+"""
+from __future__ import annotations
+
+import time
+
+from ortools.sat.python import cp_model
+
+from models import SolverContext, SolverResult
+
+DEFAULT_TIERS = [
+    ["coverage"],
+    ["monthly", "monthly_min_avail"],
+    ["monthly_avg", "weekly_multi"],
+    ["fairness", "location_fairness", "location"],
+]
+
+
+def resolve_tiers(tiers: list[list[str]] | None, components: list[str]) -> list[list[str]]:
+    """Keep only active components; anything not mentioned goes into a final tier."""
+    tiers = tiers or DEFAULT_TIERS
+    seen: set[str] = set()
+    resolved = []
+    for tier in tiers:
+        keep = [c for c in tier if c in components and c not in seen]
+        seen.update(keep)
+        if keep:
+            resolved.append(keep)
+    rest = [c for c in components if c not in seen]
+    if rest:
+        resolved.append(rest)
+    return resolved
+
+
+def solve_lexicographic(
+    ctx: SolverContext,
+    tiers: list[list[str]] | None = None,
+    tier_time_limit: float | None = None,
+) -> SolverResult:
+    """Solve ctx.model tier by tier. Expects add_constraints() to have filled ctx.objective_terms.
+
+    With *tier_time_limit* a tier may stop at a feasible (non-proven) value; that value is
+    then fixed as the bound, which keeps later tiers feasible.
+    """
+    model, terms = ctx.model, ctx.objective_terms
+    best: SolverResult | None = None
+    plan = resolve_tiers(tiers, list(terms)) or [[]]
+    for level, tier in enumerate(plan, start=1):
+        expr = sum(terms[c] for c in tier)
+        model.Minimize(expr)
+        t0 = time.perf_counter()
+        solver = cp_model.CpSolver()
+        if tier_time_limit:
+            solver.parameters.max_time_in_seconds = tier_time_limit
+        status = solver.Solve(model)
+        elapsed = time.perf_counter() - t0
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            print(f"Lexicografisch niveau {level} {tier}: geen oplossing ({elapsed:.2f}s)")
+            return best or SolverResult(solver=solver, status=status)
+        best = SolverResult(solver=solver, status=status)
+        value = int(round(solver.ObjectiveValue()))
+        print(
+            f"Lexicografisch niveau {level} {tier}: waarde={value} "
+            f"({solver.StatusName(status)}, {elapsed:.2f}s)"
+        )
+        if level == len(plan):
+            break
+        model.Add(expr <= value)
+        model.ClearHints()
+        for var in ctx.assignment_vars.values():
+            model.AddHint(var, solver.Value(var))
+    return best
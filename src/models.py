@@ -1,33 +1,208 @@
 from __future__ import annotations
 
 import dataclasses
+import threading
+from array import array
+from collections.abc import Iterable, Iterator, MutableMapping
 from dataclasses import dataclass, field
+from datetime import date as _date
 from enum import Enum
 from typing import Any
 
+from planning_calendar import Calendar, date_ordinal
+
 
 class Role(str, Enum):
     TESTER = "T"
     PEER = "P"
 
 
-@dataclass
+_NO_FLAG = -32768  # array("h") sentinel: location has no explicit flag (-> 2)
+_LOC_IDS: dict[str, int] = {}
+_LOC_NAMES: list[str] = []
+_LOC_LOCK = threading.Lock()  # solves of parallel sessions intern names concurrently
+
+
+def location_id(name: str) -> int:
+    """Small integer id for a location name, interned for the whole process."""
+    lid = _LOC_IDS.get(name)
+    if lid is None:
+        with _LOC_LOCK:
+            lid = _LOC_IDS.get(name)
+            if lid is None:
+                lid = len(_LOC_NAMES)
+                _LOC_NAMES.append(name)
+                _LOC_IDS[name] = lid
+    return lid
+
+
+def location_name(lid: int) -> str:
+    return _LOC_NAMES[lid]
+
+
+def _iso(key: int | str) -> str:
+    return _date.fromordinal(key).isoformat() if isinstance(key, int) else key
+
+
+def _pack_loc2(mapping: dict[str, str]) -> dict[int | str, int]:
+    """date -> location name  becomes  ordinal (or raw key) -> location id."""
+    packed: dict[int | str, int] = {}
+    for d, loc in mapping.items():
+        o = date_ordinal(d)
+        packed[d if o is None else o] = location_id(loc)
+    return packed
+
+
 class Person:
-    name: str
-    role: Role
-    availability: dict[str, bool]
-    pref_loc_flags: dict[str, int]  # location -> 0 (hard ban) | 1 (penalise) | 2 (ok/preferred)
-    date_loc2_only: dict[str, str]
-    date_loc2_banned: dict[str, str]
-    month_max: int = 0
-    month_avg: int = 0
-    idx: int = field(default=-1, repr=False, compare=False)
+    """Compact person record.
+
+    Availability is a bytearray over date ordinals (0 = no, 1 = yes, 2 = not given) and
+    location flags an array("h") indexed by location_id(). The constructor and the
+    dict-valued attributes keep their original shape; hot loops should use the
+    ordinal/location-id accessors (available_at, loc_flag_id, loc2_only_at, ...).
+    """
+
+    __slots__ = (
+        "name", "role", "month_max", "month_avg", "idx",
+        "_avail_base", "_avail", "_avail_extra", "_loc_flags", "_loc2_only", "_loc2_banned",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        role: Role,
+        availability: dict[str, bool],
+        pref_loc_flags: dict[str, int],  # location -> 0 (hard ban) | 1 (penalise) | 2 (ok/preferred)
+        date_loc2_only: dict[str, str],
+        date_loc2_banned: dict[str, str],
+        month_max: int = 0,
+        month_avg: int = 0,
+        idx: int = -1,
+    ) -> None:
+        self.name = name
+        self.role = role
+        self.month_max = month_max
+        self.month_avg = month_avg
+        self.idx = idx
+        self.availability = availability
+        self.pref_loc_flags = pref_loc_flags
+        self.date_loc2_only = date_loc2_only
+        self.date_loc2_banned = date_loc2_banned
+
+    @classmethod
+    def _from_packed(
+        cls,
+        name: str,
+        role: Role,
+        avail_base: int,
+        avail: bytearray,
+        avail_extra: dict[str, bool],
+        loc_flags: dict[int, int],
+        loc2_only: dict[int | str, int],
+        loc2_banned: dict[int | str, int],
+        month_max: int = 0,
+        month_avg: int = 0,
+    ) -> Person:
+        """Build from already packed fields (location ids, ordinals); used by person_list."""
+        self = cls.__new__(cls)
+        self.name, self.role, self.idx = name, role, -1
+        self.month_max, self.month_avg = month_max, month_avg
+        self._avail_base, self._avail, self._avail_extra = avail_base, avail, avail_extra
+        self._loc_flags = array("h", [_NO_FLAG]) * len(_LOC_NAMES)
+        for lid, v in loc_flags.items():
+            self._loc_flags[lid] = max(-32767, min(32767, v))
+        self._loc2_only, self._loc2_banned = loc2_only, loc2_banned
+        return self
+
+    # --- dict views (CSV/export/UI boundary) ---
+
+    @property
+    def availability(self) -> dict[str, bool]:
+        out = {
+            _iso(self._avail_base + i): bool(v) for i, v in enumerate(self._avail) if v != 2
+        }
+        out.update(self._avail_extra)
+        return out
+
+    @availability.setter
+    def availability(self, availability: dict[str, bool]) -> None:
+        ords: dict[int, bool] = {}
+        extra: dict[str, bool] = {}
+        for d, ok in availability.items():
+            o = date_ordinal(d)
+            if o is None:
+                extra[d] = bool(ok)
+            else:
+                ords[o] = bool(ok)
+        self._avail_base = min(ords) if ords else 0
+        self._avail = bytearray(b"\x02") * ((max(ords) - self._avail_base + 1) if ords else 0)
+        for o, ok in ords.items():
+            self._avail[o - self._avail_base] = 1 if ok else 0
+        self._avail_extra = extra
+
+    @property
+    def pref_loc_flags(self) -> dict[str, int]:
+        return {_LOC_NAMES[i]: v for i, v in enumerate(self._loc_flags) if v != _NO_FLAG}
+
+    @pref_loc_flags.setter
+    def pref_loc_flags(self, flags: dict[str, int]) -> None:
+        ids = {location_id(loc): int(v) for loc, v in flags.items()}
+        self._loc_flags = array("h", [_NO_FLAG]) * len(_LOC_NAMES)
+        for lid, v in ids.items():
+            self._loc_flags[lid] = max(-32767, min(32767, v))
+
+    @property
+    def date_loc2_only(self) -> dict[str, str]:
+        return {_iso(k): _LOC_NAMES[v] for k, v in self._loc2_only.items()}
+
+    @date_loc2_only.setter
+    def date_loc2_only(self, mapping: dict[str, str]) -> None:
+        self._loc2_only = _pack_loc2(mapping)
+
+    @property
+    def date_loc2_banned(self) -> dict[str, str]:
+        return {_iso(k): _LOC_NAMES[v] for k, v in self._loc2_banned.items()}
+
+    @date_loc2_banned.setter
+    def date_loc2_banned(self, mapping: dict[str, str]) -> None:
+        self._loc2_banned = _pack_loc2(mapping)
+
+    # --- fast accessors ---
+
+    def available_at(self, ordinal: int) -> bool:
+        i = ordinal - self._avail_base
+        return not 0 <= i < len(self._avail) or self._avail[i] != 0
+
+    def available_ordinals(self) -> list[int]:
+        """Ordinals explicitly marked available."""
+        base = self._avail_base
+        return [base + i for i, v in enumerate(self._avail) if v == 1]
+
+    def available_extra_keys(self) -> list[str]:
+        """Availability keys that are not ISO dates (kept verbatim) and are marked available."""
+        return [key for key, ok in self._avail_extra.items() if ok]
+
+    def loc_flag_id(self, lid: int) -> int:
+        v = self._loc_flags[lid] if lid < len(self._loc_flags) else _NO_FLAG
+        return 2 if v == _NO_FLAG else v
+
+    def loc2_only_at(self, ordinal: int) -> int | None:
+        return self._loc2_only.get(ordinal)
+
+    def loc2_banned_at(self, ordinal: int) -> int | None:
+        return self._loc2_banned.get(ordinal)
+
+    # --- original API ---
 
     def is_available(self, date: str) -> bool:
-        return bool(self.availability.get(date, True))
+        o = date_ordinal(date)
+        if o is None:
+            return bool(self._avail_extra.get(date, True))
+        return self.available_at(o)
 
     def loc_flag(self, location: str) -> int:
-        return self.pref_loc_flags.get(location, 2)
+        lid = _LOC_IDS.get(location)
+        return 2 if lid is None else self.loc_flag_id(lid)
 
     def to_dict(self) -> dict[str, Any]:
         return {
@@ -41,8 +216,21 @@ class Person:
             "month_avg": self.month_avg,
         }
 
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Person):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
 
-@dataclass
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return (
+            f"Person(name={self.name!r}, role={self.role!r}, "
+            f"month_max={self.month_max}, month_avg={self.month_avg})"
+        )
+
+
+@dataclass(slots=True)
 class Shift:
     location: str
     day: str
@@ -53,6 +241,12 @@ class Shift:
     allow_tester: bool = True
     testers: list[str] = field(default_factory=list)
     idx: int = field(default=-1, repr=False, compare=False)
+    ordinal: int = field(init=False, repr=False, compare=False)  # date_ordinal(date)
+    loc_id: int = field(init=False, repr=False, compare=False)  # location_id(location)
+
+    def __post_init__(self) -> None:
+        self.ordinal = date_ordinal(self.date)
+        self.loc_id = location_id(self.location)
 
     def to_dict(self) -> dict[str, Any]:
         return {
@@ -166,18 +360,23 @@ class PersonList(list):
         return PersonList._from_filtered(p for p in self if p.role == role)
 
     def filter_available_on(self, date: str) -> PersonList:
-        return PersonList._from_filtered(p for p in self if p.is_available(date))
+        o = date_ordinal(date)
+        if o is None:
+            return PersonList._from_filtered(p for p in self if p.is_available(date))
+        return PersonList._from_filtered(p for p in self if p.available_at(o))
 
     def filter_location_pref(self, location: str, min_flag: int = 1) -> PersonList:
         """Keep persons whose loc_flag for *location* is >= *min_flag*.
         min_flag=1 → include penalised (1) and preferred (2), exclude hard-banned (0).
         min_flag=2 → only explicitly preferred.
         """
-        return PersonList._from_filtered(p for p in self if p.loc_flag(location) >= min_flag)
+        lid = location_id(location)
+        return PersonList._from_filtered(p for p in self if p.loc_flag_id(lid) >= min_flag)
 
     def filter_location_not_banned(self, location: str) -> PersonList:
         """Exclude anyone hard-banned (flag == 0) from *location*."""
-        return PersonList._from_filtered(p for p in self if p.loc_flag(location) > 0)
+        lid = location_id(location)
+        return PersonList._from_filtered(p for p in self if p.loc_flag_id(lid) > 0)
 
     def filter_month_max(self, month: int, current_count: dict[str, int]) -> PersonList:
         """Keep persons who have not yet hit their month_max for *month*.
@@ -246,19 +445,144 @@ class ShiftList(list):
         return sorted({s.location for s in self})
 
 
-class AssignmentVars(dict):
-    """dict[(person.idx, shift.idx) -> BoolVar] for the solver assignment variables."""
+class AssignmentVars(MutableMapping):
+    """(person.idx, shift.idx) -> BoolVar, stored as a dense person x shift grid.
+
+    Behaves like the dict it replaces (``av[(p_idx, s_idx)]``, items(), ``in``) but keeps
+    the cells in one flat list with stride indexing. row/column and the person_* helpers
+    return slices without rebuilding key tuples.
+    """
+
+    __slots__ = ("_rows", "_cols", "_row_of", "_col_of", "_cells", "_shifts", "_groups")
+
+    def __init__(self, persons: Iterable[Person] = (), shifts: Iterable[Shift] = ()) -> None:
+        self._shifts = list(shifts)
+        self._rows = [p.idx for p in persons]
+        self._cols = [s.idx for s in self._shifts]
+        self._row_of = {idx: r for r, idx in enumerate(self._rows)}
+        self._col_of = {idx: c for c, idx in enumerate(self._cols)}
+        self._cells: list[Any] = [None] * (len(self._rows) * len(self._cols))
+        self._groups: dict[str, dict[Any, list[int]]] = {}
 
     @classmethod
-    def create(cls, persons: PersonList, shifts: ShiftList, model) -> AssignmentVars:
-        inst = cls()
+    def create(
+        cls, persons: PersonList, shifts: ShiftList, model, named: bool = False
+    ) -> AssignmentVars:
+        """One BoolVar per (person, shift). Names are only generated with *named* (verbose/debug
+        runs pass ctx.verbose); they are pure overhead otherwise."""
+        inst = cls(persons, shifts)
+        cells, new_bool = inst._cells, model.NewBoolVar
+        i = 0
         for person in persons:
-            for shift in shifts:
-                inst[(person.idx, shift.idx)] = model.NewBoolVar(
+            for shift in inst._shifts:
+                cells[i] = new_bool(
                     f"{person.name}_op_{shift.location}_{shift.day}_team{shift.team}_date_{shift.date}"
+                    if named else ""
                 )
+                i += 1
         return inst
 
+    @classmethod
+    def from_assigned(
+        cls, persons: PersonList, shifts: ShiftList, assigned: set[tuple[int, int]]
+    ) -> AssignmentVars:
+        """Constant 0/1 entries for a solution found outside the monolithic model."""
+        inst = cls(persons, shifts)
+        i = 0
+        for person in persons:
+            for shift in inst._shifts:
+                inst._cells[i] = int((person.idx, shift.idx) in assigned)
+                i += 1
+        return inst
+
+    # --- mapping protocol ---
+
+    def _pos(self, key: tuple[int, int]) -> int:
+        p_idx, s_idx = key
+        return self._row_of[p_idx] * len(self._cols) + self._col_of[s_idx]
+
+    def __getitem__(self, key: tuple[int, int]) -> Any:
+        try:
+            val = self._cells[self._pos(key)]
+        except (KeyError, TypeError, ValueError):
+            raise KeyError(key) from None
+        if val is None:
+            raise KeyError(key)
+        return val
+
+    def __setitem__(self, key: tuple[int, int], value: Any) -> None:
+        try:
+            self._cells[self._pos(key)] = value
+        except (KeyError, TypeError, ValueError):
+            raise KeyError(f"{key} valt buiten het persoon x shift raster") from None
+
+    def __delitem__(self, key: tuple[int, int]) -> None:
+        self[key]  # KeyError when absent
+        self._cells[self._pos(key)] = None
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        n = len(self._cols)
+        for i, val in enumerate(self._cells):
+            if val is not None:
+                yield self._rows[i // n], self._cols[i % n]
+
+    def __len__(self) -> int:
+        return sum(val is not None for val in self._cells)
+
+    def items(self):  # type: ignore[override]
+        n = len(self._cols)
+        return [
+            ((self._rows[i // n], self._cols[i % n]), val)
+            for i, val in enumerate(self._cells) if val is not None
+        ]
+
+    def values(self):  # type: ignore[override]
+        return [val for val in self._cells if val is not None]
+
+    # --- slicing ---
+
+    def row(self, person_idx: int) -> list:
+        """All variables of one person, in shift order."""
+        n = len(self._cols)
+        start = self._row_of[person_idx] * n
+        return self._cells[start:start + n]
+
+    def column(self, shift_idx: int) -> list:
+        """All variables of one shift, in person order."""
+        return self._cells[self._col_of[shift_idx]::len(self._cols)]
+
+    def _group(self, attr: str) -> dict[Any, list[int]]:
+        groups = self._groups.get(attr)
+        if groups is None:
+            groups = self._groups[attr] = {}
+            for c, shift in enumerate(self._shifts):
+                groups.setdefault(getattr(shift, attr), []).append(c)
+        return groups
+
+    def _row_slice(self, person_idx: int, attr: str, value: Any) -> list:
+        start = self._row_of[person_idx] * len(self._cols)
+        return [self._cells[start + c] for c in self._group(attr).get(value, ())]
+
+    def person_date(self, person_idx: int, date: str) -> list:
+        return self._row_slice(person_idx, "date", date)
+
+    def person_week(self, person_idx: int, weeknummer: int) -> list:
+        return self._row_slice(person_idx, "weeknummer", weeknummer)
+
+    def person_location(self, person_idx: int, location: str) -> list:
+        return self._row_slice(person_idx, "location", location)
+
+
+class FixedSolution:
+    """Stand-in for cp_model.CpSolver when assignment_vars already hold plain 0/1 ints.
+
+    Engines that do not solve the monolithic model (two-stage, flow, ...) store their
+    final assignment this way so export, penalties and diagnostics stay unchanged.
+    """
+
+    def Value(self, var) -> int:
+        return int(var)
+
 
 @dataclass
 class SolverResult:
@@ -275,3 +599,15 @@ class SolverContext:
     shifts: ShiftList
     assignment_vars: AssignmentVars = field(default_factory=lambda: AssignmentVars())
     weights: Weights = field(default_factory=Weights)
+    objective_terms: dict[str, Any] = field(default_factory=dict)  # component -> weighted expr
+    # Rolling horizon: shifts already committed outside ctx.shifts
+    carry_counts: dict[int, int] = field(default_factory=dict)  # person.idx -> committed shifts
+    carry_months: int = 0  # committed months not covered by ctx.shifts
+    calendar: Calendar | None = None  # shared per run; built from shifts when not given
+    exclusion_pairs: list[tuple[int, int]] = field(default_factory=list)  # person.idx pairs, never on one date
+    bounds: Any = None  # constraints.AssignmentBounds, set by add_hard_constraints
+    verbose: bool = False  # constraint logging and named variables; per run, not process-wide
+
+    def __post_init__(self) -> None:
+        if self.calendar is None:
+            self.calendar = Calendar.from_shifts(self.shifts)
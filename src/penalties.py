@@ -3,7 +3,7 @@ from collections import defaultdict
 from typing import Any, Dict, List, Tuple
 
 from models import PenaltyRow, SolverContext
-from roster_utils import group_shifts_by_month, group_shifts_by_iso_week, get_available_months
+from roster_utils import group_shifts_by_month, group_shifts_by_iso_week, get_available_months, month_label
 
 
 def _assigned(solver, var) -> int:
@@ -16,7 +16,7 @@ def compute_location_penalty_rows(ctx: SolverContext, solver, weight: int) -> Li
         for shift in ctx.shifts:
             if not _assigned(solver, ctx.assignment_vars[(person.idx, shift.idx)]):
                 continue
-            if person.loc_flag(shift.location) == 1:
+            if person.loc_flag_id(shift.loc_id) == 1:
                 rows.append(PenaltyRow(
                     component="location", person=person.name, units=1, weighted=weight,
                     extra={"date": shift.date, "day": shift.day, "location": shift.location, "team": shift.team},
@@ -25,34 +25,34 @@ def compute_location_penalty_rows(ctx: SolverContext, solver, weight: int) -> Li
 
 
 def compute_monthly_min_avail_rows(ctx: SolverContext, solver, weight: int) -> List[PenaltyRow]:
-    month_to_shifts = group_shifts_by_month(ctx.shifts)
+    month_to_shifts = group_shifts_by_month(ctx.shifts, ctx.calendar)
     rows: List[PenaltyRow] = []
     for person in ctx.persons:
         months_available = get_available_months(person, ctx.shifts)
-        for m, s_indices in month_to_shifts.items():
-            if m not in months_available:
+        for ym, s_indices in month_to_shifts.items():
+            if ym not in months_available:
                 continue
             assigned = sum(_assigned(solver, ctx.assignment_vars[(person.idx, s)]) for s in s_indices)
             if assigned == 0:
                 rows.append(PenaltyRow(
                     component="monthly_min_avail", person=person.name, units=1, weighted=weight,
-                    extra={"month": m, "assigned_in_month": assigned},
+                    extra={"month": month_label(ym), "assigned_in_month": assigned},
                 ))
     return rows
 
 
 def compute_monthly_excess_rows(ctx: SolverContext, solver, weight: int) -> List[PenaltyRow]:
-    month_to_shifts = group_shifts_by_month(ctx.shifts)
+    month_to_shifts = group_shifts_by_month(ctx.shifts, ctx.calendar)
     rows: List[PenaltyRow] = []
     for person in ctx.persons:
         cap = person.month_max
-        for m, s_indices in month_to_shifts.items():
+        for ym, s_indices in month_to_shifts.items():
             assigned = sum(_assigned(solver, ctx.assignment_vars[(person.idx, s)]) for s in s_indices)
             excess = max(0, assigned - cap)
             if excess > 0:
                 rows.append(PenaltyRow(
                     component="monthly", person=person.name, units=excess, weighted=excess * weight,
-                    extra={"month": m, "assigned_in_month": assigned, "cap": cap},
+                    extra={"month": month_label(ym), "assigned_in_month": assigned, "cap": cap},
                 ))
     return rows
 
@@ -64,7 +64,7 @@ def compute_fairness_rows(ctx: SolverContext, solver, weight: int) -> List[Penal
 
 
 def compute_weekly_multi_rows(ctx: SolverContext, solver, weight: int) -> List[PenaltyRow]:
-    week_to_shifts = group_shifts_by_iso_week(ctx.shifts)
+    week_to_shifts = group_shifts_by_iso_week(ctx.shifts, ctx.calendar)
     rows: List[PenaltyRow] = []
     for person in ctx.persons:
         for (y, w), s_indices in week_to_shifts.items():
@@ -79,12 +79,7 @@ def compute_weekly_multi_rows(ctx: SolverContext, solver, weight: int) -> List[P
 
 
 def compute_monthly_avg_rows(ctx: SolverContext, solver, weight: int) -> List[PenaltyRow]:
-    from datetime import datetime
-    ym_keys = {
-        (datetime.strptime(s.date, "%Y-%m-%d").year, datetime.strptime(s.date, "%Y-%m-%d").month)
-        for s in ctx.shifts
-    }
-    n_months = len(ym_keys)
+    n_months = len({ctx.calendar.year_month(s.date) for s in ctx.shifts})
     rows: List[PenaltyRow] = []
     for person in ctx.persons:
         target_total = person.month_avg * n_months
@@ -102,12 +97,8 @@ def compute_monthly_avg_rows(ctx: SolverContext, solver, weight: int) -> List[Pe
     return rows
 
 
-def export_penalties(
-    ctx: SolverContext,
-    solver,
-    filepath: str,
-) -> Tuple[List[PenaltyRow], Dict[str, Any]]:
-    """Compute a long-form penalty list and write to CSV. Returns (rows, summary)."""
+def compute_penalties(ctx: SolverContext, solver) -> Tuple[List[PenaltyRow], Dict[str, Any]]:
+    """Long-form penalty list of a solved roster and its summary. Returns (rows, summary)."""
     weights = ctx.weights.as_dict()
     all_rows: List[PenaltyRow] = (
         compute_location_penalty_rows(ctx, solver, weights.get("location", 1))
@@ -123,9 +114,12 @@ def export_penalties(
     for r in all_rows:
         by_component[r.component] += r.weighted
 
-    summary = {"total_weighted": total_weighted, "by_component": dict(by_component)}
+    return all_rows, {"total_weighted": total_weighted, "by_component": dict(by_component)}
+
 
-    row_dicts = [r.to_dict() for r in all_rows]
+def write_penalties(rows: List[PenaltyRow], summary: Dict[str, Any], filepath: str) -> None:
+    """Write *rows* to *filepath* and the per-component totals to '<filepath>_summary.csv'."""
+    row_dicts = [r.to_dict() for r in rows]
     fieldnames = sorted({k for d in row_dicts for k in d.keys()})
     with open(filepath, "w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(f, fieldnames=fieldnames)
@@ -136,8 +130,17 @@ def export_penalties(
     with open(summary_path, "w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
         writer.writerow(["component", "weighted_total"])
-        for comp, val in by_component.items():
+        for comp, val in summary["by_component"].items():
             writer.writerow([comp, val])
-        writer.writerow(["__total__", total_weighted])
+        writer.writerow(["__total__", summary["total_weighted"]])
 
-    return all_rows, summary
\ No newline at end of file
+
+def export_penalties(
+    ctx: SolverContext,
+    solver,
+    filepath: str,
+) -> Tuple[List[PenaltyRow], Dict[str, Any]]:
+    """Compute a long-form penalty list and write to CSV. Returns (rows, summary)."""
+    rows, summary = compute_penalties(ctx, solver)
+    write_penalties(rows, summary, filepath)
+    return rows, summary
@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-from datetime import datetime
 from typing import List
 from ortools.sat.python import cp_model
 
@@ -8,18 +7,27 @@ from models import SolverContext
 from roster_utils import group_shifts_by_month, group_shifts_by_iso_week, get_available_months
 
 
+def _upper(ctx: SolverContext, person, shift_idxs) -> int:
+    """Tight upper bound on person's assignments among shift_idxs (len() without bounds)."""
+    if ctx.bounds is None:
+        return len(shift_idxs)
+    return ctx.bounds.person_upper(person, shift_idxs)
+
+
 def build_monthly_max_excess_vars(ctx: SolverContext) -> list:
     model, av = ctx.model, ctx.assignment_vars
-    month_to_shifts = group_shifts_by_month(ctx.shifts)
+    month_to_shifts = group_shifts_by_month(ctx.shifts, ctx.calendar)
     zero = model.NewIntVar(0, 0, "zero_const")
     excess_vars = []
     for person in ctx.persons:
         cap = person.month_max
-        for m, month_shifts in month_to_shifts.items():
-            m_count = len(month_shifts)
-            diff = model.NewIntVar(-cap, m_count - cap, f"diff_p{person.idx}_m{m}")
+        for (y, m), month_shifts in month_to_shifts.items():
+            m_ub = _upper(ctx, person, month_shifts)
+            if m_ub <= cap:
+                continue  # the cap can never be exceeded
+            diff = model.NewIntVar(-cap, m_ub - cap, f"diff_p{person.idx}_{y}m{m}")
             model.Add(diff == sum(av[(person.idx, s)] for s in month_shifts) - cap)
-            excess = model.NewIntVar(0, max(0, m_count - cap), f"excess_p{person.idx}_m{m}")
+            excess = model.NewIntVar(0, m_ub - cap, f"excess_p{person.idx}_{y}m{m}")
             model.AddMaxEquality(excess, [diff, zero])
             excess_vars.append(excess)
     return excess_vars
@@ -27,23 +35,23 @@ def build_monthly_max_excess_vars(ctx: SolverContext) -> list:
 
 def build_monthly_avg_cost_vars(ctx: SolverContext, weight: int) -> list:
     model, av = ctx.model, ctx.assignment_vars
-    ym_keys = {
-        (datetime.strptime(s.date, "%Y-%m-%d").year, datetime.strptime(s.date, "%Y-%m-%d").month)
-        for s in ctx.shifts
-    }
-    n_months = len(ym_keys)
+    n_months = len({ctx.calendar.year_month(s.date) for s in ctx.shifts}) + ctx.carry_months
     zero = model.NewIntVar(0, 0, "zero_const_avg_total")
     cost_vars = []
-    total_shifts = len(ctx.shifts)
+    all_idxs = [s.idx for s in ctx.shifts]
     for person in ctx.persons:
         target_total = person.month_avg * n_months
-        diff = model.NewIntVar(target_total - total_shifts, target_total, f"avg_total_diff_p{person.idx}")
-        model.Add(diff == target_total - sum(av[(person.idx, s.idx)] for s in ctx.shifts))
-        deficit = model.NewIntVar(0, max(0, target_total), f"avg_total_deficit_p{person.idx}")
+        carry = ctx.carry_counts.get(person.idx, 0)
+        ub = _upper(ctx, person, all_idxs)
+        diff = model.NewIntVar(target_total - ub - carry, target_total - carry, f"avg_total_diff_p{person.idx}")
+        model.Add(diff == target_total - carry - sum(av[(person.idx, s)] for s in all_idxs))
+        # deficit lies in [lo, hi]; the cost table still starts at index 0 for AddElement
+        lo = max(0, target_total - carry - ub)
+        hi = max(0, target_total - carry)
+        deficit = model.NewIntVar(lo, hi, f"avg_total_deficit_p{person.idx}")
         model.AddMaxEquality(deficit, [diff, zero])
-        costs = [weight * i * i for i in range(max(0, target_total) + 1)]
-        cost_ub = costs[-1] if costs else 0
-        cost_var = model.NewIntVar(0, cost_ub, f"avg_total_cost_p{person.idx}")
+        costs = [weight * i * i for i in range(hi + 1)]
+        cost_var = model.NewIntVar(costs[lo], costs[hi], f"avg_total_cost_p{person.idx}")
         model.AddElement(deficit, costs, cost_var)
         cost_vars.append(cost_var)
     return cost_vars
@@ -51,15 +59,17 @@ def build_monthly_avg_cost_vars(ctx: SolverContext, weight: int) -> list:
 
 def build_weekly_multi_excess_vars(ctx: SolverContext) -> list:
     model, av = ctx.model, ctx.assignment_vars
-    week_to_shifts = group_shifts_by_iso_week(ctx.shifts)
+    week_to_shifts = group_shifts_by_iso_week(ctx.shifts, ctx.calendar)
     zero = model.NewIntVar(0, 0, "zero_const_week")
     excess_vars = []
     for person in ctx.persons:
         for (y, w), week_shifts in week_to_shifts.items():
-            mcount = len(week_shifts)
-            diff = model.NewIntVar(-1, max(0, mcount - 1), f"wk_diff_p{person.idx}_{y}w{w}")
+            w_ub = _upper(ctx, person, week_shifts)
+            if w_ub <= 1:
+                continue  # at most one shift this week: never an excess
+            diff = model.NewIntVar(-1, w_ub - 1, f"wk_diff_p{person.idx}_{y}w{w}")
             model.Add(diff == sum(av[(person.idx, s)] for s in week_shifts) - 1)
-            excess = model.NewIntVar(0, max(0, mcount - 1), f"wk_excess_p{person.idx}_{y}w{w}")
+            excess = model.NewIntVar(0, w_ub - 1, f"wk_excess_p{person.idx}_{y}w{w}")
             model.AddMaxEquality(excess, [diff, zero])
             excess_vars.append(excess)
     return excess_vars
@@ -67,16 +77,16 @@ def build_weekly_multi_excess_vars(ctx: SolverContext) -> list:
 
 def build_monthly_min_avail_missing_vars(ctx: SolverContext) -> list:
     model, av = ctx.model, ctx.assignment_vars
-    month_to_shifts = group_shifts_by_month(ctx.shifts)
+    month_to_shifts = group_shifts_by_month(ctx.shifts, ctx.calendar)
     missing_vars = []
     for person in ctx.persons:
         months_available = get_available_months(person, ctx.shifts)
-        for m, s_indices in month_to_shifts.items():
-            if m not in months_available:
+        for (y, m), s_indices in month_to_shifts.items():
+            if (y, m) not in months_available:
                 continue
-            assigned_sum = model.NewIntVar(0, len(s_indices), f"ass_sum_p{person.idx}_m{m}")
+            assigned_sum = model.NewIntVar(0, _upper(ctx, person, s_indices), f"ass_sum_p{person.idx}_{y}m{m}")
             model.Add(assigned_sum == sum(av[(person.idx, s)] for s in s_indices))
-            missing = model.NewBoolVar(f"miss_p{person.idx}_m{m}")
+            missing = model.NewBoolVar(f"miss_p{person.idx}_{y}m{m}")
             model.Add(assigned_sum == 0).OnlyEnforceIf(missing)
             model.Add(assigned_sum >= 1).OnlyEnforceIf(missing.Not())
             missing_vars.append(missing)
@@ -88,24 +98,23 @@ def build_location_penalties(ctx: SolverContext) -> list:
         ctx.assignment_vars[(person.idx, shift.idx)]
         for person in ctx.persons
         for shift in ctx.shifts
-        if person.loc_flag(shift.location) == 1
+        if person.loc_flag_id(shift.loc_id) == 1
     ]
 
 
 def build_location_penalty_span_vars(ctx: SolverContext):
     model, av = ctx.model, ctx.assignment_vars
-    n_shifts = len(ctx.shifts)
     loc_penalty_counts = []
+    count_ubs = []
     for person in ctx.persons:
-        terms = [
-            av[(person.idx, shift.idx)]
-            for shift in ctx.shifts
-            if person.loc_flag(shift.location) == 1
-        ]
-        if terms:
-            cnt = model.NewIntVar(0, len(terms), f"loc_penalty_count_p{person.idx}")
-            model.Add(cnt == sum(terms))
+        pen_idxs = [shift.idx for shift in ctx.shifts if person.loc_flag_id(shift.loc_id) == 1]
+        if pen_idxs:
+            ub = _upper(ctx, person, pen_idxs)
+            count_ubs.append(ub)
+            cnt = model.NewIntVar(0, ub, f"loc_penalty_count_p{person.idx}")
+            model.Add(cnt == sum(av[(person.idx, s)] for s in pen_idxs))
         else:
+            count_ubs.append(0)
             cnt = model.NewIntVar(0, 0, f"loc_penalty_count_p{person.idx}_zero")
             model.Add(cnt == 0)
         loc_penalty_counts.append(cnt)
@@ -114,8 +123,8 @@ def build_location_penalty_span_vars(ctx: SolverContext):
         zero = model.NewIntVar(0, 0, "loc_penalty_span_zero")
         return zero, zero
 
-    max_loc = model.NewIntVar(0, n_shifts, "max_loc_penalties")
-    min_loc = model.NewIntVar(0, n_shifts, "min_loc_penalties")
+    max_loc = model.NewIntVar(0, max(count_ubs), "max_loc_penalties")
+    min_loc = model.NewIntVar(0, min(count_ubs), "min_loc_penalties")
     model.AddMaxEquality(max_loc, loc_penalty_counts)
     model.AddMinEquality(min_loc, loc_penalty_counts)
     return max_loc, min_loc
@@ -123,13 +132,19 @@ def build_location_penalty_span_vars(ctx: SolverContext):
 
 def build_fairness_span_vars(ctx: SolverContext):
     model, av = ctx.model, ctx.assignment_vars
-    n = len(ctx.shifts)
-    shifts_per_tester = [
-        sum(av[(person.idx, shift.idx)] for shift in ctx.shifts)
-        for person in ctx.persons
-    ]
-    max_shifts = model.NewIntVar(0, n, "max_shifts")
-    min_shifts = model.NewIntVar(0, n, "min_shifts")
+    all_idxs = [s.idx for s in ctx.shifts]
+    shifts_per_tester = []
+    totals_lb, totals_ub = [], []
+    for person in ctx.persons:
+        carry = ctx.carry_counts.get(person.idx, 0)
+        shifts_per_tester.append(sum(av[(person.idx, s)] for s in all_idxs) + carry)
+        totals_lb.append(carry)
+        totals_ub.append(_upper(ctx, person, all_idxs) + carry)
+    floor = ctx.bounds.max_total_floor if ctx.bounds is not None else 0
+    max_shifts = model.NewIntVar(
+        max(totals_lb + [floor]), max(max(totals_ub, default=0), floor), "max_shifts"
+    )
+    min_shifts = model.NewIntVar(min(totals_lb, default=0), min(totals_ub, default=0), "min_shifts")
     model.AddMaxEquality(max_shifts, shifts_per_tester)
     model.AddMinEquality(min_shifts, shifts_per_tester)
     return max_shifts, min_shifts
@@ -139,10 +154,10 @@ def build_coverage_deficit_vars(ctx: SolverContext, target_per_shift: int = 2) -
     """Per-shift deficit vars: max(0, target - assigned). Used in partial mode."""
     model, av = ctx.model, ctx.assignment_vars
     zero = model.NewIntVar(0, 0, "zero_const_cov")
-    n = len(ctx.persons)
     deficit_vars = []
     for shift in ctx.shifts:
         total = sum(av[(p.idx, shift.idx)] for p in ctx.persons)
+        n = len(ctx.persons) if ctx.bounds is None else ctx.bounds.shift_upper(shift, ctx.persons)
         assigned_var = model.NewIntVar(0, n, f"cov_assigned_s{shift.idx}")
         model.Add(assigned_var == total)
         diff = model.NewIntVar(-target_per_shift, target_per_shift, f"cov_diff_s{shift.idx}")
@@ -153,7 +168,8 @@ def build_coverage_deficit_vars(ctx: SolverContext, target_per_shift: int = 2) -
     return deficit_vars
 
 
-def apply_objective(ctx: SolverContext) -> None:
+def build_objective_terms(ctx: SolverContext) -> dict:
+    """Return {component: weighted expression} for every component with a non-zero weight."""
     w = ctx.weights
     loc_penalties = build_location_penalties(ctx)
     monthly_excess = build_monthly_max_excess_vars(ctx)
@@ -164,19 +180,26 @@ def apply_objective(ctx: SolverContext) -> None:
     max_loc_pen, min_loc_pen = build_location_penalty_span_vars(ctx)
 
     loc_fairness_w = w.location_fairness or w.fairness
-    coverage_term = 0
+    terms = {
+        "location": (w.location, sum(loc_penalties) * w.location),
+        "fairness": (w.fairness, (max_shifts - min_shifts) * w.fairness),
+        "location_fairness": (loc_fairness_w, (max_loc_pen - min_loc_pen) * loc_fairness_w),
+        "monthly": (w.monthly, sum(monthly_excess) * w.monthly),
+        "monthly_avg": (w.monthly_avg, sum(avg_costs)),  # already scaled by monthly_avg weight
+        "weekly_multi": (w.weekly_multi, sum(weekly_multi) * w.weekly_multi),
+        "monthly_min_avail": (w.monthly_min_avail, sum(min_av_missing) * w.monthly_min_avail),
+    }
     if w.coverage:
         coverage_deficits = build_coverage_deficit_vars(ctx)
-        coverage_term = sum(coverage_deficits) * w.coverage
-
-    expr = (
-        sum(loc_penalties) * w.location
-        + (max_shifts - min_shifts) * w.fairness
-        + (max_loc_pen - min_loc_pen) * loc_fairness_w
-        + sum(monthly_excess) * w.monthly
-        + sum(avg_costs)  # already scaled by monthly_avg weight
-        + sum(weekly_multi) * w.weekly_multi
-        + sum(min_av_missing) * w.monthly_min_avail
-        + coverage_term
-    )
-    ctx.model.Minimize(expr)
\ No newline at end of file
+        terms["coverage"] = (w.coverage, sum(coverage_deficits) * w.coverage)
+    return {key: expr for key, (weight, expr) in terms.items() if weight}
+
+
+def build_objective_expr(ctx: SolverContext):
+    """Build the weighted objective expression without setting it on the model."""
+    ctx.objective_terms = build_objective_terms(ctx)
+    return sum(ctx.objective_terms.values())
+
+
+def apply_objective(ctx: SolverContext) -> None:
+    ctx.model.Minimize(build_objective_expr(ctx))
@@ -0,0 +1,162 @@
+"""Change-detecting, atomic JSON persistence for UI-edited files (shift plans, locations config).
+
+- save_json compares the payload with what is on disk and does not touch the file when
+  nothing changed, so Streamlit reruns cause no writes.
+- Writes go to a temp file in the same directory that is then os.replace'd over the
+  target: readers (the solver, other sessions) see the old or the new file, never a
+  half-written one.
+- Every write bumps a `_version` counter stored in the file. Callers pass the version they
+  loaded to learn whether another session saved in between (SaveResult.conflict).
+- save_json_later coalesces rapid edits: the payload is kept in memory and written once
+  the edits stop for COALESCE_SECONDS; flush() writes pending payloads right away (call it
+  before something reads the file).
+
+Sessions of one Streamlit server are threads of one process; their writes to the same path
+are serialised by a per-path lock.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+VERSION_KEY = "_version"
+COALESCE_SECONDS = 1.0
+
+_locks: dict[str, threading.RLock] = {}
+_locks_guard = threading.Lock()
+_pending: dict[str, tuple[threading.Timer, dict[str, Any]]] = {}
+_pending_guard = threading.Lock()
+
+
+@dataclass
+class SaveResult:
+    written: bool  # False when the file already held this payload
+    version: int  # version of the file after the call
+    conflict: bool = False  # the file was saved by someone else since expected_version
+
+
+def _key(path: str | Path) -> str:
+    return str(Path(path).resolve())
+
+
+def _lock(path: str | Path) -> threading.RLock:
+    with _locks_guard:
+        return _locks.setdefault(_key(path), threading.RLock())
+
+
+def read_json(path: str | Path) -> tuple[dict[str, Any] | None, int]:
+    """(payload without the version field, version); (None, 0) when missing or unreadable."""
+    try:
+        doc = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None, 0
+    if not isinstance(doc, dict):
+        return None, 0
+    version = doc.pop(VERSION_KEY, 0)
+    return doc, version if isinstance(version, int) else 0
+
+
+def _atomic_write(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def _cancel_pending(path: str | Path) -> dict[str, Any] | None:
+    with _pending_guard:
+        entry = _pending.pop(_key(path), None)
+    if entry is None:
+        return None
+    entry[0].cancel()
+    return entry[1]
+
+
+def _write(target: Path, payload: dict[str, Any], expected_version: int | None) -> SaveResult:
+    with _lock(target):
+        current, version = read_json(target)
+        conflict = expected_version is not None and version != expected_version
+        if current == payload:
+            return SaveResult(written=False, version=version, conflict=conflict)
+        version += 1
+        _atomic_write(target, json.dumps({**payload, VERSION_KEY: version}, ensure_ascii=False, indent=2))
+        return SaveResult(written=True, version=version, conflict=conflict)
+
+
+def save_json(path: str | Path, payload: dict[str, Any], expected_version: int | None = None) -> SaveResult:
+    """Write *payload* (indent=2) unless the file already holds it; see the module docstring.
+
+    A pending save_json_later for the same path is dropped: this explicit save wins.
+    """
+    payload = {k: v for k, v in payload.items() if k != VERSION_KEY}
+    target = Path(path)
+    with _lock(target):  # waits for a pending write that is in progress
+        _cancel_pending(target)
+        return _write(target, payload, expected_version)
+
+
+def _write_pending(key: str) -> None:
+    # The entry stays in _pending until it is on disk, and the path lock is held while
+    # writing: a flush() that runs meanwhile waits for this write instead of missing it.
+    with _lock(key):
+        with _pending_guard:
+            entry = _pending.get(key)
+        if entry is None:  # flushed or superseded by save_json meanwhile
+            return
+        try:
+            _write(Path(key), entry[1], None)
+        except OSError as e:
+            print(f"Kon {key} niet opslaan: {e}")
+        finally:
+            with _pending_guard:
+                if _pending.get(key) is entry:
+                    del _pending[key]
+
+
+def save_json_later(path: str | Path, payload: dict[str, Any], delay: float = COALESCE_SECONDS) -> bool:
+    """Schedule *payload* for writing after *delay* seconds without newer edits.
+
+    Returns False when there is nothing to write (the file already holds the payload); a
+    pending write that is undone before it fires is cancelled.
+    """
+    payload = {k: v for k, v in payload.items() if k != VERSION_KEY}
+    key = _key(path)
+    with _pending_guard:
+        entry = _pending.get(key)
+        if entry is not None and entry[1] == payload:
+            return True  # already scheduled
+        if entry is not None:
+            entry[0].cancel()
+            del _pending[key]
+        if read_json(path)[0] == payload:
+            return False
+        timer = threading.Timer(delay, _write_pending, args=(key,))
+        timer.daemon = True
+        _pending[key] = (timer, payload)
+        timer.start()
+    return True
+
+
+def flush(path: str | Path | None = None) -> None:
+    """Write pending save_json_later payloads now (only *path*'s when given).
+
+    Returns once they are on disk, also when a timer is writing one at that moment.
+    """
+    with _pending_guard:
+        keys = [_key(path)] if path is not None else list(_pending)
+    for key in keys:
+        with _lock(key):
+            entry = _cancel_pending(key)
+            if entry is not None:
+                _write(Path(key), entry, None)
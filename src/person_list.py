@@ -1,103 +1,293 @@
+"""Preferences CSV -> PersonList.
+
+The header is classified once (date columns, location-only date columns, named
+columns) and every row is then read with a plain csv.reader into a persons x dates
+byte matrix, which is packed straight into Person objects. The matrix is also kept as
+a binary sidecar next to the CSV (see load_preference_matrix), so a file that was
+parsed before is only hashed and deserialized.
+"""
+from __future__ import annotations
+
 import csv
+import hashlib
+import io
+import json
+import os
 import re
+import struct
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
 from config import get_locations_config
-from models import Person, PersonList, Role
+from models import Person, PersonList, Role, location_id
+from planning_calendar import date_ordinal
+
+_DATE_FIELD = re.compile(r"^(?:0?[1-9]|[12][0-9]|3[01])-(?:0?[1-9]|1[0-2])$")
+_LOC_ONLY_DATE_FIELD = re.compile(r"^(?:0?[1-9]|[12][0-9]|3[01])-(?:0?[1-9]|1[0-2])u$")
+_TRUE_VALUES = {"true", "1", "yes", "y", "ja"}
+_SNAPSHOT_MAGIC = b"RPREF1\n"  # bump when the parse rules or the layout change
 
 
 def is_date_field(keyname: str) -> bool:
-    return bool(re.match(r"^(?:0?[1-9]|[12][0-9]|3[01])-(?:0?[1-9]|1[0-2])$", keyname.strip()))
+    return bool(_DATE_FIELD.match(keyname.strip()))
 
 
 def is_location_only_date_field(keyname: str) -> bool:
-    return bool(re.match(r"^(?:0?[1-9]|[12][0-9]|3[01])-(?:0?[1-9]|1[0-2])u$", keyname.strip()))
+    return bool(_LOC_ONLY_DATE_FIELD.match(keyname.strip()))
+
+
+def _date_key(day_month: str, year: int) -> str:
+    """'1-4' -> '2026-04-01'."""
+    try:
+        parts = day_month.split("-")
+        return f"{year}-{int(parts[1]):02d}-{int(parts[0]):02d}"
+    except (ValueError, IndexError):
+        return day_month
+
+
+class _Truth(dict):
+    """cell text -> 0/1, filled on first sight; a sheet only has a handful of distinct values."""
+
+    def __missing__(self, value: str | None) -> int:
+        flag = self[value] = int(value is not None and value.strip().lower() in _TRUE_VALUES)
+        return flag
+
+
+def _to_int(value: str | None, default: int) -> int:
+    try:
+        s = "" if value is None else value.strip()
+        return int(s) if s != "" else default
+    except ValueError:
+        return default
+
+
+@dataclass
+class PreferenceMatrix:
+    """Parsed preferences CSV, column-oriented: one entry per person in every list."""
+
+    names: list[str] = field(default_factory=list)
+    roles: list[Role] = field(default_factory=list)
+    month_max: list[int] = field(default_factory=list)
+    month_avg: list[int] = field(default_factory=list)
+    locations: list[str] = field(default_factory=list)
+    pref_loc: list[list[int]] = field(default_factory=list)  # person -> flag per location
+    dates: list[str] = field(default_factory=list)  # YYYY-MM-DD per availability column
+    availability: list[bytearray] = field(default_factory=list)  # person -> 0/1 per date
+    loc2_dates: list[str] = field(default_factory=list)  # "<d-m>u" columns, only with a 3rd location
+    loc2_only: list[bytearray] = field(default_factory=list)  # person -> 1 only loc2 / 0 loc2 banned
+
+    def to_personlist(self) -> PersonList:
+        lids = [location_id(loc) for loc in self.locations]
+        loc2_id = location_id(self.locations[2]) if self.loc2_dates else -1
+        loc2_keys = [date_ordinal(d) or d for d in self.loc2_dates]
+
+        # Column -> offset in a bytearray spanning the first..last valid date.
+        ords = [date_ordinal(d) for d in self.dates]
+        valid = [i for i, o in enumerate(ords) if o is not None]
+        extra = [i for i, o in enumerate(ords) if o is None]
+        base = min((ords[i] for i in valid), default=0)
+        span = max((ords[i] for i in valid), default=base - 1) - base + 1
+        offsets = [ords[i] - base for i in valid]
+        direct = not extra and offsets == list(range(span))  # columns are exactly the span, in order
+
+        persons = []
+        for p, name in enumerate(self.names):
+            row = self.availability[p]
+            if direct:
+                avail = bytearray(row)
+            else:
+                avail = bytearray(b"\x02") * span
+                for off, i in zip(offsets, valid):
+                    avail[off] = row[i]
+            loc2_only: dict[int | str, int] = {}
+            loc2_banned: dict[int | str, int] = {}
+            if loc2_keys:
+                for key, flag in zip(loc2_keys, self.loc2_only[p]):
+                    (loc2_only if flag else loc2_banned)[key] = loc2_id
+            persons.append(Person._from_packed(
+                name=name,
+                role=self.roles[p],
+                avail_base=base,
+                avail=avail,
+                avail_extra={self.dates[i]: bool(row[i]) for i in extra},
+                loc_flags=dict(zip(lids, self.pref_loc[p])),
+                loc2_only=loc2_only,
+                loc2_banned=loc2_banned,
+                month_max=self.month_max[p],
+                month_avg=self.month_avg[p],
+            ))
+        return PersonList(persons)
+
+    def to_snapshot(self, key: str) -> bytes:
+        """Magic, JSON header, then the availability and loc2 matrices as raw bytes."""
+        header = json.dumps({
+            "key": key,
+            "names": self.names,
+            "roles": [r.value for r in self.roles],
+            "month_max": self.month_max,
+            "month_avg": self.month_avg,
+            "locations": self.locations,
+            "pref_loc": self.pref_loc,
+            "dates": self.dates,
+            "loc2_dates": self.loc2_dates,
+        }, ensure_ascii=False).encode("utf-8")
+        return b"".join([
+            _SNAPSHOT_MAGIC, struct.pack("<I", len(header)), header, *self.availability, *self.loc2_only,
+        ])
+
+    @classmethod
+    def from_snapshot(cls, buf: bytes, key: str) -> PreferenceMatrix | None:
+        """None when buf is not a snapshot for *key* (other content, year or locations)."""
+        start = len(_SNAPSHOT_MAGIC) + 4
+        if buf[:len(_SNAPSHOT_MAGIC)] != _SNAPSHOT_MAGIC or len(buf) < start:
+            return None
+        (hlen,) = struct.unpack_from("<I", buf, len(_SNAPSHOT_MAGIC))
+        try:
+            meta = json.loads(buf[start:start + hlen])
+        except ValueError:
+            return None
+        if meta.get("key") != key:
+            return None
+        n, nd, nl = len(meta["names"]), len(meta["dates"]), len(meta["loc2_dates"])
+        view = memoryview(buf)[start + hlen:]
+        if len(view) != n * (nd + nl):
+            return None
+        loc2_at = n * nd
+        return cls(
+            names=meta["names"],
+            roles=[Role(r) for r in meta["roles"]],
+            month_max=meta["month_max"],
+            month_avg=meta["month_avg"],
+            locations=meta["locations"],
+            pref_loc=meta["pref_loc"],
+            dates=meta["dates"],
+            availability=[bytearray(view[i * nd:(i + 1) * nd]) for i in range(n)],
+            loc2_dates=meta["loc2_dates"],
+            loc2_only=[bytearray(view[loc2_at + i * nl:loc2_at + (i + 1) * nl]) for i in range(n)] if nl else [],
+        )
+
+
+def _location_names(locations_config_path: str | None) -> list[str]:
+    loc_conf = get_locations_config(locations_config_path)
+    return [loc.get("name") for loc in loc_conf.get("locations", [])]
+
+
+def snapshot_path(csv_path: str | Path) -> Path:
+    """Sidecar file for a preferences CSV: '.<name>.prefcache' in the same directory."""
+    p = Path(csv_path)
+    return p.with_name(f".{p.name}.prefcache")
+
+
+def _snapshot_key(data: bytes, year: int, locations: list[str]) -> str:
+    """Content hash plus everything else the parse depends on (only location names matter)."""
+    h = hashlib.sha256(_SNAPSHOT_MAGIC)
+    h.update(json.dumps([year, locations], ensure_ascii=False).encode("utf-8"))
+    h.update(data)
+    return h.hexdigest()
+
+
+def load_preference_matrix(
+    csv_path: str,
+    year: int = 2026,
+    locations_config_path: str | None = None,
+    use_snapshot: bool = True,
+) -> PreferenceMatrix:
+    """read_preference_matrix through the binary sidecar: reuse it when the key matches,
+    otherwise parse and (re)write it. A directory that is not writable just means no cache.
+    """
+    if not use_snapshot:
+        return read_preference_matrix(csv_path, year, locations_config_path)
+    data = Path(csv_path).read_bytes()
+    locations = _location_names(locations_config_path)
+    key = _snapshot_key(data, year, locations)
+    snap = snapshot_path(csv_path)
+    try:
+        cached = PreferenceMatrix.from_snapshot(snap.read_bytes(), key)
+    except OSError:
+        cached = None
+    if cached is not None:
+        return cached
+
+    matrix = _parse_preferences(io.StringIO(data.decode("utf-8-sig"), newline=""), year, locations)
+    tmp = snap.with_name(f"{snap.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        tmp.write_bytes(matrix.to_snapshot(key))
+        os.replace(tmp, snap)
+    except OSError:
+        tmp.unlink(missing_ok=True)
+    return matrix
+
+
+def read_preference_matrix(
+    csv_path: str,
+    year: int = 2026,
+    locations_config_path: str | None = None,
+) -> PreferenceMatrix:
+    locations = _location_names(locations_config_path)
+    with open(csv_path, "r", newline="", encoding="utf-8-sig") as csvfile:
+        return _parse_preferences(csvfile, year, locations)
+
+
+def _parse_preferences(csvfile, year: int, locations: list[str]) -> PreferenceMatrix:
+    out = PreferenceMatrix(locations=locations)
+    sample = csvfile.read(4096)
+    csvfile.seek(0)
+    try:
+        delimiter = csv.Sniffer().sniff(sample, delimiters=",\t;").delimiter
+    except Exception:
+        delimiter = ","
+    reader = csv.reader(csvfile, delimiter=delimiter)
+    header = next(reader, None)
+    if header is None:
+        return out
+
+    # Header classification, once. Duplicate headers: the last column wins.
+    col: dict[str, int] = {}
+    for i, key in enumerate(header):
+        col[key] = i
+    date_col: dict[str, int] = {}
+    loc2_col: list[int] = []
+    for key, i in col.items():
+        key_str = key.strip()
+        if _DATE_FIELD.match(key_str):
+            date_col[_date_key(key_str, year)] = i
+        elif _LOC_ONLY_DATE_FIELD.match(key_str) and len(locations) > 2:
+            out.loc2_dates.append(_date_key(key_str.rstrip("u"), year))
+            loc2_col.append(i)
+    out.dates = list(date_col)
+    date_idx = list(date_col.values())
+    name_cols = [col[k] for k in ("Name", "name") if k in col]
+    tester_cols = [col[k] for k in ("Tester", "tester") if k in col]
+    pref_cols = [col.get(f"Pref_Loc_{i}") for i in range(len(locations))]
+    max_col, avg_col = col.get("Month_max"), col.get("Month_avg")
+    width = len(header)
+    truth = _Truth()
+
+    for row in reader:
+        if not row:
+            continue
+        if len(row) < width:
+            row += [None] * (width - len(row))
+        naam = next((row[i] for i in name_cols if row[i]), "").strip()
+        if not naam:
+            raise ValueError("CSV mist kolom 'Name' of bevat lege namen.")
+        tester_val = next((row[i] for i in tester_cols if row[i]), "").strip()
+        out.names.append(naam)
+        out.roles.append(Role.TESTER if tester_val.upper() == "TRUE" or tester_val == "1" else Role.PEER)
+        out.pref_loc.append([2 if i is None else _to_int(row[i], 2) for i in pref_cols])
+        out.month_max.append(0 if max_col is None else _to_int(row[max_col], 0))
+        out.month_avg.append(0 if avg_col is None else _to_int(row[avg_col], 0))
+        out.availability.append(bytearray(map(truth.__getitem__, map(row.__getitem__, date_idx))))
+        if loc2_col:
+            out.loc2_only.append(bytearray(map(truth.__getitem__, map(row.__getitem__, loc2_col))))
+    return out
 
 
 def csv_to_personlist(
     csv_path: str,
     year: int = 2026,
     locations_config_path: str | None = None,
+    use_snapshot: bool = True,
 ) -> PersonList:
-    person_list: PersonList = PersonList()
-    with open(csv_path, "r", newline="", encoding="utf-8-sig") as csvfile:
-        sample = csvfile.read(4096)
-        csvfile.seek(0)
-        try:
-            dialect = csv.Sniffer().sniff(sample, delimiters=",\t;")
-            delimiter = dialect.delimiter
-        except Exception:
-            delimiter = ","
-
-        reader = csv.DictReader(csvfile, delimiter=delimiter)
-
-        def _safe_str(v: object, default: str = "") -> str:
-            return default if v is None else str(v)
-
-        def _safe_int(v: object, default: int = 0) -> int:
-            try:
-                s = _safe_str(v, "").strip()
-                return int(s) if s != "" else default
-            except Exception:
-                return default
-
-        def _to_bool(v: object) -> bool:
-            if isinstance(v, bool):
-                return v
-            return _safe_str(v, "").strip().lower() in {"true", "1", "yes", "y", "ja"}
-
-        for row in reader:
-            naam = _safe_str(row.get("Name") or row.get("name"), "").strip()
-            if not naam:
-                raise ValueError("CSV mist kolom 'Name' of bevat lege namen.")
-
-            tester_val = _safe_str(row.get("Tester") or row.get("tester"), "").strip()
-            rol = Role.TESTER if tester_val.upper() == "TRUE" or tester_val == "1" else Role.PEER
-
-            loc_conf = get_locations_config(locations_config_path)
-            locations = [loc.get("name") for loc in loc_conf.get("locations", [])]
-            pref_loc_flags: dict[str, int] = {}
-            for idx, loc_name in enumerate(locations):
-                val = row.get(f"Pref_Loc_{idx}", None)
-                try:
-                    pref_loc_flags[loc_name] = int(val) if val is not None and str(val).strip() != "" else 2
-                except Exception:
-                    pref_loc_flags[loc_name] = 2
-
-            beschikbaar: dict[str, bool] = {}
-            date_loc2_only: dict[str, str] = {}
-            date_loc2_banned: dict[str, str] = {}
-            loc2_name: str | None = locations[2] if len(locations) > 2 else None
-            month_max = _safe_int(row.get("Month_max"), 0)
-            month_avg = _safe_int(row.get("Month_avg"), 0)
-
-            for key in row.keys():
-                key_str = str(key).strip()
-                if is_date_field(key_str):
-                    try:
-                        parts = key_str.split("-")
-                        date_str = f"{year}-{int(parts[1]):02d}-{int(parts[0]):02d}"
-                    except ValueError:
-                        date_str = key_str.strip()
-                    beschikbaar[date_str] = _to_bool(row.get(key))
-                elif is_location_only_date_field(key_str) and loc2_name:
-                    base = key_str.rstrip("u")
-                    try:
-                        parts = base.split("-")
-                        date_str = f"{year}-{int(parts[1]):02d}-{int(parts[0]):02d}"
-                    except (ValueError, IndexError):
-                        date_str = base
-                    if _to_bool(row.get(key)):
-                        date_loc2_only[date_str] = loc2_name
-                    else:
-                        date_loc2_banned[date_str] = loc2_name
-
-            person_list.append(Person(
-                name=naam,
-                role=rol,
-                availability=beschikbaar,
-                pref_loc_flags=pref_loc_flags,
-                date_loc2_only=date_loc2_only,
-                date_loc2_banned=date_loc2_banned,
-                month_max=int(month_max),
-                month_avg=int(month_avg),
-            ))
-    return PersonList(person_list)
+    return load_preference_matrix(csv_path, year, locations_config_path, use_snapshot).to_personlist()
@@ -0,0 +1,95 @@
+"""Precomputed calendar facts for the dates of a planning horizon.
+
+Date strings are parsed once per distinct date instead of in every grouping/penalty
+loop. The module is not called ``calendar`` so it does not shadow the stdlib module.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date as _date
+from functools import lru_cache
+from typing import Iterable
+
+
+@lru_cache(maxsize=None)
+def date_ordinal(date: str) -> int | None:
+    """Proleptic ordinal of a YYYY-MM-DD string, or None when it is not a valid date."""
+    try:
+        return _date.fromisoformat(date).toordinal()
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass(frozen=True, slots=True)
+class CalendarDay:
+    ordinal: int
+    weekday: int  # 0 = Monday
+    iso_week: tuple[int, int]  # (iso_year, iso_week)
+    year_month: tuple[int, int]  # (year, month)
+    quarter: int  # 1..4
+
+
+def _make_day(date: str) -> CalendarDay:
+    d = _date.fromisoformat(date)
+    iso = d.isocalendar()
+    return CalendarDay(
+        ordinal=d.toordinal(),
+        weekday=d.weekday(),
+        iso_week=(iso[0], iso[1]),
+        year_month=(d.year, d.month),
+        quarter=(d.month - 1) // 3 + 1,
+    )
+
+
+class Calendar:
+    """date string -> CalendarDay, built once per run from the shift plan.
+
+    Dates outside the plan are computed on first use and kept, so one instance can be
+    shared by every (filtered) shift list of a run.
+    """
+
+    __slots__ = ("_days",)
+
+    def __init__(self, dates: Iterable[str] = ()) -> None:
+        self._days: dict[str, CalendarDay] = {}
+        for d in dates:
+            self.day(d)
+
+    @classmethod
+    def from_shifts(cls, shifts: Iterable) -> Calendar:
+        return cls(s.date for s in shifts)
+
+    def day(self, date: str) -> CalendarDay:
+        """Raises ValueError for strings that are not YYYY-MM-DD dates."""
+        info = self._days.get(date)
+        if info is None:
+            info = self._days[date] = _make_day(date)
+        return info
+
+    def ordinal(self, date: str) -> int:
+        return self.day(date).ordinal
+
+    def weekday(self, date: str) -> int:
+        return self.day(date).weekday
+
+    def iso_week(self, date: str) -> tuple[int, int]:
+        return self.day(date).iso_week
+
+    def year_month(self, date: str) -> tuple[int, int]:
+        return self.day(date).year_month
+
+    def quarter(self, date: str) -> int:
+        return self.day(date).quarter
+
+    def year_month_of_ordinal(self, ordinal: int) -> tuple[int, int]:
+        d = _date.fromordinal(ordinal)
+        return d.year, d.month
+
+    def dates(self) -> list[str]:
+        return sorted(self._days)
+
+    def __contains__(self, date: object) -> bool:
+        return date in self._days
+
+    def __len__(self) -> int:
+        return len(self._days)
@@ -0,0 +1,158 @@
+"""Seed/parameter portfolio: N independent CP-SAT solves in a process pool, best one wins.
+
+The model is shipped to the workers as text-format proto, every worker gets an equal
+share of the cores. As soon as one worker proves optimality the others are stopped.
+"""
+from __future__ import annotations
+
+import csv
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from multiprocessing import Manager
+from pathlib import Path
+from typing import Any
+
+from ortools.sat.python import cp_model
+
+from models import AssignmentVars, FixedSolution, SolverContext, SolverResult
+
+PARAM_VARIANTS: list[dict[str, Any]] = [
+    {},
+    {"linearization_level": 2},
+    {"optimize_with_core": True},
+    {"cp_model_probing_level": 0},
+]
+
+STATS_FIELDS = ["timestamp", "seed", "variant", "status", "objective", "bound", "wall_time", "stopped"]
+
+
+def _load_model(model_text: str):
+    model = cp_model.CpModel()
+    proto = model.Proto()
+    if hasattr(proto, "parse_text_format"):
+        proto.parse_text_format(model_text)
+    else:  # ortools builds that still expose the protobuf message directly
+        from google.protobuf import text_format
+
+        text_format.Parse(model_text, proto)
+    return model
+
+
+def _solve_worker(
+    model_text: str,
+    seed: int,
+    variant: dict[str, Any],
+    num_workers: int,
+    time_limit: float | None,
+    stop_event,
+) -> dict[str, Any]:
+    model = _load_model(model_text)
+    solver = cp_model.CpSolver()
+    solver.parameters.random_seed = seed
+    solver.parameters.num_workers = num_workers
+    if time_limit:
+        solver.parameters.max_time_in_seconds = time_limit
+    for key, val in variant.items():
+        setattr(solver.parameters, key, val)
+
+    done = threading.Event()
+    stopped = threading.Event()
+
+    def _watch() -> None:
+        while not done.wait(0.1):
+            if stop_event.is_set():
+                stopped.set()
+                solver.StopSearch()
+                return
+
+    threading.Thread(target=_watch, daemon=True).start()
+    t0 = time.perf_counter()
+    status = solver.Solve(model)
+    done.set()
+    feasible = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+    return {
+        "seed": seed,
+        "variant": variant,
+        "status": int(status),
+        "status_name": solver.StatusName(status),
+        "objective": solver.ObjectiveValue() if feasible else None,
+        "bound": solver.BestObjectiveBound() if feasible else None,
+        "wall_time": round(time.perf_counter() - t0, 3),
+        "stopped": stopped.is_set(),
+        "values": list(solver.ResponseProto().solution) if feasible else [],
+    }
+
+
+def _write_stats(stats: list[dict[str, Any]], stats_path: str) -> None:
+    path = Path(stats_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    new_file = not path.exists()
+    ts = datetime.now().isoformat(timespec="seconds")
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=STATS_FIELDS)
+        if new_file:
+            writer.writeheader()
+        for r in stats:
+            writer.writerow({
+                "timestamp": ts, "seed": r["seed"], "variant": r["variant"], "status": r["status_name"],
+                "objective": r["objective"], "bound": r["bound"], "wall_time": r["wall_time"],
+                "stopped": r["stopped"],
+            })
+
+
+def solve_portfolio(
+    ctx: SolverContext,
+    n: int,
+    time_limit: float | None = None,
+    base_seed: int = 0,
+    stats_path: str | None = None,
+) -> SolverResult:
+    """Run *n* solves of ctx.model with different seeds/parameters and keep the best roster.
+
+    On success ctx.assignment_vars is replaced by constant 0/1 entries (see FixedSolution).
+    """
+    model_text = str(ctx.model.Proto())
+    per_worker = max(1, (os.cpu_count() or 1) // n)
+    stats: list[dict[str, Any]] = []
+    with Manager() as manager, ProcessPoolExecutor(max_workers=n) as pool:
+        stop_event = manager.Event()
+        futures = [
+            pool.submit(
+                _solve_worker, model_text, base_seed + i, PARAM_VARIANTS[i % len(PARAM_VARIANTS)],
+                per_worker, time_limit, stop_event,
+            )
+            for i in range(n)
+        ]
+        for fut in as_completed(futures):
+            res = fut.result()
+            stats.append(res)
+            if res["status"] == cp_model.OPTIMAL:
+                stop_event.set()
+
+    stats.sort(key=lambda r: r["seed"])
+    for r in stats:
+        print(
+            f"Portfolio seed={r['seed']} {r['variant']}: {r['status_name']} "
+            f"obj={r['objective']} bound={r['bound']} {r['wall_time']}s"
+            + (" (gestopt)" if r["stopped"] else "")
+        )
+    if stats_path:
+        try:
+            _write_stats(stats, stats_path)
+        except OSError as e:
+            print(f"Kon portfolio-statistieken niet schrijven: {e}")
+
+    feasible = [r for r in stats if r["values"]]
+    if not feasible:
+        status = cp_model.INFEASIBLE if any(r["status"] == cp_model.INFEASIBLE for r in stats) else cp_model.UNKNOWN
+        return SolverResult(solver=FixedSolution(), status=status)
+    best = min(feasible, key=lambda r: (r["status"] != cp_model.OPTIMAL, r["objective"]))
+    print(f"Portfolio: beste seed={best['seed']} obj={best['objective']}")
+    values = best["values"]
+    assigned = {key for key, var in ctx.assignment_vars.items() if values[var.Index()]}
+    ctx.assignment_vars = AssignmentVars.from_assigned(ctx.persons, ctx.shifts, assigned)
+    status = cp_model.OPTIMAL if best["status"] == cp_model.OPTIMAL else cp_model.FEASIBLE
+    return SolverResult(solver=FixedSolution(), status=status)
@@ -0,0 +1,121 @@
+"""Rolling-horizon solving: window by window over ISO weeks instead of one large model.
+
+Each window (e.g. 4 weeks) gets its own CpModel built with the regular constraint and
+objective builders on a ShiftList slice. Only the first weeks of a window are committed;
+the overlap is re-solved in the next window with the previous values as hints. Shifts
+already committed in the window's months enter the objective as constants (month caps,
+min-avail), everything committed before that as per-person carry counts.
+"""
+from __future__ import annotations
+
+import time
+
+from ortools.sat.python import cp_model
+
+from constraints import AssignmentBounds, add_hard_constraints
+from models import AssignmentVars, FixedSolution, ShiftList, SolverContext, SolverResult
+from penalty_terms import apply_objective
+from roster_utils import group_shifts_by_iso_week
+
+
+def solve_rolling_horizon(
+    ctx: SolverContext,
+    active: set[str],
+    partial: bool = False,
+    window_weeks: int = 4,
+    overlap_weeks: int = 1,
+    time_limit: float | None = None,
+) -> SolverResult:
+    """Solve ctx window by window; ctx.assignment_vars ends up as constant 0/1 entries."""
+    if overlap_weeks >= window_weeks:
+        raise ValueError("overlap_weeks moet kleiner zijn dan window_weeks")
+    weeks = sorted(group_shifts_by_iso_week(ctx.shifts, ctx.calendar).items())
+    step = window_weeks - overlap_weeks
+
+    committed: set[tuple[int, int]] = set()  # (person.idx, shift.idx) assigned and final
+    month_shifts: dict[tuple[int, int], list] = {}  # (year, month) -> committed shifts
+    month_counts: dict[tuple[int, int], dict[int, int]] = {}  # (year, month) -> person.idx -> count
+    hints: dict[tuple[int, int], int] = {}
+    status = cp_model.OPTIMAL
+    start = 0
+    while start < len(weeks):
+        window = weeks[start:start + window_weeks]
+        last = start + window_weeks >= len(weeks)
+        commit_weeks = {wk for wk, _ in (window if last else window[:step])}
+        window_idx = {s_idx for _, idxs in window for s_idx in idxs}
+
+        model = cp_model.CpModel()
+        win_shifts = ShiftList._from_filtered(ctx.shifts[i] for i in sorted(window_idx))
+        win = SolverContext(
+            model=model, persons=ctx.persons, shifts=win_shifts, weights=ctx.weights,
+            calendar=ctx.calendar, exclusion_pairs=ctx.exclusion_pairs, verbose=ctx.verbose,
+        )
+        win.assignment_vars = AssignmentVars.create(ctx.persons, win_shifts, model, named=ctx.verbose)
+        add_hard_constraints(win, active, partial)
+
+        # Objective over the window plus the committed shifts of the same months.
+        months = {ctx.calendar.year_month(s.date) for s in win_shifts}
+        in_months = [s for ym in months for s in month_shifts.get(ym, [])]
+        obj_shifts = ShiftList._from_filtered(sorted(in_months + list(win_shifts), key=lambda s: s.idx))
+        obj_av = AssignmentVars(ctx.persons, obj_shifts)
+        for p in ctx.persons:
+            for s in obj_shifts:
+                key = (p.idx, s.idx)
+                obj_av[key] = win.assignment_vars[key] if s.idx in window_idx else int(key in committed)
+        before = [ym for ym in month_counts if ym not in months]
+        carry_counts: dict[int, int] = {}
+        for ym in before:
+            for p_idx, cnt in month_counts[ym].items():
+                carry_counts[p_idx] = carry_counts.get(p_idx, 0) + cnt
+        obj_ctx = SolverContext(
+            model=model,
+            persons=ctx.persons,
+            shifts=obj_shifts,
+            assignment_vars=obj_av,
+            weights=ctx.weights,
+            carry_counts=carry_counts,
+            carry_months=len(before),
+            calendar=ctx.calendar,
+            verbose=ctx.verbose,
+        )
+        # Committed shifts satisfy the same hard constraints, so window bounds carry over.
+        obj_ctx.bounds = AssignmentBounds(obj_ctx, active)
+        apply_objective(obj_ctx)
+
+        for key, var in win.assignment_vars.items():
+            if key in hints:
+                model.AddHint(var, hints[key])
+
+        solver = cp_model.CpSolver()
+        if time_limit:
+            solver.parameters.max_time_in_seconds = time_limit
+        t0 = time.perf_counter()
+        status = solver.Solve(model)
+        print(
+            f"Horizon-venster week {window[0][0]}..{window[-1][0]}: "
+            f"{solver.StatusName(status)} ({time.perf_counter() - t0:.2f}s)"
+        )
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return SolverResult(solver=solver, status=status)
+
+        hints = {}
+        for wk, idxs in window:
+            for s_idx in idxs:
+                ym = ctx.calendar.year_month(ctx.shifts[s_idx].date)
+                if wk in commit_weeks:
+                    month_shifts.setdefault(ym, []).append(ctx.shifts[s_idx])
+                    month_counts.setdefault(ym, {})
+                for p in ctx.persons:
+                    val = solver.Value(win.assignment_vars[(p.idx, s_idx)])
+                    if wk not in commit_weeks:
+                        hints[(p.idx, s_idx)] = val
+                    elif val:
+                        committed.add((p.idx, s_idx))
+                        month_counts[ym][p.idx] = month_counts[ym].get(p.idx, 0) + 1
+        if last:
+            break
+        start += step
+
+    ctx.assignment_vars = AssignmentVars.from_assigned(ctx.persons, ctx.shifts, committed)
+    final = cp_model.OPTIMAL if status == cp_model.OPTIMAL and len(weeks) <= window_weeks else cp_model.FEASIBLE
+    return SolverResult(solver=FixedSolution(), status=final)
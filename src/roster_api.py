@@ -0,0 +1,383 @@
+"""Library entry point: ``solve_roster(RosterParams(...)) -> RosterResult``.
+
+main.py is a thin CLI over this module and the UI calls it in-process. Importing this
+module is cheap: ortools and the solver modules are only imported inside solve_roster.
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+DEFAULT_CONSTRAINTS = ["availability", "max_per_day", "exact_testers", "min_first", "max_per_week", "single_first"]
+DEFAULT_OBJECTIVES = ["location", "fairness", "monthly", "monthly_avg", "weekly_multi", "monthly_min_avail"]
+ENGINES = ("auto", "cpsat", "flow", "two_stage")
+
+
+@dataclass
+class RosterParams:
+    """Everything one roster run needs; mirrors the main.py command-line options."""
+    csv_file: str | None = None  # default: data_sources default_persons_csv
+    weights_path: str | None = None
+    weights: dict[str, int] | None = None  # in-memory override, takes precedence over weights_path
+    use_constraints: list[str] = field(default_factory=lambda: list(DEFAULT_CONSTRAINTS))
+    use_objectives: list[str] = field(default_factory=lambda: list(DEFAULT_OBJECTIVES))
+    verbose: bool = False
+    year: int = 2026
+    quarter: str = "Q1"
+    department: str | None = None
+    shiftplan_path: str | None = None
+    rooster_name: str | None = None
+    allow_partial: bool = False
+    lexicographic: bool = False
+    tier_time_limit: float = 30.0
+    portfolio: int = 0
+    seed: int = 0
+    time_limit: float | None = None
+    rolling_weeks: int = 0
+    rolling_overlap: int = 1
+    engine: str = "auto"
+    output_root: str | None = None  # base for relative output paths (default: CWD)
+    export: bool = True  # write roster/penalties/diagnostics files
+
+
+@dataclass
+class RosterResult:
+    status: str  # CP-SAT status name (OPTIMAL, FEASIBLE, INFEASIBLE, ...)
+    feasible: bool
+    engine: str  # engine that produced the result
+    shifts: list[dict[str, Any]] = field(default_factory=list)  # Shift.to_dict() rows incl. testers
+    penalty_summary: dict[str, Any] = field(default_factory=dict)  # {"total_weighted", "by_component"}
+    diagnostics: list[Any] = field(default_factory=list)  # DiagnosticDay rows when infeasible
+    roster_path: str | None = None
+    penalties_path: str | None = None
+    assignments_path: str | None = None  # long-format Parquet (None without pyarrow)
+    manifest_path: str | None = None
+    stats_path: str | None = None  # pre-aggregated statistics for the UI (roster_stats)
+    workspace: str | None = None  # per-run directory: input snapshot, events, logs (run_workspace)
+    run_id: int | None = None  # row in the run history database
+    diagnostics_path: str | None = None
+    wall_time: float = 0.0
+
+
+def _status_name(status: int) -> str:
+    from ortools.sat.python import cp_model
+
+    enum = cp_model.CpSolverStatus
+    return enum.Name(status) if hasattr(enum, "Name") else enum(status).name  # older ortools: proto enum
+
+
+def _output_path(params: RosterParams, path: str | Path) -> Path:
+    path = Path(path)
+    if params.output_root and not path.is_absolute():
+        path = Path(params.output_root) / path
+    return path
+
+
+def _output_base(params: RosterParams, ds_conf: dict) -> Path:
+    from export import resolve_roster_base_dir
+
+    return _output_path(params, resolve_roster_base_dir(ds_conf, params.year, params.quarter))
+
+
+def _record_run(params: RosterParams, ds_conf: dict, out: RosterResult, csv_file: str, weights_conf: dict) -> None:
+    import hashlib
+    import json
+
+    from run_history import DEFAULT_DB, file_sha256, record_run
+
+    try:
+        out.run_id = record_run(
+            _output_path(params, ds_conf.get("run_history_db", DEFAULT_DB)),
+            params.output_root or ".",
+            department=params.department,
+            year=params.year,
+            quarter=params.quarter,
+            name=Path(out.roster_path).stem if out.roster_path else "rooster",
+            csv_sha256=file_sha256(csv_file),
+            weights_sha256=hashlib.sha256(json.dumps(weights_conf, sort_keys=True).encode("utf-8")).hexdigest(),
+            shiftplan_sha256=file_sha256(params.shiftplan_path),
+            status=out.status,
+            feasible=out.feasible,
+            engine=out.engine,
+            objective=out.penalty_summary.get("total_weighted"),
+            wall_time=out.wall_time,
+            roster_path=out.roster_path,
+            penalties_path=out.penalties_path,
+            assignments_path=out.assignments_path,
+            manifest_path=out.manifest_path,
+            diagnostics_path=out.diagnostics_path,
+        )
+    except Exception as e:
+        print(f"Kon run niet registreren in de historie: {e}")
+
+
+def _solve(ctx, params: RosterParams, dept_defaults: dict) -> tuple[Any, str]:
+    """Run the selected engine(s) on ctx; returns (SolverResult, engine name)."""
+    from ortools.sat.python import cp_model
+
+    from constraints import add_constraints
+    from models import AssignmentVars, SolverResult
+
+    active = set(params.use_constraints)
+    partial = params.allow_partial
+    if params.engine in ("auto", "flow"):
+        from flow_engine import flow_applicable, solve_min_cost_flow
+
+        if flow_applicable(ctx, active, partial):
+            print("Min-cost-flow engine gebruikt.")
+            return solve_min_cost_flow(ctx, active, partial), "flow"
+        if params.engine == "flow":
+            print("Instantie past niet in min-cost-flow; terugval op CP-SAT.")
+    elif params.engine == "two_stage":
+        from two_stage import solve_two_stage
+
+        result = solve_two_stage(ctx, active, partial)
+        if result is not None:
+            return result, "two_stage"
+        print("Twee-fasen engine vond geen oplossing; terugval op volledig CP-SAT model.")
+    if params.rolling_weeks > 0:
+        from rolling_horizon import solve_rolling_horizon
+
+        result = solve_rolling_horizon(
+            ctx, active, partial,
+            window_weeks=params.rolling_weeks, overlap_weeks=params.rolling_overlap,
+            time_limit=params.time_limit,
+        )
+        return result, "rolling"
+
+    ctx.assignment_vars = AssignmentVars.create(ctx.persons, ctx.shifts, ctx.model, named=ctx.verbose)
+    add_constraints(ctx, active, partial)
+    if params.lexicographic:
+        from lexicographic import solve_lexicographic
+
+        return solve_lexicographic(ctx, dept_defaults.get("lexicographic_tiers"), params.tier_time_limit), "lexicographic"
+    if params.portfolio > 1:
+        from portfolio import solve_portfolio
+
+        stats_path = Path("run_logs") / "portfolio_stats.csv"
+        if params.output_root:
+            stats_path = Path(params.output_root) / stats_path
+        result = solve_portfolio(
+            ctx, params.portfolio, time_limit=params.time_limit, base_seed=params.seed,
+            stats_path=str(stats_path),
+        )
+        return result, "portfolio"
+    solver = cp_model.CpSolver()
+    solver.parameters.random_seed = params.seed
+    if params.time_limit:
+        solver.parameters.max_time_in_seconds = params.time_limit
+    status = solver.Solve(ctx.model)
+    return SolverResult(solver=solver, status=status), "cpsat"
+
+
+def solve_roster(params: RosterParams) -> RosterResult:
+    """Load config and input, solve, and (with params.export) write the output files.
+
+    Progress is printed like the CLI always did; callers that want it captured can
+    redirect stdout.
+    """
+    if params.engine not in ENGINES:
+        raise ValueError(f"Onbekende engine {params.engine!r}; kies uit {', '.join(ENGINES)}")
+    return _solve_roster(params, time.perf_counter())
+
+
+def _solve_roster(params: RosterParams, t0: float) -> RosterResult:
+    import csv as _csv
+    import dataclasses
+
+    from ortools.sat.python import cp_model
+
+    from config import (
+        get_data_sources_config,
+        get_department_data_sources,
+        get_department_defaults,
+        get_locations_config,
+        get_mutual_exclusions,
+        get_weights_config,
+    )
+    from constraints import resolve_exclusion_pairs
+    from debug import print_available_people_for_shifts, print_filled_shifts, print_shift_count_per_person
+    from diagnostics import diagnose_unplanned_days
+    from export import export_assignments, export_to_csv, sanitize_rooster_name, write_manifest
+    from models import DiagnosticDay, SolverContext, Weights
+    from penalties import compute_penalties, write_penalties
+    from person_list import csv_to_personlist
+    from planning_calendar import Calendar
+    from roster_stats import build_stats, stats_path, write_stats
+    from run_workspace import DEFAULT_KEEP_RUNS, DEFAULT_RUNS_DIR, RunWorkspace, prune_workspaces
+    from shift_manager import csv_to_shiftlist
+
+    base_ds_conf = get_data_sources_config()
+    dept_defaults = get_department_defaults(params.department)
+    ds_conf = get_department_data_sources(params.department)
+    locations_config_path = dept_defaults.get("locations_config")
+    if locations_config_path:
+        try:
+            get_locations_config(locations_config_path)
+        except FileNotFoundError:
+            locations_config_path = None
+
+    csv_file = params.csv_file or ds_conf.get(
+        "default_persons_csv", base_ds_conf.get("default_persons_csv", "data/Data_sanitized_OKT-DEC2025.csv")
+    )
+    weights_conf = get_weights_config(params.weights_path) if params.weights_path else get_weights_config()
+    if params.weights is not None:
+        weights_conf = {**weights_conf, **params.weights}
+    weights = Weights.from_config(weights_conf, set(params.use_objectives))
+    if params.allow_partial:
+        weights.enable_coverage(weights_conf)
+
+    # Own workspace per exported run: the solve reads a snapshot of its inputs and writes
+    # into the workspace; finished files are published into the year/quarter folder at the end.
+    ws = None
+    shiftplan_path = params.shiftplan_path
+    if params.export:
+        ws = RunWorkspace.create(
+            _output_path(params, ds_conf.get("runs_dir", DEFAULT_RUNS_DIR)),
+            params.department, params.year, params.quarter,
+        )
+        csv_file = str(ws.snapshot(csv_file))
+        if shiftplan_path and Path(shiftplan_path).exists():
+            shiftplan_path = str(ws.snapshot(shiftplan_path))
+        ws.write_input("weights.json", dict(weights_conf))
+        ws.write_input("params.json", dataclasses.asdict(params))
+        ws.event("start", department=params.department, year=params.year, quarter=params.quarter)
+
+    calendar = Calendar()
+    shift_list = csv_to_shiftlist(
+        csv_file,
+        locations_config_path=locations_config_path,
+        shiftplan_path=shiftplan_path,
+        calendar=calendar,
+    )
+    person_list = csv_to_personlist(csv_file, year=params.year, locations_config_path=locations_config_path)
+
+    ctx = SolverContext(
+        model=cp_model.CpModel(), persons=person_list, shifts=shift_list, weights=weights, calendar=calendar,
+        verbose=params.verbose,
+    )
+    excl_names, excl_problems = get_mutual_exclusions(ds_conf.get("mutual_exclusions"))
+    for msg in excl_problems:
+        print(f"Waarschuwing: {msg}")
+    ctx.exclusion_pairs = resolve_exclusion_pairs(ctx.persons, excl_names)
+
+    if params.verbose:
+        print_available_people_for_shifts(ctx)
+
+    if ws:
+        ws.event("model", persons=len(ctx.persons), shifts=len(ctx.shifts))
+    result, engine = _solve(ctx, params, dept_defaults)
+    solver, status = result.solver, result.status
+    out = RosterResult(
+        status=_status_name(status),
+        feasible=status in (cp_model.OPTIMAL, cp_model.FEASIBLE),
+        engine=engine,
+        workspace=str(ws.root) if ws else None,
+    )
+    if ws:
+        ws.event("solved", status=out.status, engine=engine, seconds=round(time.perf_counter() - t0, 3))
+
+    if out.feasible:
+        for shift in ctx.shifts:
+            shift.testers = [
+                person.name
+                for person in ctx.persons
+                if solver.Value(ctx.assignment_vars[(person.idx, shift.idx)]) == 1
+            ]
+        out.shifts = [s.to_dict() for s in ctx.shifts]
+
+        print_filled_shifts(ctx.shifts)
+        print_shift_count_per_person(ctx, solver)
+        penalty_rows, out.penalty_summary = compute_penalties(ctx, solver)  # also without export
+
+        if ws:
+            base_dir = _output_base(params, ds_conf)
+            stem = sanitize_rooster_name(params.rooster_name) if params.rooster_name else "rooster"
+            penalties_name = f"{stem}_penalties.csv" if params.rooster_name else "penalties.csv"
+            names = {  # publish order: data files first, the manifest (which lists them) last
+                "roster": f"{stem}.csv",
+                "penalties": penalties_name,
+                "penalties_summary": penalties_name.replace(".csv", "_summary.csv"),
+                "assignments": f"{stem}_assignments.parquet",
+                "stats": stats_path(f"{stem}.csv").name,
+                "manifest": f"{stem}_manifest.json",
+            }
+            local = {key: str(ws.outputs / name) for key, name in names.items()}
+
+            export_to_csv(out.shifts, local["roster"])
+            write_penalties(penalty_rows, out.penalty_summary, local["penalties"])
+            schema = export_assignments(ctx.shifts, ctx.persons, local["assignments"])
+            write_stats(
+                local["stats"],
+                build_stats(ctx.shifts, ctx.persons, penalty_rows),
+                roster_file=local["roster"],
+                penalties_file=local["penalties"],
+            )
+            dates = sorted(s.date for s in ctx.shifts)
+            write_manifest(
+                local["manifest"],
+                roster_file=local["roster"],
+                penalties_file=local["penalties"],
+                penalties_summary_file=local["penalties_summary"],
+                assignments_file=local["assignments"] if schema else None,
+                assignments_schema=schema,
+                stats_file=local["stats"],
+                status=out.status,
+                engine=engine,
+                department=params.department,
+                year=params.year,
+                quarter=params.quarter,
+                date_range=[dates[0], dates[-1]] if dates else None,
+                shifts=len(ctx.shifts),
+                persons=len(ctx.persons),
+                assignments=sum(len(s.testers) for s in ctx.shifts),
+                penalty_total=out.penalty_summary.get("total_weighted"),
+                workspace=str(ws.root),
+            )
+
+            published = ws.publish({name: base_dir / name for name in names.values()})
+            out.roster_path = published.get(names["roster"])
+            out.penalties_path = published.get(names["penalties"])
+            out.assignments_path = published.get(names["assignments"])
+            out.stats_path = published.get(names["stats"])
+            out.manifest_path = published.get(names["manifest"])
+            for path in (out.roster_path, out.penalties_path, out.stats_path):
+                if path:
+                    print(f"Gepubliceerd: {path}")
+    else:
+        print("Geen oplossing gevonden.")
+        out.diagnostics = diagnose_unplanned_days(ctx, result)
+        for d in out.diagnostics:
+            print(
+                f"- {d.date} @ {d.location}: vereist={d.required}, "
+                f"gepland={d.assigned}, beschikbaar={d.available} -> {d.reason}"
+            )
+
+        if ws:
+            base_dir = _output_base(params, ds_conf)
+            diag_path = ds_conf.get("diagnostics_csv") or str(base_dir / "rooster_diagnostics.csv")
+            try:
+                local = ws.outputs / "rooster_diagnostics.csv"
+                fieldnames = [f.name for f in dataclasses.fields(DiagnosticDay)]
+                with open(local, "w", newline="", encoding="utf-8") as f:
+                    writer = _csv.DictWriter(f, fieldnames=fieldnames)
+                    writer.writeheader()
+                    for d in out.diagnostics:
+                        writer.writerow(d.to_dict())
+                out.diagnostics_path = ws.publish({local.name: diag_path}).get(local.name)
+                print(f"Diagnostiek geschreven naar {diag_path}")
+            except Exception as e:
+                print(f"Kon diagnostics CSV niet schrijven: {e}")
+
+    out.wall_time = round(time.perf_counter() - t0, 3)
+    if params.export and (out.roster_path or out.diagnostics_path):
+        _record_run(params, ds_conf, out, csv_file, dict(weights_conf))
+    if ws:
+        ws.event("done", status=out.status, wall_time=out.wall_time, run_id=out.run_id)
+        try:
+            prune_workspaces(ws.root.parent, int(ds_conf.get("runs_keep", DEFAULT_KEEP_RUNS)))
+        except (OSError, ValueError) as e:
+            print(f"Kon oude run-mappen niet opruimen: {e}")
+    return out
@@ -0,0 +1,131 @@
+"""Pre-aggregated statistics of a solved roster, written next to it at solve time.
+
+The UI pages used to re-derive shift counts, monthly averages, penalty pivots and
+availability from the raw CSVs on every rerun. solve_roster already has all of it in
+memory, so it writes one small JSON file (`<stem>_stats.json`) with columnar tables:
+
+- persons:   one entry per person (role, shifts, months worked, avg/max per month,
+             available days within the roster's dates)
+- cube:      shifts per person x month x ISO week x location (non-zero cells only)
+- penalties: weighted/units totals per person x component ("" = not person-bound)
+- coverage:  per date x location: required shifts, assigned persons, available T/P
+"""
+from __future__ import annotations
+
+import json
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+
+from models import Role
+
+STATS_VERSION = 1
+
+
+def stats_path(roster_path: str | Path) -> Path:
+    """'<dir>/<stem>.csv' -> '<dir>/<stem>_stats.json'."""
+    p = Path(roster_path)
+    return p.with_name(f"{p.stem}_stats.json")
+
+
+def stats_path_for_penalties(penalties_path: str | Path) -> Path:
+    """Stats file of the run that wrote *penalties_path* ('penalties.csv' belongs to 'rooster')."""
+    p = Path(penalties_path)
+    stem = p.stem[: -len("_penalties")] if p.stem.endswith("_penalties") else "rooster"
+    return p.with_name(f"{stem}_stats.json")
+
+
+def build_stats(shifts, persons, penalty_rows) -> dict:
+    """Statistics of a filled roster (shift.testers set) and its PenaltyRow list."""
+    locations = sorted({s.location for s in shifts})
+    loc_idx = {loc: i for i, loc in enumerate(locations)}
+    person_idx = {p.name: i for i, p in enumerate(persons)}
+
+    cells: Counter = Counter()  # (person, month, week, location) -> shifts
+    required: Counter = Counter()  # (date, location) -> shifts
+    assigned: Counter = Counter()  # (date, location) -> persons
+    for s in shifts:
+        month = s.date[:7]
+        required[s.date, s.location] += 1
+        for name in s.testers:
+            if name in person_idx:
+                cells[person_idx[name], month, s.weeknummer, loc_idx[s.location]] += 1
+            assigned[s.date, s.location] += 1
+
+    per_month: dict[int, Counter] = defaultdict(Counter)
+    for (p, month, _week, _loc), n in cells.items():
+        per_month[p][month] += n
+
+    dates = sorted({s.date for s in shifts})
+    available_days = [sum(1 for d in dates if p.is_available(d)) for p in persons]
+
+    coverage = {k: [] for k in ("date", "location", "required", "assigned", "available_T", "available_P")}
+    for (date, loc), n_required in sorted(required.items()):
+        avail = persons.filter_available_on(date).filter_location_not_banned(loc)
+        n_tester = len(avail.filter_role(Role.TESTER))
+        coverage["date"].append(date)
+        coverage["location"].append(loc)
+        coverage["required"].append(n_required)
+        coverage["assigned"].append(assigned[date, loc])
+        coverage["available_T"].append(n_tester)
+        coverage["available_P"].append(len(avail) - n_tester)
+
+    pen_units: Counter = Counter()
+    pen_weighted: Counter = Counter()
+    for r in penalty_rows:
+        pen_units[r.person, r.component] += r.units
+        pen_weighted[r.person, r.component] += r.weighted
+    by_component: Counter = Counter()
+    for (_person, comp), w in pen_weighted.items():
+        by_component[comp] += w
+    pen_keys = sorted(pen_weighted)
+
+    months = [per_month[i] for i in range(len(persons))]
+    cube_keys = sorted(cells)
+    return {
+        "version": STATS_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "locations": locations,
+        "persons": {
+            "name": [p.name for p in persons],
+            "role": [p.role.value for p in persons],
+            "shifts": [sum(m.values()) for m in months],
+            "months": [len(m) for m in months],
+            "avg_per_month": [sum(m.values()) / len(m) if m else None for m in months],
+            "max_per_month": [max(m.values()) if m else None for m in months],
+            "available_days": available_days,
+        },
+        "cube": {
+            "person": [k[0] for k in cube_keys],
+            "month": [k[1] for k in cube_keys],
+            "week": [k[2] for k in cube_keys],
+            "location": [k[3] for k in cube_keys],
+            "shifts": [cells[k] for k in cube_keys],
+        },
+        "penalties": {
+            "person": [k[0] for k in pen_keys],
+            "component": [k[1] for k in pen_keys],
+            "units": [pen_units[k] for k in pen_keys],
+            "weighted": [pen_weighted[k] for k in pen_keys],
+        },
+        "penalty_totals": {"by_component": dict(by_component), "total_weighted": sum(by_component.values())},
+        "coverage": coverage,
+    }
+
+
+def write_stats(filename: str | Path, stats: dict, **files) -> None:
+    """Write *stats* as compact JSON; *files* (e.g. roster_file=...) are stored by name."""
+    doc = {**stats, **{key: Path(value).name for key, value in files.items() if value}}
+    Path(filename).write_text(json.dumps(doc, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    print(f"Statistieken geschreven naar {filename}.")
+
+
+def read_stats(filename: str | Path) -> dict | None:
+    """Parsed stats file, or None when it is missing, unreadable or of another version."""
+    try:
+        stats = json.loads(Path(filename).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(stats, dict) or stats.get("version") != STATS_VERSION:
+        return None
+    return stats
@@ -1,34 +1,48 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import date, datetime
 
+from planning_calendar import Calendar
 
-def group_shifts_by_month(shifts: list) -> dict[int, list[int]]:
-    """Return {month: [shift_indices]} for a list of Shift objects."""
-    result: dict[int, list[int]] = {}
-    for s_idx, shift in enumerate(shifts):
-        m = datetime.strptime(shift.date, "%Y-%m-%d").month
-        result.setdefault(m, []).append(s_idx)
+
+def group_shifts_by_month(shifts: list, calendar: Calendar | None = None) -> dict[tuple[int, int], list[int]]:
+    """Return {(year, month): [shift.idx]} for a list of Shift objects (filtered lists keep their idx)."""
+    cal = calendar if calendar is not None else Calendar()
+    result: dict[tuple[int, int], list[int]] = {}
+    for shift in shifts:
+        result.setdefault(cal.year_month(shift.date), []).append(shift.idx)
     return result
 
 
-def group_shifts_by_iso_week(shifts: list) -> dict[tuple[int, int], list[int]]:
-    """Return {(iso_year, iso_week): [shift_indices]} for a list of Shift objects."""
+def group_shifts_by_iso_week(shifts: list, calendar: Calendar | None = None) -> dict[tuple[int, int], list[int]]:
+    """Return {(iso_year, iso_week): [shift.idx]} for a list of Shift objects."""
+    cal = calendar if calendar is not None else Calendar()
     result: dict[tuple[int, int], list[int]] = {}
-    for s_idx, shift in enumerate(shifts):
-        d = datetime.strptime(shift.date, "%Y-%m-%d")
-        iso_year, iso_week, _ = d.isocalendar()
-        result.setdefault((iso_year, iso_week), []).append(s_idx)
+    for shift in shifts:
+        result.setdefault(cal.iso_week(shift.date), []).append(shift.idx)
     return result
 
 
-def get_available_months(person, shifts: list) -> set[int]:
-    """Return months in which a Person has at least one available date."""
-    months: set[int] = set()
-    for dstr, ok in person.availability.items():
+def get_available_months(person, shifts: list) -> set[tuple[int, int]]:
+    """Return (year, month) keys in which a Person has at least one available date."""
+    months: set[tuple[int, int]] = set()
+    last_month_end = 0
+    for o in person.available_ordinals():  # ascending, so skip ahead a month at a time
+        if o <= last_month_end:
+            continue
+        d = date.fromordinal(o)
+        months.add((d.year, d.month))
+        nxt = date(d.year + d.month // 12, d.month % 12 + 1, 1)
+        last_month_end = nxt.toordinal() - 1
+    for dstr in person.available_extra_keys():  # keys that are not ISO dates
         try:
-            if ok:
-                months.add(datetime.strptime(dstr, "%Y-%m-%d").month)
+            d = datetime.strptime(dstr, "%Y-%m-%d")
+            months.add((d.year, d.month))
         except Exception:
             continue
     return months
+
+
+def month_label(year_month: tuple[int, int]) -> str:
+    """(2026, 4) -> '2026-04', used where a month key is written out."""
+    return f"{year_month[0]}-{year_month[1]:02d}"
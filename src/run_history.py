@@ -0,0 +1,232 @@
+"""SQLite register of roster runs.
+
+solve_roster records every exported run (inputs' hashes, outcome, timings, artifact
+paths); the UI selectors query it instead of globbing the roster folders. Rosters that
+predate the database are imported once by a single scan (see backfill).
+
+Artifact paths are stored relative to the project root (the *root* argument), so moving
+the project folder keeps the history valid; list_runs resolves them again and leaves out
+runs whose files have been deleted since.
+"""
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+from datetime import datetime
+from pathlib import Path
+
+DEFAULT_DB = "data/run_history.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created TEXT NOT NULL,
+    department TEXT,
+    year INTEGER,
+    quarter TEXT,
+    name TEXT NOT NULL,
+    csv_sha256 TEXT,
+    weights_sha256 TEXT,
+    shiftplan_sha256 TEXT,
+    status TEXT,
+    feasible INTEGER,
+    engine TEXT,
+    objective INTEGER,
+    wall_time REAL,
+    roster_path TEXT,
+    penalties_path TEXT,
+    assignments_path TEXT,
+    manifest_path TEXT,
+    diagnostics_path TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_period ON runs (year, quarter, created);
+CREATE INDEX IF NOT EXISTS runs_roster ON runs (roster_path);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+@dataclass
+class RunRecord:
+    id: int
+    created: str
+    department: str | None
+    year: int | None
+    quarter: str | None
+    name: str
+    csv_sha256: str | None
+    weights_sha256: str | None
+    shiftplan_sha256: str | None
+    status: str | None
+    feasible: bool | None
+    engine: str | None
+    objective: int | None
+    wall_time: float | None
+    roster_path: str | None
+    penalties_path: str | None
+    assignments_path: str | None
+    manifest_path: str | None
+    diagnostics_path: str | None
+
+
+_COLUMNS = [f.name for f in fields(RunRecord)]
+
+
+def file_sha256(path: str | Path | None) -> str | None:
+    """sha256 of a file's bytes, or None when there is no such file."""
+    if not path:
+        return None
+    try:
+        return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+@contextmanager
+def _connect(db_path: str | Path):
+    """Connection with the schema in place; commits on success and always closes."""
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), timeout=10)
+    try:
+        conn.executescript(_SCHEMA)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+_PATH_COLUMNS = ("roster_path", "penalties_path", "assignments_path", "manifest_path", "diagnostics_path")
+
+
+def _store(path: str | Path | None, root: str | Path) -> str | None:
+    """Path relative to *root* (posix), or absolute when it lies outside *root*."""
+    if not path:
+        return None
+    full = Path(root, path).resolve()
+    try:
+        return full.relative_to(Path(root).resolve()).as_posix()
+    except ValueError:
+        return str(full)
+
+
+def _resolve(path: str | None, root: str | Path) -> str | None:
+    return str(Path(root, path).resolve()) if path else None
+
+
+def record_run(db_path: str | Path, root: str | Path = ".", **values) -> int:
+    """Insert one run; path columns are stored relative to *root*. Returns the new id."""
+    values.setdefault("created", datetime.now().isoformat(timespec="seconds"))
+    for key in _PATH_COLUMNS:
+        values[key] = _store(values.get(key), root)
+    if values.get("feasible") is not None:
+        values["feasible"] = int(bool(values["feasible"]))
+    unknown = set(values) - set(_COLUMNS)
+    if unknown:
+        raise ValueError(f"Onbekende run-velden: {', '.join(sorted(unknown))}")
+    cols = list(values)
+    with _connect(db_path) as conn:
+        cur = conn.execute(
+            f"INSERT INTO runs ({', '.join(cols)}) VALUES ({', '.join('?' for _ in cols)})",
+            [values[c] for c in cols],
+        )
+        return int(cur.lastrowid)
+
+
+def _record(row: tuple, root: str | Path) -> RunRecord:
+    rec = RunRecord(*row)
+    if rec.feasible is not None:
+        rec.feasible = bool(rec.feasible)
+    for key in _PATH_COLUMNS:
+        setattr(rec, key, _resolve(getattr(rec, key), root))
+    return rec
+
+
+def list_runs(
+    db_path: str | Path,
+    root: str | Path = ".",
+    year: int | None = None,
+    quarter: str | None = None,
+    department: str | None = None,
+    with_roster: bool = False,
+    with_diagnostics: bool = False,
+    limit: int = 200,
+) -> list[RunRecord]:
+    """Newest first; per artifact path only its latest run (reruns overwrite the files).
+
+    Paths come back absolute (resolved against *root*). With with_roster/with_diagnostics
+    only runs whose roster/diagnostics file still exists are returned.
+    """
+    if not Path(db_path).exists():
+        return []
+    where, args = [], []
+    for col, val in (("year", year), ("quarter", quarter), ("department", department)):
+        if val is not None:
+            where.append(f"{col} = ?")
+            args.append(val)
+    if with_roster:
+        where.append("roster_path IS NOT NULL")
+    if with_diagnostics:
+        where.append("diagnostics_path IS NOT NULL")
+    cond = " AND ".join(where) or "1"
+    sql = (
+        f"SELECT {', '.join(_COLUMNS)} FROM runs WHERE id IN ("
+        f"SELECT MAX(id) FROM runs WHERE {cond} "
+        f"GROUP BY COALESCE(roster_path, diagnostics_path, id)) "
+        f"ORDER BY created DESC, id DESC"
+    )
+    runs: list[RunRecord] = []
+    seen: set[str] = set()
+    with _connect(db_path) as conn:
+        for row in conn.execute(sql, args):
+            rec = _record(row, root)
+            path = rec.roster_path or rec.diagnostics_path
+            if path in seen:  # same file stored absolute by an older version and relative now
+                continue
+            if (with_roster and not Path(rec.roster_path).exists()) or (
+                with_diagnostics and not Path(rec.diagnostics_path).exists()
+            ):
+                continue
+            if path:
+                seen.add(path)
+            runs.append(rec)
+            if len(runs) >= limit:
+                break
+    return runs
+
+
+def backfill(db_path: str | Path, roster_folder: str | Path, root: str | Path = ".") -> int:
+    """One-time import of roster/diagnostics CSVs written before the database existed.
+
+    Layout: <roster_folder>/<year>/<quarter>/<name>.csv. Runs once per database (a
+    meta flag is set); returns the number of imported runs.
+    """
+    folder = Path(roster_folder)
+    with _connect(db_path) as conn:
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'backfilled'").fetchone():
+            return 0
+        rows = conn.execute("SELECT roster_path, diagnostics_path FROM runs").fetchall()
+    known = {_resolve(p, root) for row in rows for p in row if p}
+    count = 0
+    for csv_path in sorted(folder.rglob("*.csv")) if folder.exists() else []:
+        stem = csv_path.stem
+        if "penalties" in stem or "summary" in stem or _resolve(str(csv_path), root) in known:
+            continue
+        rel = csv_path.parent.relative_to(folder).parts
+        year = int(rel[0]) if len(rel) >= 1 and rel[0].isdigit() else None
+        quarter = rel[1] if len(rel) >= 2 else None
+        created = datetime.fromtimestamp(csv_path.stat().st_mtime).isoformat(timespec="seconds")
+        if stem == "rooster_diagnostics":
+            record_run(db_path, root, created=created, year=year, quarter=quarter, name=stem,
+                       feasible=False, diagnostics_path=csv_path)
+        else:
+            penalties = csv_path.with_name("penalties.csv" if stem == "rooster" else f"{stem}_penalties.csv")
+            record_run(db_path, root, created=created, year=year, quarter=quarter, name=stem, feasible=True,
+                       roster_path=csv_path, penalties_path=penalties if penalties.exists() else None)
+        count += 1
+    with _connect(db_path) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO meta VALUES ('backfilled', ?)",
+            (datetime.now().isoformat(timespec="seconds"),),
+        )
+    return count
@@ -0,0 +1,212 @@
+"""Per-run workspace: input snapshot, outputs, logs and progress events of one solve.
+
+Layout under the runs directory (data_sources "runs_dir", default data/runs):
+
+    <YYYYmmdd-HHMMSS>-<department>-<year><quarter>-<token>/
+        inputs/       copies of the persons CSV and shift plan, weights.json, params.json
+        outputs/      files written by the run, moved out again by publish()
+        events.jsonl  one JSON object per progress event
+        stdout.log / stderr.log (when the caller captured them)
+
+A run reads only its snapshot and writes only into its own outputs/, so concurrent runs
+cannot see each other's inputs or half-written files. publish() moves the finished files
+into the shared year/quarter folder with os.replace, holding a per-folder lock so the files
+of two runs never interleave; files are moved in the given order (manifest last).
+
+Workspaces hold a copy of the personnel CSV, so prune_workspaces() keeps only the newest
+ones (data_sources "runs_keep", default DEFAULT_KEEP_RUNS); solve_roster calls it after
+every exported run.
+"""
+from __future__ import annotations
+
+import contextlib
+import io
+import json
+import os
+import re
+import secrets
+import shutil
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+DEFAULT_RUNS_DIR = "data/runs"
+DEFAULT_KEEP_RUNS = 20
+STALE_SECONDS = 3600  # an unfinished workspace this old belongs to a crashed run
+
+_publish_locks: dict[str, threading.Lock] = {}
+_publish_guard = threading.Lock()
+
+
+def _slug(value: Any) -> str:
+    return re.sub(r"[^A-Za-z0-9_-]+", "_", str(value)).strip("_") or "x"
+
+
+@dataclass
+class RunWorkspace:
+    root: Path
+
+    @classmethod
+    def create(cls, runs_dir: str | Path, department: str | None, year: int, quarter: str) -> RunWorkspace:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        name = f"{stamp}-{_slug(department or 'default')}-{year}{_slug(quarter)}-{secrets.token_hex(3)}"
+        ws = cls(Path(runs_dir) / name)
+        ws.inputs.mkdir(parents=True)
+        ws.outputs.mkdir()
+        return ws
+
+    @property
+    def inputs(self) -> Path:
+        return self.root / "inputs"
+
+    @property
+    def outputs(self) -> Path:
+        return self.root / "outputs"
+
+    def snapshot(self, path: str | Path) -> Path:
+        """Copy an input file (and a person_list .prefcache sidecar next to it) into inputs/."""
+        src = Path(path)
+        dst = self.inputs / src.name
+        shutil.copy2(src, dst)
+        sidecar = src.with_name(f".{src.name}.prefcache")
+        if sidecar.exists():
+            with contextlib.suppress(OSError):
+                shutil.copy2(sidecar, dst.with_name(sidecar.name))
+        return dst
+
+    def write_input(self, name: str, data: Any) -> Path:
+        path = self.inputs / name
+        path.write_text(json.dumps(data, ensure_ascii=False, indent=2, default=str), encoding="utf-8")
+        return path
+
+    def event(self, kind: str, **fields: Any) -> None:
+        """Append a progress event to events.jsonl."""
+        line = json.dumps({"time": datetime.now().isoformat(timespec="milliseconds"), "event": kind, **fields},
+                          ensure_ascii=False, default=str)
+        with open(self.root / "events.jsonl", "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def events(self) -> list[dict[str, Any]]:
+        try:
+            lines = (self.root / "events.jsonl").read_text(encoding="utf-8").splitlines()
+        except OSError:
+            return []
+        return [json.loads(line) for line in lines if line.strip()]
+
+    def publish(self, targets: dict[str, str | Path]) -> dict[str, str]:
+        """Move outputs/<name> to its target path for every (name, target), in order.
+
+        Missing outputs are skipped. Returns name -> published path.
+        """
+        published: dict[str, str] = {}
+        folders = sorted({str(Path(t).parent.resolve()) for t in targets.values()})
+        with contextlib.ExitStack() as stack:
+            for folder in folders:
+                with _publish_guard:
+                    lock = _publish_locks.setdefault(folder, threading.Lock())
+                stack.enter_context(lock)
+            for name, target in targets.items():
+                src, dst = self.outputs / name, Path(target)
+                if not src.exists():
+                    continue
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                _move_atomic(src, dst)
+                published[name] = str(dst)
+        self.event("published", files=published)
+        return published
+
+
+def prune_workspaces(runs_dir: str | Path, keep: int = DEFAULT_KEEP_RUNS) -> list[Path]:
+    """Delete all but the newest *keep* workspaces; returns the removed directories.
+
+    Workspaces without a "done" event are skipped while they may still be running
+    (events.jsonl changed less than STALE_SECONDS ago).
+    """
+    folder = Path(runs_dir)
+    if not folder.is_dir():
+        return []
+    workspaces = sorted((p for p in folder.iterdir() if p.is_dir()), key=lambda p: p.name, reverse=True)
+    removed: list[Path] = []
+    now = time.time()
+    for path in workspaces[max(keep, 0):]:
+        ws = RunWorkspace(path)
+        events = ws.root / "events.jsonl"
+        finished = any(e.get("event") == "done" for e in ws.events())
+        if not finished and events.exists() and now - events.stat().st_mtime < STALE_SECONDS:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        removed.append(path)
+    return removed
+
+
+def _move_atomic(src: Path, dst: Path) -> None:
+    """os.replace; across file systems copy to a temp file next to dst and replace that."""
+    try:
+        os.replace(src, dst)
+    except OSError:
+        tmp = dst.with_name(f".{dst.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            shutil.copy2(src, tmp)
+            os.replace(tmp, dst)
+        finally:
+            tmp.unlink(missing_ok=True)
+        src.unlink()
+
+
+class _ThreadRouter(io.TextIOBase):
+    """sys.stdout/sys.stderr stand-in: writes go to the current thread's capture buffer,
+    or to the original stream when the thread is not capturing."""
+
+    def __init__(self, default):
+        self._default = default
+        self._targets: dict[int, io.StringIO] = {}
+
+    def _stream(self):
+        return self._targets.get(threading.get_ident(), self._default)
+
+    def write(self, s: str) -> int:
+        return self._stream().write(s)
+
+    def flush(self) -> None:
+        self._stream().flush()
+
+    def writable(self) -> bool:
+        return True
+
+    @property
+    def encoding(self):
+        return getattr(self._default, "encoding", "utf-8")
+
+
+_router_guard = threading.Lock()
+
+
+def _router(name: str) -> _ThreadRouter:
+    with _router_guard:
+        stream = getattr(sys, name)
+        if not isinstance(stream, _ThreadRouter):
+            stream = _ThreadRouter(stream)
+            setattr(sys, name, stream)
+        return stream
+
+
+@contextlib.contextmanager
+def capture_output():
+    """Capture this thread's stdout/stderr into two StringIOs.
+
+    Unlike contextlib.redirect_stdout this does not swap the process-wide streams per
+    call, so solves running in parallel threads (Streamlit sessions) keep their output apart.
+    """
+    out, err = io.StringIO(), io.StringIO()
+    routers = (_router("stdout"), _router("stderr"))
+    tid = threading.get_ident()
+    routers[0]._targets[tid], routers[1]._targets[tid] = out, err
+    try:
+        yield out, err
+    finally:
+        routers[0]._targets.pop(tid, None)
+        routers[1]._targets.pop(tid, None)
@@ -4,6 +4,7 @@ from pathlib import Path
 from typing import Dict, Tuple
 from config import get_locations_config
 from models import Shift, ShiftList
+from planning_calendar import Calendar
 
 
 # Map weekday numbers naar Nederlandse dagen
@@ -75,13 +76,14 @@ def build_location_plan(
 def _make_shift(
     location: str, day: str, date: str, team: int,
     allow_peer: bool = True, allow_tester: bool = True,
+    calendar: Calendar | None = None,
 ) -> Shift:
-    weeknummer = datetime.strptime(date, "%Y-%m-%d").isocalendar().week
+    cal = calendar if calendar is not None else Calendar()
     return Shift(
         location=location,
         day=day,
         date=date,
-        weeknummer=weeknummer,
+        weeknummer=cal.iso_week(date)[1],
         team=team,
         allow_peer=bool(allow_peer),
         allow_tester=bool(allow_tester),
@@ -92,6 +94,7 @@ def csv_to_shiftlist(
     csv_path: str,
     locations_config_path: str | None = None,
     shiftplan_path: str | None = None,
+    calendar: Calendar | None = None,
 ) -> ShiftList:
     """
     Build a list of shifts using config/locations.json:
@@ -99,6 +102,7 @@ def csv_to_shiftlist(
     - Else, infer dates from the uploaded CSV headers and use weekday defaults from teams_per_day
     """
     shift_list: ShiftList = ShiftList()
+    cal = calendar if calendar is not None else Calendar()
     locations, plan_from_conf, dag_teams, loc_defaults = build_location_plan(
         locations_config_path, shiftplan_path
     )
@@ -106,10 +110,9 @@ def csv_to_shiftlist(
     if plan_from_conf:
         for date in sorted(plan_from_conf.keys()):
             try:
-                dt = datetime.strptime(date, "%Y-%m-%d")
+                weekday = dag_namen[cal.weekday(date)]
             except ValueError:
                 continue
-            weekday = get_weekday_from_date(dt)
             counts = plan_from_conf.get(date, {})
             for loc in locations:
                 n = int(counts.get(loc, 0) or 0)
@@ -119,6 +122,7 @@ def csv_to_shiftlist(
                         loc, weekday, date, i,
                         allow_peer=role_info.get("allow_peer", True),
                         allow_tester=role_info.get("allow_tester", True),
+                        calendar=cal,
                     ))
         return ShiftList(shift_list)
 
@@ -140,7 +144,7 @@ def csv_to_shiftlist(
                 continue
 
         for date in date_columns:
-            weekday = get_weekday_from_date(datetime.strptime(date, "%Y-%m-%d"))
+            weekday = dag_namen[cal.weekday(date)]
             for loc, count in dag_teams.get(weekday, {}).items():
                 role_info = loc_defaults.get(loc, {"allow_peer": True, "allow_tester": True})
                 for i in range(count):
@@ -148,6 +152,7 @@ def csv_to_shiftlist(
                         loc, weekday, date, i,
                         allow_peer=role_info.get("allow_peer", True),
                         allow_tester=role_info.get("allow_tester", True),
+                        calendar=cal,
                     ))
 
     return ShiftList(shift_list)
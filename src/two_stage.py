@@ -0,0 +1,256 @@
+"""Two-stage engine: stage 1 decides who works on which date, stage 2 places them per date.
+
+Stage 1 works on one aggregate pseudo-shift per date and carries everything that spans
+dates (weekly/monthly caps, monthly_avg, fairness, mutual exclusions). Stage 2 assigns the
+selected people to the locations/teams of a single date and is solved per date in parallel.
+Stage 1 carries per-date capacity rows (people, testers and peers who may work at a set of
+locations versus what its shifts need), so most selections it makes can be placed. When a
+date still cannot be placed, a cut excluding that selection and every selection of
+interchangeable people is added to stage 1 and the loop repeats.
+"""
+from __future__ import annotations
+
+import dataclasses
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
+
+from ortools.sat.python import cp_model
+
+from constraints import (
+    _apply_mutual_exclusions,
+    _log,
+    add_constraints,
+    add_max_x_shifts_per_week_constraints,
+    is_eligible,
+)
+from models import (
+    AssignmentVars,
+    FixedSolution,
+    PersonList,
+    Role,
+    Shift,
+    ShiftList,
+    SolverContext,
+    SolverResult,
+)
+from penalty_terms import build_objective_expr
+
+MAX_ROUNDS = 10
+MAX_SUBSET_LOCATIONS = 5  # capacity rows for all location subsets up to this many locations per date
+
+
+def _day_shifts(shifts: ShiftList) -> ShiftList:
+    """One pseudo-shift per date (empty location) used as the stage-1 'column'."""
+    days = []
+    for date in shifts.dates():
+        first = shifts.filter_date(date)[0]
+        days.append(Shift(location="", day=first.day, date=date, weeknummer=first.weeknummer, team=0))
+    return ShiftList(days)
+
+
+def _build_stage1(ctx: SolverContext, active: set[str], partial: bool) -> SolverContext:
+    model = cp_model.CpModel()
+    days = _day_shifts(ctx.shifts)
+    weights = dataclasses.replace(ctx.weights, location=0, location_fairness=0, coverage=0)
+    s1 = SolverContext(
+        model=model, persons=ctx.persons, shifts=days, weights=weights,
+        calendar=ctx.calendar, exclusion_pairs=ctx.exclusion_pairs, verbose=ctx.verbose,
+    )
+    s1.assignment_vars = AssignmentVars.create(ctx.persons, days, model, named=ctx.verbose)
+    y = s1.assignment_vars
+
+    use_avail = "availability" in active
+    testers = ctx.persons.filter_role(Role.TESTER)
+    coverage = []
+    for day in days:
+        date_shifts = ctx.shifts.filter_date(day.date)
+        eligible = PersonList._from_filtered(
+            p for p in ctx.persons
+            if not use_avail or any(is_eligible(p, s) for s in date_shifts)
+        )
+        eligible_idx = {p.idx for p in eligible}
+        for person in ctx.persons:
+            if person.idx not in eligible_idx:
+                model.Add(y[(person.idx, day.idx)] == 0)
+
+        workers = sum(y[(p.idx, day.idx)] for p in eligible)
+        n_testers = sum(y[(t.idx, day.idx)] for t in testers if t.idx in eligible_idx)
+        if "exact_testers" not in active:
+            continue
+        demand = 2 * len(date_shifts)
+        peers_free = bool(ctx.persons.filter_role(Role.PEER).filter_available_on(day.date))
+        if "single_first" in active:
+            model.Add(n_testers <= sum(1 if (s.allow_peer and peers_free) else 2 for s in date_shifts))
+        if "min_first" in active:
+            # Every staffed shift that allows testers needs one, so peers never outnumber testers
+            # there; shifts without testers add at most two peers each.
+            no_tester_shifts = len(date_shifts) - len(date_shifts.filter_allows_role(Role.TESTER))
+            model.Add(workers - n_testers <= n_testers + 2 * no_tester_shifts)
+        if partial:
+            model.Add(workers <= demand)
+            deficit = model.NewIntVar(0, demand, f"s1_cov_deficit_d{day.idx}")
+            model.Add(deficit == demand - workers)
+            coverage.append(deficit)
+            continue
+        model.Add(workers == demand)
+        _add_capacity_rows(model, y, day, date_shifts, eligible, active, peers_free)
+
+    if "max_per_week" in active:
+        add_max_x_shifts_per_week_constraints(s1, max_shifts_per_week=2)
+    _apply_mutual_exclusions(s1)
+
+    model.Minimize(build_objective_expr(s1) + sum(coverage) * ctx.weights.coverage)
+    return s1
+
+
+def _add_capacity_rows(model, y, day, date_shifts: ShiftList, eligible, active: set[str], peers_free: bool) -> None:
+    """Necessary per-date capacity (exact_testers, not partial): for every set of locations,
+    the selected people and testers who may work on one of its shifts must cover what those
+    shifts need; each person works one shift a day, so no one counts twice. Peer rows are
+    added per location only: their unions made stage 1 much harder to solve to optimality.
+    """
+    use_avail = "availability" in active
+
+    def needs(s) -> tuple[int, int]:
+        """(testers, peers) shift *s* needs at least."""
+        testers = peers = 0
+        if use_avail and not s.allow_peer:
+            testers = 2
+        elif "min_first" in active and s.allow_tester:
+            testers = 1
+        if use_avail and not s.allow_tester:
+            peers = 2
+        elif "single_first" in active and s.allow_peer and peers_free:
+            peers = 1  # at most one tester there
+        return testers, peers
+
+    locations = date_shifts.locations()
+    by_loc = {loc: date_shifts.filter_location(loc) for loc in locations}
+    sizes = range(1, len(locations) + 1) if len(locations) <= MAX_SUBSET_LOCATIONS else (1,)
+    for size in sizes:
+        for subset in combinations(locations, size):
+            shifts = [s for loc in subset for s in by_loc[loc]]
+            ok = [p for p in eligible if not use_avail or any(is_eligible(p, s) for s in shifts)]
+            need_t = sum(needs(s)[0] for s in shifts)
+            need_p = sum(needs(s)[1] for s in shifts)
+            if size < len(locations):  # all locations together: workers == demand already
+                model.Add(sum(y[(p.idx, day.idx)] for p in ok) >= 2 * len(shifts))
+            for role, need in ((Role.TESTER, need_t), (Role.PEER, need_p if size == 1 else 0)):
+                if need:
+                    model.Add(sum(y[(p.idx, day.idx)] for p in ok if p.role == role) >= need)
+
+
+def _exclude_selection(ctx: SolverContext, s1: SolverContext, day: Shift, chosen: set[int], partial: bool) -> None:
+    """Cut the failed selection of *day* from stage 1.
+
+    People with the same role, the same eligibility over the date's shifts and no mutual
+    exclusion are interchangeable in stage 2, so with a fixed number of workers (not
+    partial) every selection with the same count per such class fails too: at least one
+    class must lose a member. In partial mode only the exact selection is excluded.
+    """
+    model, y = s1.model, s1.assignment_vars
+    if partial:
+        model.Add(
+            sum(y[(i, day.idx)] for i in chosen)
+            - sum(y[(p.idx, day.idx)] for p in ctx.persons if p.idx not in chosen)
+            <= len(chosen) - 1
+        )
+        return
+    date_shifts = ctx.shifts.filter_date(day.date)
+    excluded = {i for pair in ctx.exclusion_pairs for i in pair}
+    classes: dict[tuple, list[int]] = {}
+    for p in ctx.persons:
+        key = (p.idx,) if p.idx in excluded else (p.role, tuple(is_eligible(p, s) for s in date_shifts))
+        classes.setdefault(key, []).append(p.idx)
+    lose = []
+    for members in classes.values():
+        k = sum(1 for i in members if i in chosen)
+        if k:
+            b = model.NewBoolVar("")
+            model.Add(sum(y[(i, day.idx)] for i in members) <= k - 1).OnlyEnforceIf(b)
+            lose.append(b)
+    model.AddBoolOr(lose)
+
+
+def _solve_day(
+    ctx: SolverContext, date: str, workers: PersonList, active: set[str], partial: bool
+) -> set[tuple[int, int]] | None:
+    """Place the stage-1 workers of *date* on its shifts; None when that is impossible."""
+    model = cp_model.CpModel()
+    weights = dataclasses.replace(
+        ctx.weights, fairness=0, monthly=0, monthly_avg=0, weekly_multi=0, monthly_min_avail=0
+    )
+    day_shifts = ctx.shifts.filter_date(date)
+    s2 = SolverContext(
+        model=model, persons=workers, shifts=day_shifts, weights=weights,
+        calendar=ctx.calendar, exclusion_pairs=ctx.exclusion_pairs, verbose=ctx.verbose,
+    )
+    s2.assignment_vars = AssignmentVars.create(workers, day_shifts, model, named=ctx.verbose)
+    for person in workers:
+        model.Add(sum(s2.assignment_vars[(person.idx, s.idx)] for s in day_shifts) == 1)
+    add_constraints(s2, active - {"max_per_week"}, partial)
+
+    solver = cp_model.CpSolver()
+    solver.parameters.num_workers = 1
+    status = solver.Solve(model)
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return None
+    return {key for key, var in s2.assignment_vars.items() if solver.Value(var)}
+
+
+def solve_two_stage(ctx: SolverContext, active: set[str], partial: bool = False) -> SolverResult | None:
+    """Solve *ctx* with the day-then-location decomposition.
+
+    On success ctx.assignment_vars is replaced by constant 0/1 entries and the result
+    carries a FixedSolution. Returns None when the caller should fall back to the
+    monolithic model: stage 1 found nothing, stage 2 kept failing, or max_per_day is
+    not active. Infeasibility is only ever reported by the monolithic model.
+    """
+    if "max_per_day" not in active:
+        return None
+
+    t0 = time.perf_counter()
+    s1 = _build_stage1(ctx, active, partial)
+    y = s1.assignment_vars
+    days = s1.shifts
+    stage1_time = stage2_time = 0.0
+
+    for rnd in range(MAX_ROUNDS):
+        solver = cp_model.CpSolver()
+        status = solver.Solve(s1.model)
+        stage1_time = time.perf_counter() - t0
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            # Stage 1 is a heuristic aggregate, not a proof: let the full model decide.
+            return None
+
+        workers = {
+            day.date: PersonList._from_filtered(
+                p for p in ctx.persons if solver.Value(y[(p.idx, day.idx)])
+            )
+            for day in days
+        }
+        t1 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as pool:
+            placed = dict(zip(
+                workers,
+                pool.map(lambda d: _solve_day(ctx, d, workers[d], active, partial), workers),
+            ))
+        stage2_time = time.perf_counter() - t1
+
+        failed = [day for day in days if placed[day.date] is None]
+        if not failed:
+            assigned = set().union(*placed.values())
+            ctx.assignment_vars = AssignmentVars.from_assigned(ctx.persons, ctx.shifts, assigned)
+            print(
+                f"Twee-fasen engine: fase 1 {stage1_time:.2f}s, fase 2 {stage2_time:.2f}s "
+                f"({len(days)} datums, {rnd + 1} ronde(s))"
+            )
+            return SolverResult(solver=FixedSolution(), status=cp_model.FEASIBLE)
+
+        for day in failed:
+            _log(ctx, f"Fase 2 onhaalbaar op {day.date}; sluit deze selectie uit in fase 1")
+            _exclude_selection(ctx, s1, day, {p.idx for p in workers[day.date]}, partial)
+        t0 = time.perf_counter()
+    return None
@@ -0,0 +1,170 @@
+"""Cached file loaders shared by the UI pages.
+
+Entries are keyed on (path, mtime_ns, size): a file rewritten by a roster run gets a new
+key on the next rerun, so pages never show stale data. Loaders that parse persons also
+key on the stamp of the locations config, whose location names and pref_loc flags shape
+the result. invalidate() drops everything at
+once; the generator page calls it after a run. Loaders raise FileNotFoundError like
+pd.read_csv so the pages keep their existing "not generated yet" handling.
+"""
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from config import ROOT
+from person_list import csv_to_personlist, load_preference_matrix
+from roster_stats import read_stats
+
+MAX_ENTRIES = 32  # per loader; a few quarters of rosters, penalties and diagnostics
+
+
+def file_stamp(path: str | os.PathLike) -> tuple[str, int, int]:
+    """(absolute path, mtime_ns, size); raises FileNotFoundError when missing."""
+    p = os.path.abspath(path)
+    st_ = os.stat(p)
+    return p, st_.st_mtime_ns, st_.st_size
+
+
+def _config_stamp(locations_config_path: str | None) -> tuple[str, int, int] | None:
+    """file_stamp of the locations config a person parse reads; None when it is missing."""
+    p = Path(locations_config_path or "config/locations.json")
+    try:
+        return file_stamp(p if p.is_absolute() else ROOT / p)
+    except FileNotFoundError:
+        return None
+
+
+@st.cache_data(max_entries=MAX_ENTRIES, show_spinner=False)
+def _read_csv(path: str, mtime_ns: int, size: int) -> pd.DataFrame:
+    return pd.read_csv(path)
+
+
+def read_csv(path: str | os.PathLike) -> pd.DataFrame:
+    """pd.read_csv(path), cached until the file changes. Returns a copy the caller may modify."""
+    return _read_csv(*file_stamp(path))
+
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _load_persons(
+    path: str, mtime_ns: int, size: int, year: int, locations_config_path: str | None, config_stamp: tuple | None
+):
+    return csv_to_personlist(path, year=year, locations_config_path=locations_config_path)
+
+
+def load_persons(path: str | os.PathLike, year: int = 2026, locations_config_path: str | None = None):
+    """Shared PersonList for a preferences CSV; do not mutate the result."""
+    return _load_persons(*file_stamp(path), year, locations_config_path, _config_stamp(locations_config_path))
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _availability_grid(
+    path: str, mtime_ns: int, size: int, year: int, locations_config_path: str | None, config_stamp: tuple | None
+) -> pd.DataFrame:
+    m = load_preference_matrix(path, year=year, locations_config_path=locations_config_path)
+    info = pd.DataFrame({
+        "name": m.names,
+        "role": [r.value for r in m.roles],
+        "month_max": m.month_max,
+        "month_avg": m.month_avg,
+    })
+    flags = np.array(m.pref_loc, dtype=np.int64).reshape(len(m.names), len(m.locations))
+    for j, loc in enumerate(m.locations):
+        info[f"pref_loc_{str(loc).replace(' ', '_')}"] = flags[:, j]
+
+    # persons x dates in one step from the packed 0/1 rows; unparsable dates are dropped
+    cells = np.frombuffer(b"".join(m.availability), dtype=np.uint8).reshape(len(m.names), len(m.dates))
+    dates = pd.to_datetime(pd.Series(m.dates, dtype=object), format="%Y-%m-%d", errors="coerce")
+    keep = dates.notna().to_numpy()
+    if not keep.any():
+        return info
+    grid = pd.DataFrame(cells[:, keep] == 1, columns=dates[keep].dt.strftime("%Y-%m-%d"))
+    full_range = pd.date_range(dates[keep].min(), dates[keep].max()).strftime("%Y-%m-%d")
+    grid = grid.reindex(columns=full_range, fill_value=False)
+    return pd.concat([info, grid], axis=1)
+
+
+def availability_grid(
+    path: str | os.PathLike, year: int = 2026, locations_config_path: str | None = None
+) -> pd.DataFrame:
+    """One row per person: name, role, month_max, month_avg, pref_loc_<location> flags, then
+    one bool column per date (YYYY-MM-DD) over the first..last date of the preferences CSV.
+    """
+    return _availability_grid(*file_stamp(path), year, locations_config_path, _config_stamp(locations_config_path))
+
+
+@st.cache_data(max_entries=MAX_ENTRIES, show_spinner=False)
+def _role_map(
+    path: str, mtime_ns: int, size: int, locations_config_path: str | None, config_stamp: tuple | None
+) -> dict[str, str]:
+    persons = _load_persons(path, mtime_ns, size, 2026, locations_config_path, config_stamp)
+    # Role.TESTER has value "T"; compare by value for version safety
+    return {p.name: "(T)" if getattr(p.role, "value", p.role) == "T" else "(P)" for p in persons}
+
+
+def role_map(path: str | os.PathLike, locations_config_path: str | None = None) -> dict[str, str]:
+    """name -> '(T)' / '(P)' for the persons in a preferences CSV."""
+    return _role_map(*file_stamp(path), locations_config_path, _config_stamp(locations_config_path))
+
+
+@st.cache_data(max_entries=MAX_ENTRIES, show_spinner=False)
+def _penalty_pivot(path: str, mtime_ns: int, size: int) -> pd.DataFrame:
+    df = _read_csv(path, mtime_ns, size)
+    if df.empty or "component" not in df.columns:
+        return pd.DataFrame()
+    if "weighted" in df.columns:
+        agg = df.groupby(["person", "component"])["weighted"].sum()
+    else:
+        agg = df.groupby(["person", "component"]).size()
+    return agg.unstack("component", fill_value=0).sort_index(axis=1)
+
+
+def penalty_pivot(path: str | os.PathLike) -> pd.DataFrame:
+    """person x component table of weighted penalties (row count when there is no weight)."""
+    return _penalty_pivot(*file_stamp(path))
+
+
+@st.cache_data(max_entries=MAX_ENTRIES, show_spinner=False)
+def _load_stats(path: str, mtime_ns: int, size: int) -> dict[str, pd.DataFrame] | None:
+    stats = read_stats(path)
+    if stats is None:
+        return None
+    persons = pd.DataFrame(stats["persons"]).set_index("name")
+    cube = pd.DataFrame(stats["cube"])
+    cube["person"] = persons.index.to_numpy()[cube["person"].to_numpy(dtype=int)]
+    cube["location"] = [stats["locations"][i] for i in cube["location"]]
+    penalties = pd.DataFrame(stats["penalties"])
+    by_person = penalties[penalties["person"] != ""]
+    pivot = by_person.pivot(index="person", columns="component", values="weighted")
+    return {
+        "persons": persons,
+        "cube": cube,
+        "penalties": penalties,
+        "penalty_pivot": pivot.fillna(0).astype(int).sort_index(axis=1),
+        "coverage": pd.DataFrame(stats["coverage"]),
+    }
+
+
+def load_stats(path: str | os.PathLike, source: str | os.PathLike | None = None) -> dict[str, pd.DataFrame] | None:
+    """Tables of a roster_stats file (persons, cube, penalties, penalty_pivot, coverage).
+
+    None when the file is missing, of another version or older than *source* (the roster or
+    penalties CSV it summarises, edited after the run); callers then fall back to the CSVs.
+    """
+    try:
+        stamp = file_stamp(path)
+        if source is not None and os.stat(source).st_mtime_ns > stamp[1]:
+            return None
+    except FileNotFoundError:
+        return None
+    return _load_stats(*stamp)
+
+
+def invalidate() -> None:
+    """Drop every cached entry, e.g. after a run wrote new output files."""
+    for fn in (_read_csv, _load_persons, _availability_grid, _role_map, _penalty_pivot, _load_stats):
+        fn.clear()
@@ -1,20 +1,19 @@
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 
 from config import get_data_sources_config
+from run_history import DEFAULT_DB, backfill, list_runs
+from ui import data_cache, table_view
 
 
-def _find_diagnostics_files(roster_folder: Path) -> list[Path]:
-    """Return all rooster_diagnostics.csv files under roster_folder, newest first."""
+def _find_diagnostics_files(history_db: Path, roster_folder: Path, root: Path) -> list[Path]:
+    """Existing diagnostics files of failed runs from the run history, newest first."""
     try:
-        files = sorted(
-            roster_folder.rglob("rooster_diagnostics.csv"),
-            key=lambda p: p.stat().st_mtime,
-            reverse=True,
-        )
-        return files
+        backfill(history_db, roster_folder, root)  # no-op once the database has been filled
+        return [Path(r.diagnostics_path) for r in list_runs(history_db, root, with_diagnostics=True)]
     except Exception:
         return []
 
@@ -30,7 +29,7 @@ def _current_diag_path(
 
 def _load_diag(path: Path) -> pd.DataFrame:
     try:
-        return pd.read_csv(path)
+        return data_cache.read_csv(path)
     except FileNotFoundError:
         return pd.DataFrame()
     except Exception as e:
@@ -38,14 +37,20 @@ def _load_diag(path: Path) -> pd.DataFrame:
         return pd.DataFrame()
 
 
-def _style_diag_df(df: pd.DataFrame) -> pd.DataFrame:
+def _flags(df: pd.DataFrame) -> pd.DataFrame:
+    """The c_* columns as bools ("true"/"1"/"yes", any case, count as set)."""
+    flag_cols = [c for c in df.columns if c.startswith("c_")]
+    return pd.DataFrame(
+        {c: df[c].astype(str).str.strip().str.lower().isin(("true", "1", "yes")) for c in flag_cols},
+        index=df.index,
+    )
+
+
+def _style_diag_df(df: pd.DataFrame, flags: pd.DataFrame) -> pd.DataFrame:
     """Return a display-friendly copy with bool flags as symbols."""
     display = df.copy()
-    flag_cols = [c for c in df.columns if c.startswith("c_")]
-    for col in flag_cols:
-        display[col] = display[col].apply(
-            lambda v: "✓" if str(v).strip().lower() in ("true", "1", "yes") else "✗"
-        )
+    for col in flags.columns:
+        display[col] = np.where(flags[col].to_numpy(), "✓", "✗")
     return display
 
 
@@ -66,8 +71,9 @@ def render_diagnose_page() -> None:
     # Current run's expected path
     current_path = _current_diag_path(roster_folder, selected_year, selected_quarter)
 
-    # Scan for all historical diagnostics files
-    all_files = _find_diagnostics_files(roster_folder)
+    # All historical diagnostics files, from the run history
+    history_db = _resolve(ds_conf.get("run_history_db", DEFAULT_DB))
+    all_files = _find_diagnostics_files(history_db, roster_folder, root)
 
     if not all_files and (current_path is None or not current_path.exists()):
         st.info(
@@ -115,8 +121,14 @@ def render_diagnose_page() -> None:
 
     # Summary counts
     total_rows = len(df)
-    shortage_rows = df[df["assigned"] < df["required"]] if "assigned" in df.columns and "required" in df.columns else df
-    n_shortage = len(shortage_rows)
+    has_counts = "assigned" in df.columns and "required" in df.columns
+    if has_counts:
+        shortage = (
+            pd.to_numeric(df["assigned"], errors="coerce") < pd.to_numeric(df["required"], errors="coerce")
+        ).to_numpy()
+    else:
+        shortage = np.ones(total_rows, dtype=bool)
+    n_shortage = int(shortage.sum())
     n_ok = total_rows - n_shortage
 
     col1, col2, col3 = st.columns(3)
@@ -126,8 +138,7 @@ def render_diagnose_page() -> None:
 
     st.markdown("---")
 
-    # Display table with highlighting
-    display_df = _style_diag_df(df)
+    flags = _flags(df)
 
     # Rename flag columns for display
     rename_map = {
@@ -137,30 +148,43 @@ def render_diagnose_page() -> None:
         "c_single_first": "Eerste tester",
         "c_exclusions": "Uitsluitingen",
     }
-    display_df = display_df.rename(columns=rename_map)
-
-    def _highlight_shortage(row: pd.Series):
-        try:
-            if int(row.get("assigned", 0)) < int(row.get("required", 0)):
-                return ["background-color: #ffd6d6"] * len(row)
-        except Exception:
-            pass
-        return [""] * len(row)
 
+    # Filters, server-side: only the current page is sent to the browser
     st.subheader("Overzicht niet-planbare dagen")
+    mask = np.ones(total_rows, dtype=bool)
+    scope = str(selected_file)  # options and date bounds differ per file
+    fcol1, fcol2, fcol3 = st.columns([2, 2, 1])
+    with fcol1:
+        if "date" in df.columns:
+            mask &= table_view.date_range_mask(df["date"], "Periode", key=f"diag_dates|{scope}")
+    with fcol2:
+        if "location" in df.columns:
+            locations = sorted(df["location"].dropna().astype(str).unique())
+            chosen = st.multiselect("Locatie", locations, key=f"diag_locations|{scope}")
+            if chosen:
+                mask &= df["location"].astype(str).isin(chosen).to_numpy()
+    with fcol3:
+        if has_counts and st.checkbox("Alleen onderbezet", key="diag_short_only"):
+            mask &= shortage
+
+    page = table_view.paginate(df[mask], key="diag")
+    display_df = _style_diag_df(page, flags.loc[page.index]).rename(columns=rename_map)
+    highlight = shortage[df.index.get_indexer(page.index)] if has_counts else np.zeros(len(page), dtype=bool)
     st.dataframe(
-        display_df.style.apply(_highlight_shortage, axis=1),
+        display_df.style.apply(
+            lambda d: table_view.row_style(highlight, "background-color: #ffd6d6", d.columns, d.index),
+            axis=None,
+        ),
         use_container_width=True,
     )
 
     # Per-constraint breakdown
-    flag_display_cols = [rename_map.get(c, c) for c in ["c_availability", "c_max_per_day", "c_max_per_week", "c_single_first", "c_exclusions"] if rename_map.get(c, c) in display_df.columns]
+    flag_display_cols = [c for c in ["c_availability", "c_max_per_day", "c_max_per_week", "c_single_first", "c_exclusions"] if c in flags.columns]
     if flag_display_cols and n_shortage > 0:
         st.markdown("### Meest voorkomende oorzaken")
-        cause_counts = {}
-        for col in flag_display_cols:
-            n = (display_df.loc[df["assigned"] < df["required"], col] == "✓").sum() if "assigned" in df.columns and "required" in df.columns else (display_df[col] == "✓").sum()
-            cause_counts[col] = int(n)
+        cause_counts = {
+            rename_map[c]: int(flags.loc[shortage, c].sum()) for c in flag_display_cols
+        }
         cause_df = (
             pd.DataFrame.from_dict(cause_counts, orient="index", columns=["Aantal"])
             .sort_values("Aantal", ascending=False)
@@ -1,82 +1,112 @@
-import os
-import sys
-import subprocess
+import dataclasses
+import hashlib
+import io
+import traceback
 from pathlib import Path
 from datetime import datetime as _dt
+from types import SimpleNamespace
 from typing import Optional
 import pandas as pd
 import streamlit as st
 
-from person_list import csv_to_personlist
+import persistence
+from person_list import is_date_field, load_preference_matrix
+from roster_api import DEFAULT_CONSTRAINTS, DEFAULT_OBJECTIVES, RosterParams, solve_roster
+from run_workspace import capture_output
 from shift_manager import build_location_plan, get_weekday_from_date
+from ui import data_cache
 from config import (
     get_locations_config,
-    get_data_sources_config,
     get_weights_config,
     get_departments_config,
+    get_department_data_sources,
     get_department_defaults,
 )
 
-def validate_csv_columns(csv_path: Path) -> tuple[bool, list[str], list[str]]:
+def validate_csv_columns(columns: list[str]) -> tuple[bool, list[str], list[str]]:
     """
-    Validate that the CSV has required columns.
+    Validate that the CSV header has the required columns.
     Returns: (is_valid, missing_columns, warnings)
     """
     required_columns = ["Name", "Tester", "Month_max", "Month_avg"]
-    
+
+    # Normalize column names (case-insensitive check)
+    columns_lower = [str(col).lower() for col in columns]
+
+    missing = []
+    warnings = []
+
+    # Check required columns
+    for req_col in required_columns:
+        if req_col.lower() not in columns_lower and req_col not in columns:
+            missing.append(req_col)
+
+    # Check if there are any date columns (format: d-m or dd-mm)
+    has_date_columns = any(is_date_field(str(col)) for col in columns)
+    if not has_date_columns:
+        warnings.append("Geen datum kolommen gevonden (verwacht formaat: d-m of dd-mm)")
+
+    # Check optional preference location columns
+    has_pref_loc = any("Pref_Loc" in str(col) for col in columns)
+    if not has_pref_loc:
+        warnings.append("Geen locatie voorkeuren kolommen gevonden (Pref_Loc_0, Pref_Loc_1, etc.)")
+
+    is_valid = len(missing) == 0
+    return is_valid, missing, warnings
+
+
+@dataclasses.dataclass
+class UploadSession:
+    """One preferences file, parsed once and kept in session state until its content changes."""
+    key: tuple  # (sha256 of the bytes, year, locations config path)
+    path: Path
+    is_valid: bool
+    missing: list[str]
+    warnings: list[str]
+    persons: list = dataclasses.field(default_factory=list)
+    dates: list[str] = dataclasses.field(default_factory=list)  # YYYY-MM-DD keys from the availability columns
+    preview: Optional[pd.DataFrame] = None  # first PREVIEW_ROWS rows
+    parse_error: Optional[str] = None
+
+
+PREVIEW_ROWS = 5
+
+
+def get_upload_session(
+    csv_path: Path, data: bytes, year: int, locations_config_path: Optional[str]
+) -> UploadSession:
+    """Return the session for these bytes, building (and writing csv_path) only on a change."""
+    key = (hashlib.sha256(data).hexdigest(), year, locations_config_path)
+    sess = st.session_state.get("upload_session")
+    if isinstance(sess, UploadSession) and sess.key == key and sess.path == csv_path:
+        return sess
+
+    if not csv_path.exists() or csv_path.read_bytes() != data:
+        csv_path.write_bytes(data)
+
+    preview = None
     try:
-        # Read just the header to check columns
-        df = pd.read_csv(csv_path, sep=None, engine="python", nrows=0)
-        columns = df.columns.tolist()
-        
-        # Normalize column names (case-insensitive check)
-        columns_lower = [col.lower() for col in columns]
-        
-        missing = []
-        warnings = []
-        
-        # Check required columns
-        for req_col in required_columns:
-            if req_col.lower() not in columns_lower and req_col not in columns:
-                missing.append(req_col)
-        
-        # Check if there are any date columns (format: d-m or dd-mm)
-        import re
-        has_date_columns = any(re.match(r"^(?:0?[1-9]|[12][0-9]|3[01])-(?:0?[1-9]|1[0-2])$", str(col)) for col in columns)
-        if not has_date_columns:
-            warnings.append("Geen datum kolommen gevonden (verwacht formaat: d-m of dd-mm)")
-        
-        # Check optional preference location columns
-        has_pref_loc = any("Pref_Loc" in str(col) for col in columns)
-        if not has_pref_loc:
-            warnings.append("Geen locatie voorkeuren kolommen gevonden (Pref_Loc_0, Pref_Loc_1, etc.)")
-        
-        is_valid = len(missing) == 0
-        return is_valid, missing, warnings
-        
+        preview = pd.read_csv(io.BytesIO(data), sep=None, engine="python", nrows=PREVIEW_ROWS)
+        is_valid, missing, warnings = validate_csv_columns(preview.columns.tolist())
     except Exception as e:
-        return False, [], [f"Fout bij valideren van CSV: {str(e)}"]
-
+        is_valid, missing, warnings = False, [], [f"Fout bij valideren van CSV: {str(e)}"]
 
-def _find_windows_python_in_venv(root: Path) -> Optional[Path]:
-    """Find python.exe in current venv or common local venv folders on Windows."""
-    venv_env = os.environ.get("VIRTUAL_ENV")
-    if venv_env:
-        cand = Path(venv_env) / "Scripts" / "python.exe"
-        if cand.exists():
-            return cand
-    for name in (".venv", "venv", "env", ".env"):
-        cand = root / name / "Scripts" / "python.exe"
-        if cand.exists():
-            return cand
-    return None
+    sess = UploadSession(key=key, path=csv_path, is_valid=is_valid, missing=missing, warnings=warnings, preview=preview)
+    try:
+        matrix = load_preference_matrix(str(csv_path), year=year, locations_config_path=locations_config_path)
+        sess.persons = matrix.to_personlist()
+        # The availability columns, read once from the parse instead of per person.
+        sess.dates = sorted({d for d in matrix.dates if len(d) == 10 and d[4] == "-" and d[7] == "-"})
+    except Exception as e:
+        sess.parse_error = str(e)
+    st.session_state["upload_session"] = sess
+    return sess
 
 
 def render_generator_page() -> None:
     st.title("🔁 Roostergenerator")
 
     root = Path(__file__).resolve().parent.parent.parent  # project root (parent of src)
-    base_ds_conf = get_data_sources_config()
     dept_conf = get_departments_config()
     dept_map = dept_conf.get("departments", {}) if isinstance(dept_conf, dict) else {}
     dept_names = list(dept_map.keys())
@@ -92,8 +122,7 @@ def render_generator_page() -> None:
         st.caption("Geen afdelingen-config gevonden; standaard-instellingen worden gebruikt.")
 
     dept_defaults = get_department_defaults(selected_department)
-    dept_ds_overrides = dept_defaults.get("data_sources", {}) if isinstance(dept_defaults, dict) else {}
-    ds_conf = {**base_ds_conf, **dept_ds_overrides}
+    ds_conf = get_department_data_sources(selected_department)
     locations_config_path = dept_defaults.get("locations_config") if isinstance(dept_defaults, dict) else None
     pref_dir_rel = ds_conf.get("preferences_dir", "data/preferences")
     prefs_dir = root / pref_dir_rel
@@ -122,60 +151,47 @@ def render_generator_page() -> None:
     csv_path: Optional[Path] = None
     selected_any = False
 
+    csv_bytes: Optional[bytes] = None
     if uploaded is not None:
-        target_path = prefs_dir / f"uploaded_{uploaded.name}"
+        csv_path = prefs_dir / f"uploaded_{uploaded.name}"
         csv_bytes = uploaded.getvalue()
-        with open(target_path, "wb") as f:
-            f.write(csv_bytes)
-        st.success(f"Bestand opgeslagen als {target_path.relative_to(root)}")
-        csv_path = target_path
         selected_any = True
     elif prev_choice and prev_choice != "(geen)":
         csv_path = prefs_dir / prev_choice
-        selected_any = True
+        try:
+            csv_bytes = csv_path.read_bytes()
+            selected_any = True
+        except OSError as e:
+            st.error(f"Kon bestand niet lezen: {e}")
 
-    persons = []
     preview_ok = False
-    if selected_any and csv_path is not None:
-        # Validate CSV columns
-        is_valid, missing_cols, warnings = validate_csv_columns(csv_path)
-        
-        if not is_valid:
-            st.error(f"❌ CSV validatie gefaald! Ontbrekende verplichte kolommen: {', '.join(missing_cols)}")
+    if selected_any and csv_path is not None and csv_bytes is not None:
+        # Parsed once per file content; reruns reuse the session.
+        upload = get_upload_session(csv_path, csv_bytes, selected_year, locations_config_path)
+        if uploaded is not None:
+            st.success(f"Bestand opgeslagen als {csv_path.relative_to(root)}")
+
+        if not upload.is_valid:
+            st.error(f"❌ CSV validatie gefaald! Ontbrekende verplichte kolommen: {', '.join(upload.missing)}")
             st.info("Verplichte kolommen: Name, Tester, Month_max, Month_avg")
             st.info("Datum kolommen in formaat: d-m of dd-mm (bijv. 1-10, 15-11)")
-        else:
-            if warnings:
-                for warning in warnings:
-                    st.warning(f"⚠️ {warning}")
-        
-        # Parse persons
-        try:
-            persons = csv_to_personlist(
-                str(csv_path),
-                year=selected_year,
-                locations_config_path=locations_config_path,
-            )
-        except Exception as e:
-            st.error(f"Kon CSV niet parsen: {e}")
+        for warning in upload.warnings:
+            st.warning(f"⚠️ {warning}")
+
+        if upload.parse_error:
+            st.error(f"Kon CSV niet parsen: {upload.parse_error}")
 
         # Preview file
-        try:
-            head_df = pd.read_csv(csv_path, sep=None, engine="python").head(5)
-            st.subheader("Bestandsvoorbeeld (eerste 5 rijen)")
-            st.dataframe(head_df, use_container_width=True)
+        if upload.preview is not None:
+            st.subheader(f"Bestandsvoorbeeld (eerste {PREVIEW_ROWS} rijen)")
+            st.dataframe(upload.preview, use_container_width=True)
             preview_ok = True
-        except Exception:
+        else:
             st.caption("Kon geen tabelvoorbeeld maken; bestand kan tab-delimited zijn.")
 
         # Build initial per-date, per-location shift plan (from locations config, fallback to weekday defaults)
         try:
-            date_keys = set()
-            for p in persons:
-                for k in p.availability.keys():
-                    if isinstance(k, str) and len(k) == 10 and k[4] == "-" and k[7] == "-":
-                        date_keys.add(k)
-            date_list = sorted(date_keys)
+            date_list = list(upload.dates)
 
             # Seed from locations config teams_per_date if present
             try:
@@ -243,9 +259,8 @@ def render_generator_page() -> None:
             else:
                 st.info("Geen datums gevonden om een shiftplan te maken.")
 
-            # Write edited plan into config/locations.json under teams_per_date per location
+            # Persist the edited plan as the department's shiftplan file
             if edited_plan:
-                import json as _json
                 # Build per-location mapping
                 per_loc: dict[str, dict[str, int]] = {loc_name: {} for loc_name in locs}
                 for d, row in edited_plan.items():
@@ -257,8 +272,7 @@ def render_generator_page() -> None:
                         if val > 0:
                             per_loc[loc_name][d] = val
 
-                # Write shiftplan file
-                shiftplan_path.parent.mkdir(parents=True, exist_ok=True)
+                # Write shiftplan file; unchanged plans are not rewritten, edits are coalesced
                 payload = {
                     "year": selected_year,
                     "quarter": selected_quarter,
@@ -269,12 +283,13 @@ def render_generator_page() -> None:
                     for d, val in dmap.items():
                         teams_per_date.setdefault(d, {})[loc_name] = val
                 payload["teams_per_date"] = teams_per_date
+                pending_key = f"shiftplan_pending_{shiftplan_path}"
                 try:
-                    shiftplan_path.write_text(
-                        _json.dumps(payload, ensure_ascii=False, indent=2),
-                        encoding="utf-8",
-                    )
-                    st.success(f"Shiftplan opgeslagen: {shiftplan_path.relative_to(root)}")
+                    if persistence.save_json_later(shiftplan_path, payload):
+                        st.session_state[pending_key] = True
+                        st.info(f"Wijzigingen worden opgeslagen in {shiftplan_path.relative_to(root)}")
+                    elif st.session_state.pop(pending_key, False):  # the scheduled write has landed
+                        st.success(f"Shiftplan opgeslagen: {shiftplan_path.relative_to(root)}")
                 except Exception as e:
                     st.warning(f"Kon shiftplan niet schrijven: {e}")
         except Exception as e:
@@ -374,57 +389,48 @@ def render_generator_page() -> None:
             "Shifts met te weinig testers worden zichtbaar in het rooster en de diagnose."
         ),
     )
-    if st.button("Genereer rooster (run main.py)", disabled=disabled):
-        main_py = root / "src" / "main.py"
-        py = _find_windows_python_in_venv(root) or Path(sys.executable)
-        cmd = [str(py), "-X", "utf8", str(main_py)]
-        if csv_path is not None:
-            cmd += ["--csv", str(csv_path)]
-        if rooster_name and rooster_name.strip():
-            cmd += ["--rooster-name", rooster_name.strip()]
-        if selected_department:
-            cmd += ["--department", selected_department]
-        cmd += ["--quarter", str(selected_quarter)]
+    if st.button("Genereer rooster", disabled=disabled):
         shiftplans_dir = ds_conf.get("shiftplans_dir", "data/shiftplans")
         dept_slug = (selected_department or "default").strip().replace(" ", "_")
         shiftplan_path = root / shiftplans_dir / dept_slug / f"{selected_year}_{selected_quarter}.json"
-        if shiftplan_path.exists():
-            cmd += ["--shiftplan-path", str(shiftplan_path)]
-
-        # Write weights override to JSON and pass path
-        try:
-            weights_path = plan_dir / "weights_override.json"
-            import json as _json
-            weights_path.write_text(_json.dumps(w_inputs, ensure_ascii=False, indent=2), encoding="utf-8")
-            cmd += ["--weights", str(weights_path)]
-        except Exception:
-            pass
-
-        # Pass constraints and objectives selections
-        if cons_selected:
-            cmd += ["--use-constraints", *cons_selected]
-        if obj_selected:
-            cmd += ["--use-objectives", *obj_selected]
-        if verbose:
-            cmd += ["--verbose"]
-        if allow_partial:
-            cmd += ["--allow-partial"]
+        persistence.flush(shiftplan_path)  # the solver must see the latest edits
+        params = RosterParams(
+            csv_file=str(csv_path) if csv_path is not None else None,
+            rooster_name=rooster_name.strip() if rooster_name and rooster_name.strip() else None,
+            department=selected_department or None,
+            quarter=str(selected_quarter),
+            shiftplan_path=str(shiftplan_path) if shiftplan_path.exists() else None,
+            weights={k: int(v) for k, v in w_inputs.items() if isinstance(v, (int, float))},
+            use_constraints=cons_selected or list(DEFAULT_CONSTRAINTS),
+            use_objectives=obj_selected or list(DEFAULT_OBJECTIVES),
+            verbose=verbose,
+            allow_partial=allow_partial,
+            output_root=str(root),
+        )
 
+        # In-process run: no interpreter spawn; stdout/stderr are captured per thread for the
+        # run log, so runs of other sessions in parallel keep their own output.
+        roster_result = None
+        returncode = 0
         with st.spinner("Bezig met genereren van rooster..."):
-            result = subprocess.run(
-                cmd,
-                cwd=str(root),
-                capture_output=True,
-                text=True,
-                encoding="utf-8",
-                errors="replace",
-            )
-
-        logs_dir = root / "run_logs"
-        logs_dir.mkdir(exist_ok=True)
-        ts = _dt.now().strftime("%Y%m%d_%H%M%S")
-        stdout_path = logs_dir / f"stdout_{ts}.log"
-        stderr_path = logs_dir / f"stderr_{ts}.log"
+            with capture_output() as (out_buf, err_buf):
+                try:
+                    roster_result = solve_roster(params)
+                except Exception:
+                    returncode = 1
+                    err_buf.write(traceback.format_exc())
+        data_cache.invalidate()  # the run may have rewritten rosters, penalties and diagnostics
+        result = SimpleNamespace(returncode=returncode, stdout=out_buf.getvalue(), stderr=err_buf.getvalue())
+
+        if roster_result is not None and roster_result.workspace:
+            logs_dir = Path(roster_result.workspace)  # next to the run's inputs and events
+            stdout_path, stderr_path = logs_dir / "stdout.log", logs_dir / "stderr.log"
+        else:
+            logs_dir = root / "run_logs"
+            logs_dir.mkdir(exist_ok=True)
+            ts = _dt.now().strftime("%Y%m%d_%H%M%S_%f")
+            stdout_path = logs_dir / f"stdout_{ts}.log"
+            stderr_path = logs_dir / f"stderr_{ts}.log"
         try:
             if result.stdout:
                 stdout_path.write_text(result.stdout, encoding="utf-8", errors="ignore")
@@ -434,7 +440,7 @@ def render_generator_page() -> None:
             pass
 
         st.session_state["last_run"] = {
-            "cmd": cmd,
+            "params": dataclasses.asdict(params),
             "returncode": result.returncode,
             "stdout": result.stdout,
             "stderr": result.stderr,
@@ -445,8 +451,7 @@ def render_generator_page() -> None:
             },
         }
 
-        # Detect whether the solver reported no solution (main.py exits 0 but prints the message)
-        no_solution = "Geen oplossing gevonden" in (result.stdout or "")
+        no_solution = roster_result is not None and not roster_result.feasible
 
         if result.returncode == 0 and not no_solution:
             st.success("Rooster gegenereerd. Ga naar de tab 'Rooster' om het resultaat te bekijken.")
@@ -465,8 +470,9 @@ def render_generator_page() -> None:
                     st.session_state["page_nav"] = "Diagnose"
                     st.rerun()
 
-        st.write("Uitvoer van main.py:")
-        st.write(f"Python: {py}")
+        st.write("Uitvoer van de solver:")
+        if roster_result is not None:
+            st.write(f"Status: {roster_result.status} ({roster_result.engine}, {roster_result.wall_time:.1f}s)")
         if result.stdout:
             st.subheader("stdout")
             st.code(result.stdout)
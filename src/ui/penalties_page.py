@@ -1,6 +1,8 @@
-import pandas as pd
 import streamlit as st
 
+from roster_stats import stats_path_for_penalties
+from ui import data_cache
+
 
 def render_penalties_page(ds_conf: dict, project_root: object) -> None:
     """Render the Penalties overview. Expects ds_conf from config and project_root (Path or str)."""
@@ -8,7 +10,7 @@ def render_penalties_page(ds_conf: dict, project_root: object) -> None:
 
     # Summary
     try:
-        summary = pd.read_csv(ds_conf.get("penalties_summary_csv", "penalties_summary.csv"))
+        summary = data_cache.read_csv(ds_conf.get("penalties_summary_csv", "penalties_summary.csv"))
         st.subheader("Samenvatting per component (gewogen)")
         st.dataframe(summary)
         # Exclude total row for charting
@@ -20,7 +22,8 @@ def render_penalties_page(ds_conf: dict, project_root: object) -> None:
     # Details
     st.subheader("Details")
     try:
-        df = pd.read_csv(ds_conf.get("penalties_csv", "penalties.csv"))
+        penalties_path = ds_conf.get("penalties_csv", "penalties.csv")
+        df = data_cache.read_csv(penalties_path)
 
         # Filters
         people = ["(alle)"] + sorted([p for p in df["person"].dropna().unique() if p != ""])
@@ -39,8 +42,12 @@ def render_penalties_page(ds_conf: dict, project_root: object) -> None:
         # Per-person breakdown by component
         st.subheader("Per persoon per component (gewogen)")
         if not df.empty:
-            pivot = df.groupby(["person", "component"])["weighted"].sum().reset_index()
-            pivot_table = pivot.pivot(index="person", columns="component", values="weighted").fillna(0)
+            # Pre-aggregated by the run when its statistics file is there
+            stats = data_cache.load_stats(stats_path_for_penalties(penalties_path), source=penalties_path)
+            if stats is not None:
+                pivot_table = stats["penalty_pivot"]
+            else:
+                pivot_table = data_cache.penalty_pivot(penalties_path)
             st.dataframe(pivot_table)
             st.bar_chart(pivot_table)
     except FileNotFoundError:
@@ -1,10 +1,90 @@
-import ast
 import re
 from pathlib import Path
+import numpy as np
 import pandas as pd
 import streamlit as st
-from config import get_data_sources_config, get_departments_config, get_department_defaults
-from person_list import csv_to_personlist
+from config import (
+    get_data_sources_config,
+    get_department_data_sources,
+    get_department_defaults,
+    get_departments_config,
+)
+from roster_stats import stats_path
+from run_history import DEFAULT_DB, backfill, list_runs
+from ui import data_cache, table_view
+
+
+_TESTER_COL = re.compile(r"^(?:tester_|testers?)(\d+)$", re.IGNORECASE)
+_QUOTED_NAME = r"'([^']*)'|\"([^\"]*)\""  # items of a repr()'d list of names
+
+
+def _tester_assignments(df: pd.DataFrame, tester_cols: list[str]) -> pd.DataFrame:
+    """One row per assignment: row (df index), slot, name (categorical).
+
+    slot is the tester column name for split tester columns, or the 0-based position
+    in the legacy 'testers' list column.
+    """
+    if tester_cols:
+        long = (
+            df[tester_cols]
+            .melt(ignore_index=False, var_name="slot", value_name="name")
+            .dropna(subset=["name"])
+            .rename_axis("row")
+            .reset_index()
+        )
+        long["name"] = long["name"].astype(str).str.strip()
+    elif "testers" in df.columns:
+        found = df["testers"].astype("string").str.extractall(_QUOTED_NAME)
+        long = found[0].fillna(found[1]).rename("name").rename_axis(["row", "slot"]).reset_index()
+    else:
+        long = pd.DataFrame({"row": pd.Series(dtype=int), "slot": pd.Series(dtype=int), "name": pd.Series(dtype=str)})
+    long = long[long["name"].str.len() > 0].reset_index(drop=True)
+    long["name"] = long["name"].astype("category")
+    return long
+
+
+def _with_role(names: pd.Series, role_map: dict[str, str]) -> pd.Series:
+    """'Naam' -> 'Naam (T)' for names in role_map; everything else unchanged."""
+    labels = {
+        n: f"{n} {role_map[n.strip()]}"
+        for n in names.unique()
+        if isinstance(n, str) and n.strip() in role_map
+    }
+    if not labels:
+        return names
+    mapped = names.map(labels)
+    return mapped.where(mapped.notna(), names)
+
+
+def _shift_counts(assignments: pd.DataFrame, df: pd.DataFrame) -> pd.DataFrame:
+    """Persoon / Shifts / Gem/maand / Max/maand derived from the roster itself."""
+    shift_counts = (
+        assignments["name"]
+        .value_counts()
+        .rename_axis("Persoon")
+        .reset_index(name="Shifts")
+    )
+
+    # Bereken actuele gemiddelde en maximale shifts per maand op basis van het gegenereerde rooster
+    shift_counts["Gem/maand (actueel)"] = pd.NA
+    shift_counts["Max/maand (actueel)"] = pd.NA
+    if not assignments.empty and "date" in df.columns:
+        try:
+            dates = pd.to_datetime(df["date"], errors="coerce")
+            months = dates.dt.year * 12 + dates.dt.month  # NaN for unparsable dates
+            per_month = (
+                assignments.assign(_month=months.reindex(assignments["row"]).to_numpy())
+                .groupby(["name", "_month"], observed=True)
+                .size()
+            )
+            # Gemiddelde en maximum per persoon over de maanden waarin ze shifts hebben
+            stats = per_month.groupby(level="name", observed=True).agg(["mean", "max"])
+            shift_counts["Gem/maand (actueel)"] = shift_counts["Persoon"].map(stats["mean"]).astype(float)
+            shift_counts["Max/maand (actueel)"] = shift_counts["Persoon"].map(stats["max"]).astype("Int64")
+        except Exception:
+            # Als iets misgaat met datum parsing, blijven de kolommen leeg
+            pass
+    return shift_counts
 
 
 def _read_diagnostics() -> pd.DataFrame:
@@ -28,7 +108,7 @@ def _read_diagnostics() -> pd.DataFrame:
         folder = _Path(roster_folder) if _Path(roster_folder).is_absolute() else root / roster_folder
         candidate = folder / str(year) / str(quarter) / "rooster_diagnostics.csv"
         try:
-            return pd.read_csv(candidate)
+            return data_cache.read_csv(candidate)
         except FileNotFoundError:
             pass
 
@@ -39,7 +119,7 @@ def _read_diagnostics() -> pd.DataFrame:
         root_part, _ = os.path.split(roster_path)
         diag_path = os.path.join(root_part, "rooster_diagnostics.csv")
     try:
-        return pd.read_csv(diag_path)
+        return data_cache.read_csv(diag_path)
     except FileNotFoundError:
         return pd.DataFrame()
 
@@ -58,52 +138,50 @@ def render_rooster_page() -> None:
     roster_folder_base = _resolve_path(ds_conf.get("roster_folder", "data/generated/roosters"))
     selected_year = st.session_state.get("global_year")
     selected_quarter = st.session_state.get("global_quarter")
-    if selected_year and selected_quarter:
-        roster_folder = roster_folder_base / str(selected_year) / str(selected_quarter)
-    else:
-        roster_folder = roster_folder_base
-    roster_folder.mkdir(parents=True, exist_ok=True)
 
-    roster_files = []
+    # Rosters come from the run history (one indexed query), not from globbing folders.
+    history_db = _resolve_path(ds_conf.get("run_history_db", DEFAULT_DB))
+    runs = []
     try:
-        roster_files = sorted([
-            p for p in roster_folder.glob("*.csv")
-            if "penalties" not in p.stem and "summary" not in p.stem
-        ])
-    except Exception:
-        roster_files = []
-
-    if not roster_files and roster_folder != roster_folder_base:
-        try:
-            roster_files = sorted([
-                p for p in roster_folder_base.glob("*.csv")
-                if "penalties" not in p.stem and "summary" not in p.stem
-            ])
-        except Exception:
-            roster_files = []
-        roster_folder = roster_folder_base
+        backfill(history_db, roster_folder_base, root)  # no-op once the database has been filled
+        if selected_year and selected_quarter:
+            runs = list_runs(history_db, root, year=selected_year, quarter=str(selected_quarter), with_roster=True)
+        if not runs:
+            runs = list_runs(history_db, root, with_roster=True)
+    except Exception as e:
+        st.warning(f"Kon roosterhistorie niet lezen: {e}")
+    run_by_path = {Path(r.roster_path): r for r in runs}
 
     options = []
     if roster_csv_default.exists():
         options.append(roster_csv_default)
-    for p in roster_files:
+    for p in run_by_path:
         if p not in options:
             options.append(p)
 
+    def _label(p: Path) -> str:
+        run = run_by_path.get(p)
+        if run is None:
+            return p.name
+        if run.year == selected_year and run.quarter == selected_quarter:
+            return p.stem
+        period = " ".join(str(x) for x in (run.year, run.quarter) if x)
+        return f"{p.stem} ({period})" if period else p.stem
+
     selected_path = roster_csv_default
     if options:
         selected_path = st.selectbox(
             "Kies rooster",
             options=options,
             index=0,
-            format_func=lambda p: p.stem if p.parent == roster_folder else p.name,
+            format_func=_label,
         )
-        selected_label = selected_path.stem if selected_path.parent == roster_folder else selected_path.name
-        st.caption(f"Geselecteerd rooster: **{selected_label}**")
+        st.caption(f"Geselecteerd rooster: **{_label(selected_path)}**")
+    selected_run = run_by_path.get(selected_path)
 
     # CSV inladen
     try:
-        df = pd.read_csv(selected_path)
+        df = data_cache.read_csv(selected_path)
     except FileNotFoundError:
         st.info("Geen rooster gevonden. Genereer eerst een rooster via de Generator.")
         # Probeer uitleg te geven waarom plannen niet gelukt is
@@ -113,193 +191,112 @@ def render_rooster_page() -> None:
             st.dataframe(diag_df, use_container_width=True)
         return
 
-    # Parse testers: support both legacy 'testers' list column and split tester columns
-    tester_cols = [
-        c
-        for c in df.columns
-        if re.match(r"^tester_\d+$", str(c), re.IGNORECASE)
-        or re.match(r"^testers?\d+$", str(c), re.IGNORECASE)
-    ]
-    if tester_cols:
-        def _tester_sort_key(col: str) -> int:
-            match = re.search(r"(\d+)$", str(col))
-            return int(match.group(1)) if match else 0
-
-        tester_cols = sorted(tester_cols, key=_tester_sort_key)
-    if "testers" in df.columns:
-        def _parse_testers_cell(x):
-            if isinstance(x, (list, tuple)):
-                return x
-            if isinstance(x, str):
-                try:
-                    return ast.literal_eval(x)
-                except (ValueError, SyntaxError):
-                    return []
-            return []
-        testers_series = df["testers"].apply(_parse_testers_cell)
-    elif tester_cols:
-        def _row_to_testers(row: pd.Series) -> list[str]:
-            vals = []
-            for c in tester_cols:
-                v = row.get(c, "")
-                if isinstance(v, float) and pd.isna(v):
-                    continue
-                v = str(v).strip()
-                if v:
-                    vals.append(v)
-            return vals
-
-        testers_series = df.apply(_row_to_testers, axis=1)
-    else:
-        testers_series = pd.Series([[] for _ in range(len(df))])
+    # Long format: one row per assignment (roster row, tester column, name)
+    tester_cols = sorted(
+        (c for c in df.columns if _TESTER_COL.match(str(c))),
+        key=lambda c: int(_TESTER_COL.match(str(c)).group(1)),
+    )
+    stats = data_cache.load_stats(stats_path(selected_path), source=selected_path)
+    assignments = _tester_assignments(df, tester_cols) if stats is None or not tester_cols else None
 
-    # Build name → role suffix map from persons CSV
+    # Build name → role suffix map: from the run's statistics, else from the persons CSV
     _role_map: dict[str, str] = {}
-    try:
-        _selected_dept = st.session_state.get("global_department")
-        _dept_defaults = get_department_defaults(_selected_dept)
-        _dept_ds = _dept_defaults.get("data_sources", {}) if isinstance(_dept_defaults, dict) else {}
-        _merged_ds = {**ds_conf, **_dept_ds}
-        _locations_cfg = _dept_defaults.get("locations_config") if isinstance(_dept_defaults, dict) else None
-
-        # Prefer most-recently uploaded file in prefs dir, fall back to default CSV
-        _pref_dir_rel = _merged_ds.get("preferences_dir", "data/preferences")
-        _prefs_dir = root / _pref_dir_rel
-        _uploaded = sorted(_prefs_dir.glob("uploaded_*.csv")) if _prefs_dir.exists() else []
-        _csv_rel = _merged_ds.get("default_persons_csv", "")
-        if _uploaded:
-            _csv_path = _uploaded[-1]  # most recent alphabetically
-        elif _csv_rel:
-            _csv_path = root / _csv_rel if not Path(_csv_rel).is_absolute() else Path(_csv_rel)
-        else:
-            _csv_path = None
-
-        if _csv_path and _csv_path.exists():
-            _persons = csv_to_personlist(str(_csv_path), locations_config_path=_locations_cfg)
-            for _p in _persons:
-                # Role.TESTER has value "T"; compare by value for version safety
-                _role_map[_p.name] = "(T)" if getattr(_p.role, "value", _p.role) == "T" else "(P)"
-    except Exception:
-        pass
-
-    def _with_role(name: str) -> str:
-        if not name or not isinstance(name, str):
-            return name
-        suffix = _role_map.get(name.strip())
-        return f"{name} {suffix}" if suffix else name
+    if stats is not None:
+        _role_map = {n: f"({r})" for n, r in stats["persons"]["role"].items()}
+    else:
+        try:
+            _selected_dept = st.session_state.get("global_department")
+            _dept_defaults = get_department_defaults(_selected_dept)
+            _merged_ds = get_department_data_sources(_selected_dept)
+            _locations_cfg = _dept_defaults.get("locations_config") if isinstance(_dept_defaults, dict) else None
+
+            # Prefer most-recently uploaded file in prefs dir, fall back to default CSV
+            _pref_dir_rel = _merged_ds.get("preferences_dir", "data/preferences")
+            _prefs_dir = root / _pref_dir_rel
+            _uploaded = sorted(_prefs_dir.glob("uploaded_*.csv")) if _prefs_dir.exists() else []
+            _csv_rel = _merged_ds.get("default_persons_csv", "")
+            if _uploaded:
+                _csv_path = _uploaded[-1]  # most recent alphabetically
+            elif _csv_rel:
+                _csv_path = root / _csv_rel if not Path(_csv_rel).is_absolute() else Path(_csv_rel)
+            else:
+                _csv_path = None
 
-    # 1) Overzicht: aantal shifts per persoon; plus actuele Gem/maand en Max/maand
-    exploded = df.assign(testers_list=testers_series).explode("testers_list")
-    exploded = exploded.dropna(subset=["testers_list"])  # filter leeg
-    exploded["testers_list"] = exploded["testers_list"].astype(str)
-    exploded = exploded[exploded["testers_list"].str.len() > 0]
+            if _csv_path and _csv_path.exists():
+                _role_map = data_cache.role_map(_csv_path, _locations_cfg)
+        except Exception:
+            pass
 
-    if not exploded.empty:
+    # 1) Overzicht: aantal shifts per persoon; plus actuele Gem/maand en Max/maand
+    if stats is not None:
+        persons = stats["persons"]
+        persons = persons[persons["shifts"] > 0]
         shift_counts = (
-            exploded["testers_list"]
-            .value_counts()
+            persons[["shifts", "avg_per_month", "max_per_month"]]
+            .astype({"avg_per_month": float, "max_per_month": "Int64"})
             .rename_axis("Persoon")
-            .reset_index(name="Shifts")
+            .reset_index()
+            .rename(columns={
+                "shifts": "Shifts",
+                "avg_per_month": "Gem/maand (actueel)",
+                "max_per_month": "Max/maand (actueel)",
+            })
         )
     else:
-        shift_counts = pd.DataFrame(columns=["Persoon", "Shifts"])
-
-    # Bereken actuele gemiddelde en maximale shifts per maand op basis van het gegenereerde rooster
-    if not exploded.empty and "date" in exploded.columns:
-        try:
-            dates = pd.to_datetime(exploded["date"], errors="coerce")
-            exploded = exploded.assign(_month=dates.dt.to_period("M"))
-            monthly_counts = (
-                exploded.dropna(subset=["_month"])
-                .groupby(["testers_list", "_month"])
-                .size()
-                .reset_index(name="cnt")
-            )
-            # Gemiddelde en maximum per persoon over de maanden waarin ze shifts hebben
-            stats = (
-                monthly_counts.groupby("testers_list")["cnt"]
-                .agg(avg="mean", max="max")
-                .reset_index()
-            )
-            stats = stats.rename(
-                columns={
-                    "testers_list": "Persoon",
-                    "avg": "Gem/maand (actueel)",
-                    "max": "Max/maand (actueel)",
-                }
-            )
-            shift_counts = shift_counts.merge(stats, on="Persoon", how="left")
-        except Exception:
-            # Als iets misgaat met datum parsing, voeg lege kolommen toe
-            shift_counts["Gem/maand (actueel)"] = pd.NA
-            shift_counts["Max/maand (actueel)"] = pd.NA
-    else:
-        shift_counts["Gem/maand (actueel)"] = pd.NA
-        shift_counts["Max/maand (actueel)"] = pd.NA
+        shift_counts = _shift_counts(assignments, df)
 
     # Sortering
     if not shift_counts.empty:
-        sort_by = [
-            c for c in ["Shifts", "Gem/maand (actueel)"] if c in shift_counts.columns
-        ]
-        if sort_by:
-            shift_counts = shift_counts.sort_values(
-                by=sort_by, ascending=[False] * len(sort_by)
-            ).reset_index(drop=True)
-        shift_counts["Persoon"] = shift_counts["Persoon"].apply(_with_role)
+        shift_counts = shift_counts.sort_values(
+            by=["Shifts", "Gem/maand (actueel)"], ascending=[False, False]
+        ).reset_index(drop=True)
+        shift_counts["Persoon"] = _with_role(shift_counts["Persoon"].astype(object), _role_map)
 
     # 2) Overzicht: penalties per persoon (gewogen som indien beschikbaar)
     penalties_per_person = pd.DataFrame()
     try:
-        penalties_path = selected_path.with_name(f"{selected_path.stem}_penalties.csv")
-        if not penalties_path.exists():
-            penalties_path = _resolve_path(ds_conf.get("penalties_csv", "penalties.csv"))
-        p = pd.read_csv(penalties_path)
-        if not p.empty:
-            if "component" in p.columns:
-                if "weighted" in p.columns:
-                    agg = (
-                        p.groupby(["person", "component"])["weighted"]
-                        .sum()
-                        .reset_index()
-                    )
-                    value_col = "weighted"
-                else:
-                    agg = (
-                        p.groupby(["person", "component"])
-                        .size()
-                        .reset_index(name="count")
-                    )
-                    value_col = "count"
-
-                # Draai naar brede tabel: kolommen per component
-                penalties_per_person = agg.pivot(
-                    index="person", columns="component", values=value_col
-                ).fillna(0)
-                # Voeg totaal kolom toe
-                penalties_per_person["Totaal"] = penalties_per_person.sum(axis=1)
-                penalties_per_person = penalties_per_person.sort_values(
-                    by="Totaal", ascending=False
-                ).reset_index()
-                penalties_per_person = penalties_per_person.rename(
-                    columns={"person": "Persoon"}
-                )
+        if stats is not None:
+            pivot = stats["penalty_pivot"]
+        else:
+            pivot = None
+            if selected_run is not None and selected_run.penalties_path:
+                penalties_path = Path(selected_run.penalties_path)
             else:
-                # Geen component kolom, val terug naar totaaltelling
-                if "weighted" in p.columns:
-                    g = p.groupby("person")["weighted"].sum().reset_index()
-                    penalties_per_person = g.rename(
-                        columns={"person": "Persoon", "weighted": "Totaal"}
-                    )
+                penalties_path = selected_path.with_name(f"{selected_path.stem}_penalties.csv")
+            if not penalties_path.exists():
+                penalties_path = _resolve_path(ds_conf.get("penalties_csv", "penalties.csv"))
+            p = data_cache.read_csv(penalties_path)
+            if not p.empty:
+                if "component" in p.columns:
+                    # Brede tabel: kolommen per component (gewogen som, anders aantal)
+                    pivot = data_cache.penalty_pivot(penalties_path)
                 else:
-                    g = p.groupby("person").size().reset_index(name="Totaal")
-                    penalties_per_person = g.rename(columns={"person": "Persoon"})
+                    # Geen component kolom, val terug naar totaaltelling
+                    if "weighted" in p.columns:
+                        g = p.groupby("person")["weighted"].sum().reset_index()
+                        penalties_per_person = g.rename(
+                            columns={"person": "Persoon", "weighted": "Totaal"}
+                        )
+                    else:
+                        g = p.groupby("person").size().reset_index(name="Totaal")
+                        penalties_per_person = g.rename(columns={"person": "Persoon"})
+        if pivot is not None:
+            penalties_per_person = pivot.copy()
+            # Voeg totaal kolom toe
+            penalties_per_person["Totaal"] = penalties_per_person.sum(axis=1)
+            penalties_per_person = penalties_per_person.sort_values(
+                by="Totaal", ascending=False
+            ).reset_index()
+            penalties_per_person.columns.name = None
+            penalties_per_person = penalties_per_person.rename(
+                columns={"person": "Persoon"}
+            )
     except FileNotFoundError:
         # Toon lege tabel als penalties nog niet bestaan
         penalties_per_person = pd.DataFrame(columns=["Persoon"])
 
     if "Persoon" in penalties_per_person.columns:
-        penalties_per_person["Persoon"] = penalties_per_person["Persoon"].apply(_with_role)
+        penalties_per_person["Persoon"] = _with_role(penalties_per_person["Persoon"], _role_map)
 
     # Toon de samenvattingstabellen naast elkaar (horizontale grid)
     col1, col2 = st.columns(2)
@@ -320,35 +317,55 @@ def render_rooster_page() -> None:
     # Tabelweergave van het rooster: testers als losse kolommen
     df_display = df.copy()
     if tester_cols:
-        max_testers = len(tester_cols)
+        display_tester_cols = tester_cols
     else:
-        max_testers = 0
-        for xs in testers_series:
-            if isinstance(xs, (list, tuple)):
-                max_testers = max(max_testers, len(xs))
-        for idx in range(max_testers):
-            col_name = f"tester_{idx + 1}"
-            df_display[col_name] = testers_series.apply(
-                lambda xs, i=idx: xs[i] if isinstance(xs, (list, tuple)) and len(xs) > i else ""
-            )
-    df_display = df_display.sort_values(by=["date", "location", "team"]).reset_index(
+        n_slots = int(assignments["slot"].max()) + 1 if not assignments.empty else 0
+        display_tester_cols = [f"tester_{i + 1}" for i in range(n_slots)]
+        wide = (
+            assignments.pivot(index="row", columns="slot", values="name")
+            .astype(object)
+            .reindex(index=df.index, columns=range(n_slots))
+            .fillna("")
+        )
+        wide.columns = display_tester_cols
+        df_display[display_tester_cols] = wide
+
+    # Filters, server-side: only the current page is sent to the browser
+    st.subheader("Rooster")
+    scope = str(selected_path)  # options and date bounds differ per roster
+    mask = np.ones(len(df_display), dtype=bool)
+    names = df_display[display_tester_cols].astype(object)
+    fcol1, fcol2, fcol3, fcol4 = st.columns(4)
+    with fcol1:
+        person_options = sorted({n for n in pd.unique(names.to_numpy().ravel()) if isinstance(n, str) and n})
+        chosen_persons = st.multiselect("Persoon", person_options, key=f"rooster_persons|{scope}")
+        if chosen_persons:
+            mask &= names.isin(chosen_persons).any(axis=1).to_numpy()
+    with fcol2:
+        if "date" in df_display.columns:
+            mask &= table_view.date_range_mask(df_display["date"], "Periode", key=f"rooster_dates|{scope}")
+    with fcol3:
+        if "location" in df_display.columns:
+            locations = sorted(df_display["location"].dropna().astype(str).unique())
+            chosen_locations = st.multiselect("Locatie", locations, key=f"rooster_locations|{scope}")
+            if chosen_locations:
+                mask &= df_display["location"].astype(str).isin(chosen_locations).to_numpy()
+    with fcol4:
+        if "weeknummer" in df_display.columns:
+            weeks = sorted(pd.to_numeric(df_display["weeknummer"], errors="coerce").dropna().astype(int).unique().tolist())
+            chosen_weeks = st.multiselect("Week", weeks, key=f"rooster_weeks|{scope}")
+            if chosen_weeks:
+                mask &= df_display["weeknummer"].isin(chosen_weeks).to_numpy()
+
+    df_display = df_display[mask].sort_values(by=["date", "location", "team"]).reset_index(
         drop=True
     )
+    page = table_view.paginate(df_display, key=f"rooster|{scope}")
+    for col in display_tester_cols:
+        page[col] = _with_role(page[col], _role_map)
 
-    # Apply role suffixes to tester name columns
-    _tester_display_cols = tester_cols if tester_cols else [f"tester_{i + 1}" for i in range(max_testers)]
-    for _tc in _tester_display_cols:
-        if _tc in df_display.columns:
-            df_display[_tc] = df_display[_tc].apply(
-                lambda v: _with_role(str(v)) if pd.notna(v) and str(v).strip() else v
-            )
-    if tester_cols:
-        display_cols = ["date", "day", "location", "team"] + tester_cols
-    else:
-        display_cols = ["date", "day", "location", "team"] + [
-            f"tester_{i + 1}" for i in range(max_testers)
-        ]
+    display_cols = ["date", "day", "location", "team"] + display_tester_cols
     st.dataframe(
-        df_display[display_cols],
+        page[display_cols],
         use_container_width=True,
     )
@@ -7,11 +7,13 @@ from typing import Any
 import pandas as pd
 import streamlit as st
 
+import persistence
 from config import (
     get_departments_config,
+    get_department_data_sources,
     get_department_defaults,
     get_locations_config,
-    get_data_sources_config,
+    thaw,
 )
 
 
@@ -69,22 +71,21 @@ def render_shifts_page() -> None:
         )
         selected_department = default_dept
 
-    ds_conf = get_data_sources_config()
     dept_defaults = get_department_defaults(selected_department)
-    dept_ds_overrides = (
-        dept_defaults.get("data_sources", {}) if isinstance(dept_defaults, dict) else {}
-    )
-    ds_conf = {**ds_conf, **dept_ds_overrides}
+    ds_conf = get_department_data_sources(selected_department)
     locations_config_path = (
         dept_defaults.get("locations_config") if isinstance(dept_defaults, dict) else None
     )
     conf_path = _resolve_path(root, locations_config_path)
 
     try:
-        loc_conf = get_locations_config(str(conf_path))
+        loc_conf = thaw(get_locations_config(str(conf_path)))  # edited and saved below
     except FileNotFoundError:
         st.error("Locatieconfig niet gevonden. Maak eerst een configbestand aan.")
         st.stop()
+    conf_version_key = f"locations_config_version_{conf_path}"
+    if conf_version_key not in st.session_state:  # version when this session first loaded it
+        st.session_state[conf_version_key] = persistence.read_json(conf_path)[1]
 
     locations = [loc.get("name") for loc in loc_conf.get("locations", []) if loc.get("name")]
 
@@ -149,18 +150,10 @@ def render_shifts_page() -> None:
     shiftplan_path = root / shiftplans_dir / _dept_slug(selected_department) / f"{selected_year}_{selected_quarter}.json"
     state_key = f"teams_df_{_dept_slug(selected_department)}_{selected_year}_{selected_quarter}"
 
-    plan_from_conf: dict[str, dict[str, int]] = {}
-    if shiftplan_path.exists():
-        try:
-            import json as _json
-
-            payload = _json.loads(shiftplan_path.read_text(encoding="utf-8"))
-            plan_from_conf = payload.get("teams_per_date", {}) or {}
-        except Exception:
-            plan_from_conf = {}
-
     if state_key not in st.session_state:
-        st.session_state[state_key] = plan_from_conf
+        payload, plan_version = persistence.read_json(shiftplan_path)
+        st.session_state[state_key] = (payload or {}).get("teams_per_date", {}) or {}
+        st.session_state[f"{state_key}_version"] = plan_version  # detects saves by other sessions
 
     # Build teams table
     working_plan: dict[str, dict[str, int]] = st.session_state.get(state_key, {})
@@ -236,8 +229,6 @@ def render_shifts_page() -> None:
             st.rerun()
 
     if st.button("Opslaan shiftplan"):
-        import json as _json
-
         invalid_dates = []
         teams_per_date: dict[str, dict[str, int]] = {}
         for _, row in teams_edited.iterrows():
@@ -279,28 +270,32 @@ def render_shifts_page() -> None:
                 wd: int(day_map[name].get(wd, 0) or 0) for wd in weekday_cols
             }
 
-        # Save locations config
-        conf_path.parent.mkdir(parents=True, exist_ok=True)
-        conf_path.write_text(
-            _json.dumps(loc_conf, ensure_ascii=False, indent=2),
-            encoding="utf-8",
+        # Save locations config and shiftplan file (atomically, only when changed)
+        conf_result = persistence.save_json(
+            conf_path, loc_conf, expected_version=st.session_state.get(conf_version_key)
         )
-
-        # Save shiftplan file
-        shiftplan_path.parent.mkdir(parents=True, exist_ok=True)
+        st.session_state[conf_version_key] = conf_result.version
         payload = {
             "year": selected_year,
             "quarter": selected_quarter,
             "teams_per_date": teams_per_date,
         }
-        shiftplan_path.write_text(
-            _json.dumps(payload, ensure_ascii=False, indent=2),
-            encoding="utf-8",
+        plan_result = persistence.save_json(
+            shiftplan_path, payload, expected_version=st.session_state.get(f"{state_key}_version")
         )
+        st.session_state[f"{state_key}_version"] = plan_result.version
+        if conf_result.conflict or plan_result.conflict:
+            st.warning(
+                "Let op: een andere sessie had dit shiftplan of de locatieconfig intussen opgeslagen; "
+                "die wijzigingen zijn overschreven."
+            )
 
-        st.success(
-            f"Shiftplan opgeslagen: {shiftplan_path.relative_to(root)}"
-        )
+        if plan_result.written or conf_result.written:
+            st.success(
+                f"Shiftplan opgeslagen: {shiftplan_path.relative_to(root)}"
+            )
+        else:
+            st.info("Geen wijzigingen; niets opgeslagen.")
 
     st.markdown("---")
     st.caption("Tip: gebruik de Generator voor het daadwerkelijke rooster; dit scherm beheert het shiftplan per afdeling.")
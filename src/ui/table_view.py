@@ -0,0 +1,58 @@
+"""Server-side filtering and pagination helpers for large tables.
+
+Pages filter their DataFrame with boolean masks and hand only one page of rows to
+st.dataframe, so the payload sent to the browser is bounded by the page size no matter
+how long the roster or diagnostics file is.
+"""
+from __future__ import annotations
+
+import datetime as _dt
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+PAGE_SIZES = (50, 100, 250, 500)
+DEFAULT_PAGE_SIZE = 100
+
+
+def date_range_mask(dates: pd.Series, label: str, key: str) -> np.ndarray:
+    """Date-range picker over *dates* (YYYY-MM-DD strings or datetimes); returns a row mask."""
+    parsed = pd.to_datetime(dates, errors="coerce")
+    if parsed.isna().all():
+        return np.ones(len(dates), dtype=bool)
+    first, last = parsed.min().date(), parsed.max().date()
+    picked = st.date_input(label, value=(first, last), min_value=first, max_value=last, key=key)
+    if isinstance(picked, _dt.date):
+        picked = (picked, picked)
+    if len(picked) != 2:  # second date not chosen yet
+        return np.ones(len(dates), dtype=bool)
+    start, end = pd.Timestamp(picked[0]), pd.Timestamp(picked[1])
+    return ((parsed >= start) & (parsed <= end)).to_numpy()
+
+
+def paginate(df: pd.DataFrame, key: str) -> pd.DataFrame:
+    """Page-size and page-number controls; returns the rows of the current page (a copy)."""
+    size_key, page_key = f"{key}_page_size", f"{key}_page"
+    col1, col2, col3 = st.columns([1, 1, 2])
+    with col1:
+        page_size = st.selectbox(
+            "Rijen per pagina", PAGE_SIZES, index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE), key=size_key
+        )
+    n_pages = max(1, -(-len(df) // page_size))
+    if st.session_state.get(page_key, 1) > n_pages:  # filters shrank the table
+        st.session_state[page_key] = n_pages
+    st.session_state.setdefault(page_key, 1)
+    with col2:
+        page = st.number_input("Pagina", min_value=1, max_value=n_pages, step=1, key=page_key)
+    start = (int(page) - 1) * page_size
+    end = min(start + page_size, len(df))
+    with col3:
+        st.caption(f"Rij {start + 1 if len(df) else 0}–{end} van {len(df)} (pagina {int(page)} van {n_pages})")
+    return df.iloc[start:end].copy()
+
+
+def row_style(mask: np.ndarray | pd.Series, css: str, columns: pd.Index, index: pd.Index) -> pd.DataFrame:
+    """Styler.apply(axis=None) result that paints whole rows where *mask* is True."""
+    cells = np.where(np.asarray(mask, dtype=bool)[:, None], css, "")
+    return pd.DataFrame(np.broadcast_to(cells, (len(index), len(columns))), index=index, columns=columns)
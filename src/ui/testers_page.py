@@ -1,15 +1,17 @@
 import json
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 
-from person_list import csv_to_personlist
 from config import (
-    get_locations_config,
     get_departments_config,
+    get_department_data_sources,
     get_department_defaults,
 )
+from roster_stats import stats_path
+from ui import data_cache
 
 
 def render_testers_page(ds_conf: dict, project_root: object) -> None:
@@ -30,8 +32,7 @@ def render_testers_page(ds_conf: dict, project_root: object) -> None:
         selected_department = default_dept
 
     dept_defaults = get_department_defaults(selected_department)
-    dept_ds_overrides = dept_defaults.get("data_sources", {}) if isinstance(dept_defaults, dict) else {}
-    ds_conf = {**ds_conf, **dept_ds_overrides}
+    ds_conf = get_department_data_sources(selected_department)
     locations_config_path = dept_defaults.get("locations_config") if isinstance(dept_defaults, dict) else None
 
     # Laad brondata (altijd) om echte beschikbaarheid te tonen
@@ -59,19 +60,18 @@ def render_testers_page(ds_conf: dict, project_root: object) -> None:
             # No uploaded files – use configured default
             csv_path = project_root / default_csv
 
-        people = csv_to_personlist(str(csv_path), locations_config_path=locations_config_path)
+        grid = data_cache.availability_grid(csv_path, locations_config_path=locations_config_path)
     except Exception as e:
         st.error(f"Kon testers niet laden: {e}")
-        people = []
+        grid = pd.DataFrame()
 
-    if not people:
+    if grid.empty:
         st.stop()
 
-    df_people = pd.DataFrame([p.to_dict() for p in people])
-
     # --- Mutual exclusions UI (prevent two people on same day) ---
     st.markdown("### ✋ Mutual exclusions (blokkeer twee personen op dezelfde dag)")
-    names = sorted(df_people["name"].tolist())
+    names = sorted(grid["name"].tolist())
+    excl_rel = ds_conf.get("mutual_exclusions", "data/mutual_exclusions.json")
     col1, col2, col3 = st.columns([3, 3, 2])
     with col1:
         p1 = st.selectbox("Persoon A", options=["(geen)"] + names, key="mutex_p1")
@@ -84,10 +84,9 @@ def render_testers_page(ds_conf: dict, project_root: object) -> None:
             elif p1 == p2:
                 st.warning("Kies twee verschillende personen.")
             else:
-                # Persist exclusions to data/mutual_exclusions.json
-                data_dir = Path(project_root) / "data"
-                data_dir.mkdir(parents=True, exist_ok=True)
-                excl_path = data_dir / "mutual_exclusions.json"
+                # Persist exclusions to the configured mutual_exclusions file
+                excl_path = project_root / excl_rel
+                excl_path.parent.mkdir(parents=True, exist_ok=True)
                 try:
                     existing = []
                     if excl_path.exists():
@@ -105,8 +104,7 @@ def render_testers_page(ds_conf: dict, project_root: object) -> None:
                     st.error(f"Kon exclusie niet opslaan: {e}")
 
     # Show existing exclusions with remove buttons
-    data_dir = Path(project_root) / "data"
-    excl_path = data_dir / "mutual_exclusions.json"
+    excl_path = project_root / excl_rel
     if excl_path.exists():
         try:
             existing = json.loads(excl_path.read_text(encoding="utf-8"))
@@ -131,78 +129,52 @@ def render_testers_page(ds_conf: dict, project_root: object) -> None:
                         st.error(f"Kon exclusie niet verwijderen: {e}")
     st.markdown("---")
 
-    # Verzamel alle datums uit availability en maak een doorlopende reeks
-    all_dates_set = set()
-    for av in df_people["availability"]:
-        if isinstance(av, dict):
-            all_dates_set.update(av.keys())
-    if not all_dates_set:
+    # Kolommen van het grid: persoonsgegevens en voorkeuren, daarna één kolom per datum
+    pref_cols = [c for c in grid.columns if c.startswith("pref_loc_")]
+    base_cols = ["name", "role", "month_max", "month_avg"] + pref_cols
+    full_range = pd.DatetimeIndex(grid.columns[len(base_cols):])
+    if full_range.empty:
         st.info("Geen datums gevonden in availability.")
         st.stop()
-    all_dates_sorted = sorted(all_dates_set)
-    min_date = pd.to_datetime(all_dates_sorted[0])
-    max_date = pd.to_datetime(all_dates_sorted[-1])
-    full_range = pd.date_range(min_date, max_date)
-    full_range_str = [d.strftime("%Y-%m-%d") for d in full_range]
+
+    # Filters als maskers over de datumkolommen
+    mask = np.ones(len(full_range), dtype=bool)
 
     # Optioneel: beperk tot datums in rooster.csv
     use_rooster_dates = st.checkbox("Toon alleen datums uit rooster.csv", value=False)
-    selected_dates = list(full_range_str)
     if use_rooster_dates:
         try:
-            roster = pd.read_csv(ds_conf.get("rooster_csv", "rooster.csv"))
-            rooster_dates = sorted(pd.to_datetime(roster["date"]).dt.strftime("%Y-%m-%d").unique())
-            selected_dates = [d for d in full_range_str if d in set(rooster_dates)]
+            roster_csv = ds_conf.get("rooster_csv", "rooster.csv")
+            stats = data_cache.load_stats(stats_path(roster_csv), source=roster_csv)
+            if stats is not None:
+                rooster_dates = stats["coverage"]["date"]
+            else:
+                rooster_dates = data_cache.read_csv(roster_csv)["date"]
+            mask &= full_range.isin(pd.to_datetime(rooster_dates))
         except Exception:
             st.info("Kon rooster.csv niet lezen; toon alle datums.")
 
     # Extra filter: kies weekdagen
-    if selected_dates:
-        dt_ser = pd.to_datetime(pd.Series(selected_dates))
+    if mask.any():
         weekday_map = {0: "ma", 1: "di", 2: "wo", 3: "do", 4: "vr", 5: "za", 6: "zo"}
-        weekdagen = dt_ser.dt.weekday.map(weekday_map)
-        unique_days = list(dict.fromkeys(weekdagen))
+        weekdagen = full_range.weekday.map(weekday_map)
+        unique_days = list(dict.fromkeys(weekdagen[mask]))
         chosen_days = st.multiselect("Filter op weekdag", options=unique_days, default=unique_days)
-        selected_dates = [d for d, w in zip(selected_dates, weekdagen) if w in set(chosen_days)]
+        mask &= weekdagen.isin(chosen_days)
 
     # Extra filter: kies weeknummers
-    if selected_dates:
-        dt_ser = pd.to_datetime(pd.Series(selected_dates))
-        weeknrs = dt_ser.dt.isocalendar().week.astype(int).tolist()
-        unique_weeks = sorted(set(weeknrs))
+    if mask.any():
+        weeknrs = full_range.isocalendar().week.to_numpy(dtype=int)
+        unique_weeks = sorted(set(weeknrs[mask].tolist()))
         chosen_weeks = st.multiselect("Filter op weeknummer", options=unique_weeks, default=unique_weeks)
-        selected_dates = [d for d, wn in zip(selected_dates, weeknrs) if wn in set(chosen_weeks)]
-
-    # Bouw beschikbaarheidsmatrix
-    # Basic columns
-    base_cols = ["name", "role", "month_max", "month_avg"]
-    avail_df = df_people[base_cols].copy()
+        mask &= np.isin(weeknrs, chosen_weeks)
 
-    # Expand preference flags per configured location (pref_loc_flags is a dict per person)
-    try:
-        loc_conf = get_locations_config(locations_config_path)
-        locations = [loc.get("name") for loc in loc_conf.get("locations", [])]
-    except Exception:
-        locations = []
-
-    pref_cols = []
-    for loc in locations:
-        # safe column name
-        col_name = f"pref_loc_{str(loc).replace(' ', '_')}"
-        pref_cols.append(col_name)
-        avail_df[col_name] = df_people["pref_loc_flags"].apply(
-            lambda flags, loc=loc: (flags.get(loc) if isinstance(flags, dict) else None)
-        )
-
-    # Availability date columns
-    for d in selected_dates:
-        avail_df[d] = df_people["availability"].apply(
-            lambda x: bool(x.get(d, False)) if isinstance(x, dict) else False
-        )
+    # Beschikbaarheidsmatrix: de geselecteerde datumkolommen in één keer
+    selected_dates = list(full_range[mask].strftime("%Y-%m-%d"))
+    avail_df = grid[base_cols + selected_dates].copy()
 
     # Samenvatting: aantal beschikbare dagen in selectie
-    avail_cols = selected_dates
-    avail_df["available_count"] = avail_df[avail_cols].sum(axis=1) if avail_cols else 0
+    avail_df["available_count"] = avail_df[selected_dates].sum(axis=1) if selected_dates else 0
 
     st.caption("Waar True betekent: beschikbaar. Pref kolommen tonen voorkeuren per locatie (bijv. 0/1/2).")
     st.dataframe(avail_df, use_container_width=True)